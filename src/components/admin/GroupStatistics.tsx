@@ -34,14 +34,14 @@ export default function GroupStatistics() {
 
   const fetchData = async () => {
     try {
-      // Kalit so'z statistikasi
+      // Kalit so'z statistikasi (soatlik rollup, userbot xotirada yig'ib yozadi)
       const { data: hits } = await supabase
-        .from("keyword_hits")
-        .select("keyword_id, group_id, group_name, keywords(keyword)")
-        .order("created_at", { ascending: false });
+        .from("keyword_hits_hourly")
+        .select("keyword_id, group_id, group_name, hits, keywords(keyword)")
+        .order("hour", { ascending: false });
 
       if (hits) {
-        setTotalHits(hits.length);
+        setTotalHits(hits.reduce((sum: number, hit: any) => sum + (hit.hits || 0), 0));
 
         // Kalit so'z bo'yicha guruhlash
         const keywordCounts: Record<string, number> = {};
@@ -49,13 +49,13 @@ export default function GroupStatistics() {
 
         hits.forEach((hit: any) => {
           const keyword = hit.keywords?.keyword || "Noma'lum";
-          keywordCounts[keyword] = (keywordCounts[keyword] || 0) + 1;
+          keywordCounts[keyword] = (keywordCounts[keyword] || 0) + (hit.hits || 0);
 
           const groupKey = String(hit.group_id);
           if (!groupCounts[groupKey]) {
             groupCounts[groupKey] = { name: hit.group_name || "Noma'lum", count: 0 };
           }
-          groupCounts[groupKey].count++;
+          groupCounts[groupKey].count += hit.hits || 0;
         });
 
         setKeywordStats(
@@ -32,7 +32,8 @@ export default function UserbotAccountManager() {
     try {
       const { data, error } = await supabase
         .from("userbot_accounts")
-        .select("*")
+        // session_string is not granted to anon/authenticated, so list columns instead of "*"
+        .select("id, phone_number, status, two_fa_required, created_at, updated_at")
         .order("created_at", { ascending: false });
 
       if (error) throw error;
@@ -38,6 +38,30 @@ export type Database = {
         }
         Relationships: []
       }
+      account_stats_hourly: {
+        Row: {
+          hour: string
+          matched: number
+          phone_number: string
+          seen: number
+          updated_at: string
+        }
+        Insert: {
+          hour: string
+          matched?: number
+          phone_number: string
+          seen?: number
+          updated_at?: string
+        }
+        Update: {
+          hour?: string
+          matched?: number
+          phone_number?: string
+          seen?: number
+          updated_at?: string
+        }
+        Relationships: []
+      }
       bot_settings: {
         Row: {
           created_at: string
@@ -125,8 +149,34 @@ export type Database = {
         }
         Relationships: []
       }
+      group_stats_hourly: {
+        Row: {
+          group_id: number
+          hour: string
+          matched: number
+          seen: number
+          updated_at: string
+        }
+        Insert: {
+          group_id: number
+          hour: string
+          matched?: number
+          seen?: number
+          updated_at?: string
+        }
+        Update: {
+          group_id?: number
+          hour?: string
+          matched?: number
+          seen?: number
+          updated_at?: string
+        }
+        Relationships: []
+      }
       keyword_hits: {
         Row: {
+          classifier_decision: string | null
+          classifier_score: number | null
           created_at: string
           group_id: number
           group_name: string | null
@@ -136,6 +186,8 @@ export type Database = {
           phone_number: string | null
         }
         Insert: {
+          classifier_decision?: string | null
+          classifier_score?: number | null
           created_at?: string
           group_id: number
           group_name?: string | null
@@ -145,6 +197,8 @@ export type Database = {
           phone_number?: string | null
         }
         Update: {
+          classifier_decision?: string | null
+          classifier_score?: number | null
           created_at?: string
           group_id?: number
           group_name?: string | null
@@ -163,21 +217,83 @@ export type Database = {
           },
         ]
       }
+      keyword_hits_hourly: {
+        Row: {
+          group_id: number
+          group_name: string | null
+          hits: number
+          hour: string
+          keyword_id: string
+          updated_at: string
+        }
+        Insert: {
+          group_id: number
+          group_name?: string | null
+          hits?: number
+          hour: string
+          keyword_id: string
+          updated_at?: string
+        }
+        Update: {
+          group_id?: number
+          group_name?: string | null
+          hits?: number
+          hour?: string
+          keyword_id?: string
+          updated_at?: string
+        }
+        Relationships: [
+          {
+            foreignKeyName: "keyword_hits_hourly_keyword_id_fkey"
+            columns: ["keyword_id"]
+            isOneToOne: false
+            referencedRelation: "keywords"
+            referencedColumns: ["id"]
+          },
+        ]
+      }
       keywords: {
+        Row: {
+          created_at: string
+          destination_chat_id: number | null
+          destination_thread_id: number | null
+          id: string
+          keyword: string
+        }
+        Insert: {
+          created_at?: string
+          destination_chat_id?: number | null
+          destination_thread_id?: number | null
+          id?: string
+          keyword: string
+        }
+        Update: {
+          created_at?: string
+          destination_chat_id?: number | null
+          destination_thread_id?: number | null
+          id?: string
+          keyword?: string
+        }
+        Relationships: []
+      }
+      negative_keywords: {
         Row: {
           created_at: string
           id: string
           keyword: string
+          weight: number
         }
         Insert: {
           created_at?: string
           id?: string
           keyword: string
+          weight?: number
         }
         Update: {
           created_at?: string
           id?: string
           keyword?: string
+          weight?: number
         }
         Relationships: []
       }
@@ -317,7 +433,14 @@ export type Database = {
       [_ in never]: never
     }
     Functions: {
-      [_ in never]: never
+      increment_hourly_stats: {
+        Args: {
+          account_rows?: Json
+          group_rows?: Json
+          keyword_rows?: Json
+        }
+        Returns: undefined
+      }
     }
     Enums: {
       [_ in never]: never
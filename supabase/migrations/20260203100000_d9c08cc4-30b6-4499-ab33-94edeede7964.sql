@@ -0,0 +1,132 @@
+-- Soatlik statistika: userbot xotirada yig'adi va har N sekundda bitta RPC bilan qo'shadi
+-- (keyword_hits dagi har bir xom qatorni dashboard'da sanash o'rniga)
+
+-- Kalit so'z x guruh x soat
+CREATE TABLE IF NOT EXISTS public.keyword_hits_hourly (
+  hour TIMESTAMP WITH TIME ZONE NOT NULL,
+  keyword_id UUID NOT NULL REFERENCES public.keywords(id) ON DELETE CASCADE,
+  group_id BIGINT NOT NULL,
+  group_name TEXT,
+  hits BIGINT NOT NULL DEFAULT 0,
+  updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+  PRIMARY KEY (hour, keyword_id, group_id)
+);
+
+CREATE INDEX IF NOT EXISTS keyword_hits_hourly_keyword_idx ON public.keyword_hits_hourly (keyword_id, hour DESC);
+CREATE INDEX IF NOT EXISTS keyword_hits_hourly_group_idx ON public.keyword_hits_hourly (group_id, hour DESC);
+
+-- Guruh x soat: ko'rilgan xabarlar va navbatga tushgan zakazlar
+CREATE TABLE IF NOT EXISTS public.group_stats_hourly (
+  hour TIMESTAMP WITH TIME ZONE NOT NULL,
+  group_id BIGINT NOT NULL,
+  seen BIGINT NOT NULL DEFAULT 0,
+  matched BIGINT NOT NULL DEFAULT 0,
+  updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+  PRIMARY KEY (hour, group_id)
+);
+
+CREATE INDEX IF NOT EXISTS group_stats_hourly_group_idx ON public.group_stats_hourly (group_id, hour DESC);
+
+-- Akkaunt x soat
+CREATE TABLE IF NOT EXISTS public.account_stats_hourly (
+  hour TIMESTAMP WITH TIME ZONE NOT NULL,
+  phone_number TEXT NOT NULL,
+  seen BIGINT NOT NULL DEFAULT 0,
+  matched BIGINT NOT NULL DEFAULT 0,
+  updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+  PRIMARY KEY (hour, phone_number)
+);
+
+CREATE INDEX IF NOT EXISTS account_stats_hourly_phone_idx ON public.account_stats_hourly (phone_number, hour DESC);
+
+-- Dashboard "oxirgi N kun" so'rovlari uchun
+CREATE INDEX IF NOT EXISTS keyword_hits_created_at_idx ON public.keyword_hits (created_at DESC);
+
+-- Backfill: mavjud keyword_hits tarixini rollup'larga ko'chirish (dashboard endi faqat
+-- rollup'larni o'qiydi). Hozirgacha har bir keyword_hits qatori = navbatga tushgan bitta zakaz.
+-- "seen" tarixda yozilmagan -> 0; faqat "matched" tiklanadi.
+INSERT INTO public.keyword_hits_hourly (hour, keyword_id, group_id, group_name, hits)
+SELECT date_trunc('hour', created_at), keyword_id, group_id, max(group_name), count(*)
+FROM public.keyword_hits
+WHERE keyword_id IS NOT NULL
+GROUP BY 1, 2, 3
+ON CONFLICT DO NOTHING;
+
+INSERT INTO public.group_stats_hourly (hour, group_id, seen, matched)
+SELECT date_trunc('hour', created_at), group_id, 0, count(*)
+FROM public.keyword_hits
+GROUP BY 1, 2
+ON CONFLICT DO NOTHING;
+
+INSERT INTO public.account_stats_hourly (hour, phone_number, seen, matched)
+SELECT date_trunc('hour', created_at), phone_number, 0, count(*)
+FROM public.keyword_hits
+WHERE phone_number IS NOT NULL
+GROUP BY 1, 2
+ON CONFLICT DO NOTHING;
+
+-- RLS yoqish
+ALTER TABLE public.keyword_hits_hourly ENABLE ROW LEVEL SECURITY;
+ALTER TABLE public.group_stats_hourly ENABLE ROW LEVEL SECURITY;
+ALTER TABLE public.account_stats_hourly ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Allow all operations on keyword_hits_hourly"
+ON public.keyword_hits_hourly
+FOR ALL
+USING (true)
+WITH CHECK (true);
+
+CREATE POLICY "Allow all operations on group_stats_hourly"
+ON public.group_stats_hourly
+FOR ALL
+USING (true)
+WITH CHECK (true);
+
+CREATE POLICY "Allow all operations on account_stats_hourly"
+ON public.account_stats_hourly
+FOR ALL
+USING (true)
+WITH CHECK (true);
+
+-- Qo'shib yozish (upsert + increment). Bir nechta jarayon/shard parallel yozsa ham
+-- qiymatlar qo'shiladi, ustidan yozilmaydi.
+CREATE OR REPLACE FUNCTION public.increment_hourly_stats(
+  keyword_rows JSONB DEFAULT '[]'::jsonb,
+  group_rows JSONB DEFAULT '[]'::jsonb,
+  account_rows JSONB DEFAULT '[]'::jsonb
+)
+RETURNS VOID AS $$
+BEGIN
+  INSERT INTO public.keyword_hits_hourly AS t (hour, keyword_id, group_id, group_name, hits)
+  SELECT r.hour, r.keyword_id, r.group_id, max(r.group_name), sum(r.hits)
+  FROM jsonb_to_recordset(COALESCE(keyword_rows, '[]'::jsonb))
+    AS r(hour TIMESTAMPTZ, keyword_id UUID, group_id BIGINT, group_name TEXT, hits BIGINT)
+  -- flush oralig'ida o'chirilgan kalit so'z butun batch'ni FK xatosi bilan yiqitmasin
+  WHERE EXISTS (SELECT 1 FROM public.keywords k WHERE k.id = r.keyword_id)
+  GROUP BY r.hour, r.keyword_id, r.group_id
+  ON CONFLICT (hour, keyword_id, group_id) DO UPDATE
+    SET hits = t.hits + EXCLUDED.hits,
+        group_name = COALESCE(EXCLUDED.group_name, t.group_name),
+        updated_at = now();
+
+  INSERT INTO public.group_stats_hourly AS t (hour, group_id, seen, matched)
+  SELECT r.hour, r.group_id, sum(r.seen), sum(r.matched)
+  FROM jsonb_to_recordset(COALESCE(group_rows, '[]'::jsonb))
+    AS r(hour TIMESTAMPTZ, group_id BIGINT, seen BIGINT, matched BIGINT)
+  GROUP BY r.hour, r.group_id
+  ON CONFLICT (hour, group_id) DO UPDATE
+    SET seen = t.seen + EXCLUDED.seen,
+        matched = t.matched + EXCLUDED.matched,
+        updated_at = now();
+
+  INSERT INTO public.account_stats_hourly AS t (hour, phone_number, seen, matched)
+  SELECT r.hour, r.phone_number, sum(r.seen), sum(r.matched)
+  FROM jsonb_to_recordset(COALESCE(account_rows, '[]'::jsonb))
+    AS r(hour TIMESTAMPTZ, phone_number TEXT, seen BIGINT, matched BIGINT)
+  GROUP BY r.hour, r.phone_number
+  ON CONFLICT (hour, phone_number) DO UPDATE
+    SET seen = t.seen + EXCLUDED.seen,
+        matched = t.matched + EXCLUDED.matched,
+        updated_at = now();
+END;
+$$ LANGUAGE plpgsql SET search_path = public;
@@ -0,0 +1,9 @@
+-- Kalit so'z bo'yicha manzil: zakaz qaysi guruhga / forum topic'ka yuboriladi
+-- (NULL = asosiy DRIVERS_GROUP_ID). Masalan "toshkent xorazm" -> Xorazm yo'nalishi guruhi.
+ALTER TABLE public.keywords
+ADD COLUMN IF NOT EXISTS destination_chat_id BIGINT,
+ADD COLUMN IF NOT EXISTS destination_thread_id BIGINT;
+
+CREATE INDEX IF NOT EXISTS keywords_destination_chat_idx
+ON public.keywords (destination_chat_id)
+WHERE destination_chat_id IS NOT NULL;
@@ -0,0 +1,42 @@
+-- Haydovchi e'lonlarini ajratish uchun iboralar (userbot klassifikatori)
+-- weight > 0: haydovchi e'loni belgisi, weight < 0: yo'lovchi zakazi belgisi.
+-- Yig'indi CLASSIFIER_THRESHOLD dan oshsa xabar e'lon hisoblanadi.
+CREATE TABLE IF NOT EXISTS public.negative_keywords (
+  id UUID NOT NULL DEFAULT gen_random_uuid() PRIMARY KEY,
+  keyword TEXT NOT NULL UNIQUE,
+  weight REAL NOT NULL DEFAULT 1.0,
+  created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now()
+);
+
+-- RLS yoqish
+ALTER TABLE public.negative_keywords ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Allow all operations on negative_keywords"
+ON public.negative_keywords
+FOR ALL
+USING (true)
+WITH CHECK (true);
+
+-- Boshlang'ich iboralar (lotin; kirill matn userbot'da lotinga o'giriladi)
+INSERT INTO public.negative_keywords (keyword, weight) VALUES
+  ('olaman', 1.0),
+  ('olamiz', 1.0),
+  ('mashina bor', 1.5),
+  ('joy bor', 1.0),
+  ('bo''sh joy', 1.0),
+  ('odam kerak', 1.5),
+  ('yo''lovchi kerak', 1.5),
+  ('pochta olaman', 1.0),
+  ('taksi kerak', -1.5),
+  ('mashina kerak', -1.5),
+  ('ketishim kerak', -1.0)
+ON CONFLICT (keyword) DO NOTHING;
+
+-- Shadow rejimda har bir qaror keyword_hits'ga yoziladi (aniqlikni o'lchash uchun)
+ALTER TABLE public.keyword_hits
+ADD COLUMN IF NOT EXISTS classifier_score REAL,
+ADD COLUMN IF NOT EXISTS classifier_decision TEXT;
+
+CREATE INDEX IF NOT EXISTS keyword_hits_classifier_decision_idx
+ON public.keyword_hits (classifier_decision, created_at DESC)
+WHERE classifier_decision IS NOT NULL;
@@ -0,0 +1,5 @@
+-- Userbot chat filtri har CHAT_GATE_REFRESH sekundda faqat bloklangan guruhlarni o'qiydi
+-- (is_blocked = true, id bo'yicha sahifalab) -> butun jadvalni skan qilmasin
+CREATE INDEX IF NOT EXISTS watched_groups_blocked_idx
+ON public.watched_groups (id)
+WHERE is_blocked;
@@ -0,0 +1,14 @@
+-- userbot_accounts.session_string endi haqiqiy Pyrogram session (SESSION_MODE=memory):
+-- u bilan akkauntga to'liq kirish mumkin. "Allow all operations" policy anon kalitga ham
+-- ochiq -> ustun darajasida yopamiz. Userbot va edge function'lar service_role bilan ishlaydi
+-- (RLS/grant'lardan tashqarida), dashboard faqat qolgan ustunlarni o'qiydi/yozadi.
+REVOKE SELECT, INSERT, UPDATE ON public.userbot_accounts FROM anon, authenticated;
+
+GRANT SELECT (id, phone_number, status, two_fa_required, created_at, updated_at)
+ON public.userbot_accounts TO anon, authenticated;
+
+GRANT INSERT (phone_number, status, two_fa_required)
+ON public.userbot_accounts TO anon, authenticated;
+
+GRANT UPDATE (phone_number, status, two_fa_required, updated_at)
+ON public.userbot_accounts TO anon, authenticated;
@@ -0,0 +1,48 @@
+"""Adaptive batching: bir nechta zakazni bitta sendMessage'ga yig'ish.
+
+- utf16_len(): Telegram 4096 limitini UTF-16 birliklarda sanaydi (📍 📣 kabi
+  emoji 2 birlik; Python len() 1 deb sanaydi -> batch sig'gandek ko'rinib rad etiladi).
+- send_orders(): batch yuboriladi; Telegram doimiy xato (4xx: juda uzun, entity
+  parse xatosi) qaytarsa zakazlar bittalab (har biri o'z keyboard'i bilan)
+  qayta yuboriladi -> bitta yomon zakaz butun batch'ni yo'qotmaydi.
+  finish() har zakaz natijasi ma'lum bo'lishi bilan chaqiriladi (shutdown'da
+  yuborilganlar qayta yuborilmaydi).
+
+Pyrogram'ga bog'liq emas (testlar ham ishlatadi).
+"""
+
+from typing import Awaitable, Callable, List, Optional, Sequence, TypeVar
+
+T = TypeVar("T")
+
+SendSingle = Callable[[T, str], Awaitable[Optional[bool]]]
+SendJoined = Callable[[List[str]], Awaitable[Optional[bool]]]
+Finish = Callable[[T, Optional[bool]], None]
+
+
+def utf16_len(text: str) -> int:
+    """Telegram sanaydigan uzunlik (UTF-16 code unit)."""
+    return len(text.encode("utf-16-le")) // 2
+
+
+async def send_orders(batch: Sequence[T], texts: Sequence[str], send_single: SendSingle,
+                      send_joined: SendJoined, finish: Finish) -> Optional[bool]:
+    """
+    Natija (True/False/None) har zakaz uchun finish(entry, ok) ga beriladi.
+    Qaytaradi: batch xabarining natijasi (bitta zakaz bo'lsa uning natijasi).
+    """
+    if len(batch) == 1:
+        ok = await send_single(batch[0], texts[0])
+        finish(batch[0], ok)
+        return ok
+
+    ok = await send_joined(list(texts))
+    if ok is not False:
+        # yuborildi yoki vaqtinchalik xato -> hammasi birga (qayta urinishda yana batch bo'lishi mumkin)
+        for entry in batch:
+            finish(entry, ok)
+        return ok
+
+    for entry, text in zip(batch, texts):
+        finish(entry, await send_single(entry, text))
+    return ok
@@ -0,0 +1,555 @@
+"""UserBot micro-benchmarklari.
+
+Ishlatish:
+    python bench.py matcher            # Aho-Corasick vs eski regex (50/500/5000)
+    python bench.py matcher --sizes 50,500 --messages 5000
+    python bench.py dedupe             # forward dedupe: eski dict+lock+sweep vs ForwardDedupe
+    python bench.py outbox             # diskdagi outbox: enqueue/dequeue throughput
+    python bench.py render             # zakaz render + sendMessage payload: eski vs render.py
+    python bench.py queue              # to'la navbat xotirasi: tayyor HTML dict vs OrderRecord
+    python bench.py startup            # stub client: hammasi birdan vs StartupScheduler
+"""
+
+import argparse
+import asyncio
+import html
+import json
+import os
+import random
+import re
+import tempfile
+import time
+import tracemalloc
+
+from dedupe import ForwardDedupe
+from matcher import AhoCorasickMatcher, RegexMatcher
+from orders import OrderRecord
+from outbox import Outbox
+import render
+from startup import StartupScheduler
+
+# ===================== SYNTHETIC DATA =====================
+_PLACES = [
+    "toshkent", "xorazm", "urganch", "xiva", "nukus", "beruniy", "to'rtko'l",
+    "gurlan", "shovot", "yangibozor", "qo'shko'pir", "hazorasp", "bog'ot",
+    "тошкент", "хоразм", "урганч", "хива", "нукус", "беруний", "гурлан",
+]
+_SYLLABLES = ["ba", "ka", "lo", "mi", "so", "tu", "xo", "ra", "zm", "qo", "sh", "ch", "ya", "yo"]
+_FILLER = [
+    "assalomu", "alaykum", "bugun", "ertaga", "kechqurun", "odam", "bor", "kerak",
+    "pochta", "mashina", "joy", "narxi", "qancha", "telefon", "yozing", "iltimos",
+    "салом", "эртага", "одам", "керак", "машина", "почта",
+]
+
+
+def make_keywords(n: int, rnd: random.Random) -> list:
+    out = list(_PLACES)
+    seen = set(out)
+    while len(out) < n:
+        w = "".join(rnd.choice(_SYLLABLES) for _ in range(rnd.randint(3, 5)))
+        if w not in seen:
+            seen.add(w)
+            out.append(w)
+    return out[:n]
+
+
+def make_messages(n: int, rnd: random.Random, hit_ratio: float = 0.05) -> list:
+    msgs = []
+    for _ in range(n):
+        words = [rnd.choice(_FILLER) for _ in range(rnd.randint(8, 40))]
+        if rnd.random() < hit_ratio:
+            words.insert(rnd.randrange(len(words)), rnd.choice(_PLACES).capitalize())
+        msgs.append(" ".join(words) + f" +99890{rnd.randint(1000000, 9999999)}")
+    return msgs
+
+
+def _timeit(fn, msgs: list, repeat: int) -> float:
+    """Eng yaxshi natija: bitta xabar uchun mikrosekund."""
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for m in msgs:
+            fn(m)
+        best = min(best, time.perf_counter() - t0)
+    return best / len(msgs) * 1e6
+
+
+# ===================== MATCHER =====================
+def bench_matcher(args):
+    rnd = random.Random(args.seed)
+    msgs = make_messages(args.messages, rnd)
+    sizes = [int(x) for x in args.sizes.split(",") if x.strip()]
+
+    print(f"{'keywords':>9} | {'regex build':>11} | {'aho build':>9} | "
+          f"{'regex µs/msg':>12} | {'regex*':>8} | {'aho µs/msg':>10} | {'speedup':>7}")
+    print("-" * 84)
+    for n in sizes:
+        kws = make_keywords(n, rnd)
+
+        # eski main.py dagi usul (raw matn, IGNORECASE)
+        t0 = time.perf_counter()
+        legacy = re.compile(
+            "|".join(re.escape(k) for k in sorted(kws, key=len, reverse=True)),
+            re.IGNORECASE
+        )
+        legacy_build = (time.perf_counter() - t0) * 1e3
+
+        t0 = time.perf_counter()
+        aho = AhoCorasickMatcher(kws)
+        aho_build = (time.perf_counter() - t0) * 1e3
+
+        regex_norm = RegexMatcher(kws)
+
+        legacy_us = _timeit(legacy.search, msgs, args.repeat)
+        regex_norm_us = _timeit(regex_norm.search, msgs, args.repeat)
+        aho_us = _timeit(aho.search, msgs, args.repeat)
+
+        print(f"{n:>9} | {legacy_build:>9.1f}ms | {aho_build:>7.1f}ms | "
+              f"{legacy_us:>12.2f} | {regex_norm_us:>8.2f} | {aho_us:>10.2f} | "
+              f"{legacy_us / aho_us:>6.1f}x")
+    print("\nregex* = RegexMatcher (normallashtirish bilan)")
+
+
+# ===================== DEDUPE =====================
+class _LegacyDedupe:
+    """Eski main.py: dict-of-dict + asyncio.Lock + har yuborishdan keyin to'liq sweep."""
+
+    def __init__(self, ttl: float, stale_ttl: float):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.cache = {}
+        self.lock = asyncio.Lock()
+
+    async def claim(self, key, owner):
+        async with self.lock:
+            st = self.cache.get(key)
+            if st:
+                if st["status"] == "sent":
+                    return False
+                if st["status"] == "queued" and (time.time() - st["ts"]) < self.stale_ttl:
+                    return False
+        async with self.lock:
+            self.cache[key] = {"ts": time.time(), "status": "queued", "owner": owner}
+        return True
+
+    async def done(self, key):
+        async with self.lock:
+            old = self.cache.get(key, {}) or {}
+            self.cache[key] = {"ts": time.time(), "status": "sent", "owner": old.get("owner")}
+            now_ts = time.time()
+            for k, st in list(self.cache.items()):
+                if now_ts - float(st.get("ts", 0)) > self.ttl:
+                    self.cache.pop(k, None)
+
+
+class _StoreDedupe:
+    def __init__(self, ttl: float, stale_ttl: float):
+        self.store = ForwardDedupe(ttl, stale_ttl)
+
+    async def claim(self, key, owner):
+        return self.store.claim(key, owner)
+
+    async def done(self, key):
+        self.store.mark_sent(key)
+
+
+async def _dedupe_run(impl, messages: int, accounts: int, workers: int) -> float:
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def handler(phone: str):
+        # har bir akkaunt bir xil xabarlarni ko'radi (umumiy guruhlar)
+        for i in range(messages):
+            key = (-100 - (i % 500), i)
+            if await impl.claim(key, phone):
+                queue.put_nowait(key)
+            if i % 64 == 0:
+                await asyncio.sleep(0)
+
+    async def worker():
+        while True:
+            key = await queue.get()
+            await impl.done(key)
+            queue.task_done()
+
+    ws = [asyncio.create_task(worker()) for _ in range(workers)]
+    t0 = time.perf_counter()
+    await asyncio.gather(*(handler(f"+99890{a:07d}") for a in range(accounts)))
+    await queue.join()
+    elapsed = time.perf_counter() - t0
+    for w in ws:
+        w.cancel()
+    return elapsed
+
+
+def bench_dedupe(args):
+    print(f"{'messages':>9} | {'accounts':>8} | {'legacy s':>9} | {'store s':>8} | {'speedup':>7}")
+    print("-" * 54)
+    for n in [int(x) for x in args.sizes.split(",") if x.strip()]:
+        legacy = asyncio.run(_dedupe_run(_LegacyDedupe(300, 15), n, args.accounts, args.workers))
+        store = asyncio.run(_dedupe_run(_StoreDedupe(300, 15), n, args.accounts, args.workers))
+        print(f"{n:>9} | {args.accounts:>8} | {legacy:>9.3f} | {store:>8.3f} | {legacy / store:>6.1f}x")
+
+
+# ===================== OUTBOX =====================
+def _order_payload(i: int) -> dict:
+    return {
+        "key": [-1001234567890, i],
+        "text": "🔔 <b>Yangi buyurtma</b>\n📍 Guruh: <b>Toshkent Xorazm taxi</b>\n\n"
+                "Toshkentdan Xorazmga 2 kishi bor, ertaga ertalab +998901234567",
+        "group_link": "https://t.me/toshkent_xorazm_taxi",
+        "message_link": f"https://t.me/toshkent_xorazm_taxi/{i}",
+        "urls": [],
+        "sender_url": "tg://user?id=123456",
+        "queued_at": time.time(),
+    }
+
+
+async def _outbox_run(path: str, n: int, mem_max: int, workers: int) -> dict:
+    box = Outbox(path, mem_max=mem_max, disk_max=n * 2)
+    done = asyncio.Event()
+    consumed = 0
+
+    async def worker():
+        nonlocal consumed
+        while True:
+            oid, _payload, _extra = await box.get()
+            box.ack(oid)
+            consumed += 1
+            if consumed >= n:
+                done.set()
+            if consumed % 256 == 0:
+                await asyncio.sleep(0)
+
+    t0 = time.perf_counter()
+    for i in range(n):
+        box.put(_order_payload(i))
+    enqueue_s = time.perf_counter() - t0
+    spilled = box.spilled_total
+
+    ws = [asyncio.create_task(worker()) for _ in range(workers)]
+    t1 = time.perf_counter()
+    await done.wait()
+    dequeue_s = time.perf_counter() - t1
+    for w in ws:
+        w.cancel()
+    box.close()
+    return {"enqueue": n / enqueue_s, "dequeue": n / dequeue_s, "spilled": spilled}
+
+
+def bench_outbox(args):
+    print(f"{'orders':>8} | {'mem_max':>8} | {'enqueue/s':>10} | {'dequeue+ack/s':>13} | {'spilled':>8}")
+    print("-" * 60)
+    for n in [int(x) for x in args.sizes.split(",") if x.strip()]:
+        with tempfile.TemporaryDirectory() as tmp:
+            r = asyncio.run(_outbox_run(os.path.join(tmp, "outbox.db"), n, args.mem_max, args.workers))
+        print(f"{n:>8} | {args.mem_max:>8} | {r['enqueue']:>10.0f} | {r['dequeue']:>13.0f} | {r['spilled']:>8}")
+
+
+# ===================== RENDER =====================
+def _legacy_links(m: dict) -> tuple:
+    if m["username"]:
+        message_link = f"https://t.me/{m['username']}/{m['msg_id']}"
+        group_link = f"https://t.me/{m['username']}"
+    else:
+        message_link = f"https://t.me/c/{str(m['chat_id']).replace('-100', '')}/{m['msg_id']}"
+        group_link = message_link
+    if m["sender_username"]:
+        title, sender_url = f"@{m['sender_username']}", f"https://t.me/{m['sender_username']}"
+    else:
+        title, sender_url = "Клент личкаси", f"tg://user?id={m['sender_id']}"
+    return message_link, group_link, title, sender_url
+
+
+def _legacy_text(m: dict) -> str:
+    """Eski main.py handler'i: f-string'lar."""
+    message_link, _, title, sender_url = _legacy_links(m)
+    sender_html = f'<a href="{html.escape(sender_url)}">{html.escape(title)}</a>'
+
+    extra_links_text = ""
+    if m["urls"]:
+        extra_links_text = "\n\n" + "\n".join([f"🔗 {html.escape(u)}" for u in m["urls"][:3]])
+    return (
+        f"🔔 <b>Yangi buyurtma</b>\n"
+        f"📍 Guruh: <b>{html.escape(m['title'])}</b>\n"
+        f"👤 Kimdan: {sender_html}\n\n"
+        f"{html.escape(m['text'])}"
+        f"{extra_links_text}\n\n"
+        f"🔗 {message_link}"
+    )
+
+
+def _legacy_payload(m: dict, text: str) -> bytes:
+    """Eski send_to_drivers_group: keyboard list + uniq_keep_order + json.dumps."""
+    message_link, group_link, _, sender_url = _legacy_links(m)
+    keyboard = [[{"text": "👤 Клент личкаси", "url": sender_url}]]
+    keyboard.append([
+        {"text": "👥 Guruhga o'tish", "url": group_link},
+        {"text": "🔗 Xabarga o'tish", "url": message_link},
+    ])
+    seen, extra = set(), []
+    for u in m["urls"]:
+        if u and u not in seen:
+            seen.add(u)
+            extra.append(u)
+    for i, u in enumerate(extra[:3], 1):
+        keyboard.append([{"text": f"🔗 Link {i}", "url": u}])
+    payload = {
+        "chat_id": -1003784903860,
+        "text": text,
+        "parse_mode": "HTML",
+        "disable_web_page_preview": True,
+        "reply_markup": {"inline_keyboard": keyboard},
+    }
+    return json.dumps(payload).encode()
+
+
+def _legacy_render(m: dict) -> bytes:
+    return _legacy_payload(m, _legacy_text(m))
+
+
+def _render_text(m: dict) -> str:
+    message_link = render.message_link(m["chat_id"], m["username"], m["msg_id"])
+    sender_html, _ = render.user_anchor(m["sender_id"], m["sender_username"])
+    return render.render_order(render.group_header(m["chat_id"], m["title"]), sender_html,
+                               m["text"], m["urls"], message_link)
+
+
+def _render_payload(m: dict, text: str) -> bytes:
+    message_link = render.message_link(m["chat_id"], m["username"], m["msg_id"])
+    group_link = render.chat_link(m["chat_id"], m["username"], m["msg_id"])
+    _, sender_url = render.user_anchor(m["sender_id"], m["sender_username"])
+    keyboard = render.keyboard_json(group_link, message_link, m["urls"], sender_url)
+    return render.send_payload(-1003784903860, text, keyboard)
+
+
+def _cached_render(m: dict) -> bytes:
+    return _render_payload(m, _render_text(m))
+
+
+def _render_messages(n: int, groups: int, senders: int, rnd: random.Random) -> list:
+    texts = make_messages(n, rnd, hit_ratio=1.0)
+    out = []
+    for i, text in enumerate(texts):
+        g = rnd.randrange(groups)
+        s = rnd.randrange(senders)
+        out.append({
+            "chat_id": -1001000000000 - g,
+            "username": f"taxi_group_{g}" if g % 3 else None,
+            "title": f"Toshkent <-> Xorazm taxi #{g}",
+            "msg_id": 1000 + i,
+            "sender_id": 500000 + s,
+            "sender_username": f"user_{s}" if s % 2 else None,
+            "text": text,
+            "urls": ["https://t.me/+invite" + str(i)] if i % 10 == 0 else [],
+        })
+    return out
+
+
+def bench_render(args):
+    rnd = random.Random(args.seed)
+    msgs = _render_messages(args.messages, args.groups, args.senders, rnd)
+    assert json.loads(_legacy_render(msgs[0])) == json.loads(_cached_render(msgs[0]))
+
+    # bosqichlar alohida: matn (shablon) va payload (keyboard + JSON)
+    text = _legacy_text(msgs[0])
+    rows = [
+        ("text", lambda m: _legacy_text(m), lambda m: _render_text(m)),
+        ("payload", lambda m: _legacy_payload(m, text), lambda m: _render_payload(m, text)),
+        ("total", _legacy_render, _cached_render),
+    ]
+    print(f"{'messages':>9} | {'stage':>7} | {'legacy us':>9} | {'render us':>9} | {'speedup':>7}")
+    print("-" * 56)
+    for stage, legacy, cached in rows:
+        legacy_us = _timeit(legacy, msgs, args.repeat)
+        cached_us = _timeit(cached, msgs, args.repeat)
+        print(f"{len(msgs):>9} | {stage:>7} | {legacy_us:>9.2f} | {cached_us:>9.2f} | "
+              f"{legacy_us / cached_us:>6.1f}x")
+
+
+# ===================== QUEUE MEMORY =====================
+def _fresh(value):
+    """Pyrogram har xabar uchun yangi str obyekt beradi (bir xil guruh nomi ham)."""
+    return value.encode().decode() if isinstance(value, str) else value
+
+
+def _legacy_item(i: int, m: dict) -> tuple:
+    """Eski handler: navbatga tayyor HTML + linklar (OUTBOX_FIELDS dict)."""
+    title, username, sender_username = _fresh(m["title"]), _fresh(m["username"]), _fresh(m["sender_username"])
+    text, urls = _fresh(m["text"]), [_fresh(u) for u in m["urls"]]
+    message_link = render.message_link(m["chat_id"], username, m["msg_id"])
+    sender_html, sender_url = render.user_anchor(m["sender_id"], sender_username)
+    return i, {
+        "key": [m["chat_id"], m["msg_id"]],
+        "text": render.render_order(render.group_header(m["chat_id"], title), sender_html, text, urls, message_link),
+        "group_link": render.chat_link(m["chat_id"], username, m["msg_id"]),
+        "message_link": message_link,
+        "urls": urls,
+        "sender_url": sender_url,
+        "thread_id": None,
+        "queued_at": time.time(),
+    }
+
+
+def _record_item(i: int, m: dict) -> tuple:
+    return i, OrderRecord(m["chat_id"], m["msg_id"], _fresh(m["username"]), _fresh(m["title"]), m["sender_id"],
+                          _fresh(m["sender_username"]), None, _fresh(m["text"]),
+                          [_fresh(u) for u in m["urls"]], None, time.time())
+
+
+def _queue_bytes(build, msgs: list) -> tuple:
+    """(navbat xotirasi baytda, navbat)."""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    queue = [build(i, m) for i, m in enumerate(msgs)]
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return used, queue
+
+
+def bench_queue(args):
+    rnd = random.Random(args.seed)
+    print(f"{'depth':>7} | {'legacy MB':>9} | {'record MB':>9} | {'B/order':>13} | {'saved':>6} | {'render us':>9}")
+    print("-" * 70)
+    for depth in [int(x) for x in args.sizes.split(",") if x.strip()]:
+        msgs = _render_messages(depth, args.groups, args.senders, rnd)
+        legacy_b, legacy_q = _queue_bytes(_legacy_item, msgs)
+        assert legacy_q[0][1]["text"] == _record_item(0, msgs[0])[1].html()
+        del legacy_q
+        record_b, record_q = _queue_bytes(_record_item, msgs)
+
+        # send paytidagi narx: HTML + keyboard (eskida keyboard ham send paytida yasalardi)
+        t0 = time.perf_counter()
+        for _, rec in record_q:
+            rec.html()
+            rec.keyboard()
+        render_us = (time.perf_counter() - t0) * 1e6 / depth
+        print(f"{depth:>7} | {legacy_b / 1e6:>9.2f} | {record_b / 1e6:>9.2f} | "
+              f"{legacy_b // depth:>5} -> {record_b // depth:>5} | {1 - record_b / legacy_b:>5.0%} | {render_us:>9.2f}")
+
+
+# ===================== STARTUP =====================
+class _StubTelegram:
+    """
+    Dialog sahifalari uchun token bucket: limitdan oshgan so'rov FloodWait oladi
+    (kutish + qayta urinish). Vaqt `scale` bilan qisqartirilgan.
+    """
+
+    def __init__(self, rate: float, burst: float, flood_wait: float):
+        self.rate = rate
+        self.tokens = burst
+        self.burst = burst
+        self.flood_wait = flood_wait
+        self.ts = time.monotonic()
+        self.flood_waits = 0
+
+    async def page(self):
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.ts) * self.rate)
+            self.ts = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                await asyncio.sleep(0.005)  # RTT
+                return
+            self.flood_waits += 1
+            await asyncio.sleep(self.flood_wait)
+
+
+class _StubClient:
+    def __init__(self, tg: _StubTelegram, pages: int, connect: float):
+        self.tg = tg
+        self.pages = pages
+        self.connect = connect
+
+    async def run(self, mark_ready):
+        await asyncio.sleep(self.connect)          # client.start()
+        for _ in range(self.pages):                # sync_all_groups
+            await self.tg.page()
+        mark_ready(True)
+        await asyncio.Event().wait()
+
+
+async def _startup_run(accounts: int, concurrency: int, jitter: float, args) -> dict:
+    rnd = random.Random(args.seed)
+    tg = _StubTelegram(args.rate, args.burst, args.flood_wait)
+    pages = {f"+99890{i:07d}": rnd.randint(1, args.max_pages) for i in range(accounts)}
+    tasks = []
+
+    def spawn(phone, mark):
+        client = _StubClient(tg, pages[phone], rnd.uniform(0.05, 0.15))
+        t = asyncio.create_task(client.run(mark))
+        tasks.append(t)
+        return t
+
+    sched = StartupScheduler(concurrency, jitter, rnd=random.Random(args.seed))
+    sched.launch(StartupScheduler.prioritize(pages, pages.get), spawn)
+    summary = await sched.wait_ready()
+    for t in tasks:
+        t.cancel()
+    summary["flood_waits"] = tg.flood_waits
+    return summary
+
+
+def bench_startup(args):
+    print(f"{'accounts':>8} | {'mode':>16} | {'ready s':>8} | {'p50 s':>6} | {'FloodWait':>9}")
+    print("-" * 60)
+    for n in [int(x) for x in args.sizes.split(",") if x.strip()]:
+        for label, conc, jitter in (("hammasi birdan", n, 0.0),
+                                    (f"limit={args.concurrency}", args.concurrency, args.jitter)):
+            r = asyncio.run(_startup_run(n, conc, jitter, args))
+            print(f"{n:>8} | {label:>16} | {r['time_to_ready']:>8.2f} | {r['p50']:>6.2f} | {r['flood_waits']:>9}")
+
+
+# ===================== ENTRY =====================
+def main():
+    parser = argparse.ArgumentParser(description="UserBot benchmarklari")
+    parser.add_argument("--seed", type=int, default=42)
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("matcher", help="Aho-Corasick vs regex")
+    p.add_argument("--sizes", default="50,500,5000")
+    p.add_argument("--messages", type=int, default=2000)
+    p.add_argument("--repeat", type=int, default=3)
+    p.set_defaults(func=bench_matcher)
+
+    p = sub.add_parser("dedupe", help="forward dedupe contention")
+    p.add_argument("--sizes", default="1000,5000,20000")
+    p.add_argument("--accounts", type=int, default=10)
+    p.add_argument("--workers", type=int, default=10)
+    p.set_defaults(func=bench_dedupe)
+
+    p = sub.add_parser("outbox", help="outbox enqueue/dequeue throughput")
+    p.add_argument("--sizes", default="10000,50000")
+    p.add_argument("--mem-max", type=int, default=15000)
+    p.add_argument("--workers", type=int, default=10)
+    p.set_defaults(func=bench_outbox)
+
+    p = sub.add_parser("render", help="zakaz render + payload: eski vs render.py")
+    p.add_argument("--messages", type=int, default=20000)
+    p.add_argument("--groups", type=int, default=200)
+    p.add_argument("--senders", type=int, default=2000)
+    p.add_argument("--repeat", type=int, default=3)
+    p.set_defaults(func=bench_render)
+
+    p = sub.add_parser("queue", help="to'la navbat xotirasi: tayyor HTML vs OrderRecord")
+    p.add_argument("--sizes", default="15000")
+    p.add_argument("--groups", type=int, default=200)
+    p.add_argument("--senders", type=int, default=2000)
+    p.set_defaults(func=bench_queue)
+
+    p = sub.add_parser("startup", help="stub client: hammasi birdan vs StartupScheduler")
+    p.add_argument("--sizes", default="10,30")
+    p.add_argument("--concurrency", type=int, default=3)
+    p.add_argument("--jitter", type=float, default=0.05)
+    p.add_argument("--max-pages", type=int, default=20)
+    p.add_argument("--rate", type=float, default=50.0, help="dialog sahifa/s (stub server)")
+    p.add_argument("--burst", type=float, default=30.0)
+    p.add_argument("--flood-wait", type=float, default=1.0)
+    p.set_defaults(func=bench_startup)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""Chat-id allow/deny (Pyrogram dispatch bosqichida).
+
+- ChatGate: o'zgarmas snapshot (bloklangan frozenset + ixtiyoriy ruxsat etilgan
+  frozenset). Refresher yangisini yasab bitta assignment bilan almashtiradi,
+  filtr faqat global referensni o'qiydi (lock yo'q).
+- Bloklar watched_groups.is_blocked dan (dashboard'dagi "bloklash" tugmasi);
+  ruxsat ro'yxati bo'sh bo'lsa hamma (bloklanmagan) guruh o'tadi.
+- main.py filtrni handler filtrlarining birinchisi qilib qo'yadi: bloklangan
+  guruh xabari uchun handler coroutine umuman yaratilmaydi.
+
+Pyrogram'ga bog'liq emas (replay.py ham ishlatadi).
+"""
+
+import time
+from typing import FrozenSet, Iterable, Optional
+
+
+class ChatGate:
+    __slots__ = ("blocked", "allowed", "version", "loaded_at")
+
+    def __init__(self, blocked: Iterable[int] = (), allowed: Optional[Iterable[int]] = None,
+                 version: int = 0, loaded_at: float = 0.0):
+        self.blocked: FrozenSet[int] = frozenset(blocked)
+        self.allowed: Optional[FrozenSet[int]] = frozenset(allowed) if allowed else None  # None = hammasi
+        self.version = version
+        self.loaded_at = loaded_at
+
+    @classmethod
+    def empty(cls) -> "ChatGate":
+        return cls()
+
+    def allows(self, chat_id: int) -> bool:
+        if chat_id in self.blocked:
+            return False
+        return self.allowed is None or chat_id in self.allowed
+
+    def replace(self, blocked: Iterable[int], allowed: Optional[Iterable[int]] = None) -> "ChatGate":
+        """Yangi snapshot (o'zgarish bo'lmasa o'zi qaytadi - version oshmaydi)."""
+        blocked = frozenset(blocked)
+        allowed = frozenset(allowed) if allowed else None
+        if blocked == self.blocked and allowed == self.allowed:
+            return self
+        return ChatGate(blocked, allowed, self.version + 1, time.time())
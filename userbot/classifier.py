@@ -0,0 +1,95 @@
+"""Yo'lovchi zakazi vs haydovchi e'loni klassifikatori.
+
+Kalit so'z topilgan xabarlarning katta qismi haydovchilarning o'z e'loni
+("olaman", "mashina bor", "joy bor") - ular navbat, keyword_hits va Bot API
+yuborishni behuda band qiladi.
+
+- OrderClassifier: negative_keywords (ibora -> og'irlik) bitta matcher'ga
+  kompilyatsiya qilinadi (kalit so'z matcher bilan bir xil normallashtirish).
+  Musbat og'irlik = haydovchi e'loni belgisi, manfiy = yo'lovchi belgisi.
+  Har ibora bir marta sanaladi. KeywordSnapshot ichida turadi -> atomar almashadi.
+- SenderHistory: bir sender qisqa vaqt ichida ko'p *turli* post qilsa qo'shimcha
+  ball. Bir postning boshqa guruhlarga tashlangan nusxalari (yo'lovchilar ham
+  zakazni o'nlab guruhga tashlaydi) kontent fingerprint bo'yicha bitta sanaladi.
+  Xotira chegaralangan.
+- Qaror: score >= threshold -> "driver_ad", aks holda "order". Tarix bonusi
+  chegaradan kichik bo'lishi kerak: u faqat iboralar ballini chegaradan o'tkazadi.
+"""
+
+import time
+from collections import OrderedDict, deque
+from typing import Dict, Optional, Tuple
+
+from dedupe import content_tokens
+from matcher import build_matcher
+
+
+class OrderClassifier:
+    __slots__ = ("matcher", "weights", "threshold")
+
+    def __init__(self, negatives: Dict[str, float], engine: str = "aho", threshold: float = 1.5):
+        self.weights = {kw.lower(): float(w) for kw, w in negatives.items() if kw}
+        self.matcher = build_matcher(self.weights.keys(), engine)
+        self.threshold = float(threshold)
+
+    def __len__(self) -> int:
+        return len(self.weights)
+
+    def score(self, text: str) -> Tuple[float, Tuple[str, ...]]:
+        """(ball, topilgan iboralar). Iboralar bo'lmasa (0, ())."""
+        if self.matcher is None or not text:
+            return 0.0, ()
+        found = []
+        total = 0.0
+        for _, _, kw in self.matcher.find_all(text):
+            if kw not in found:
+                found.append(kw)
+                total += self.weights.get(kw, 0.0)
+        return total, tuple(found)
+
+    def decide(self, score: float) -> str:
+        return "driver_ad" if score >= self.threshold else "order"
+
+
+class SenderHistory:
+    """sender_id -> oxirgi `window` sekunddagi turli postlar [vaqt, fingerprint] (LRU, max_senders ta)."""
+
+    def __init__(self, window: float = 3600.0, max_senders: int = 50000, per_sender: int = 16,
+                 clock=time.monotonic):
+        self.window = float(window)
+        self.max_senders = max(1, int(max_senders))
+        self.per_sender = max(1, int(per_sender))
+        self._clock = clock
+        self._posts: "OrderedDict[int, deque]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._posts)
+
+    def observe(self, sender_id: Optional[int], text: str = "") -> int:
+        """Shu postni qo'shadi; oynadagi turli postlar soni (shu post bilan)."""
+        if sender_id is None:
+            return 1
+        fp = hash(content_tokens(text))
+        now = self._clock()
+        posts = self._posts.get(sender_id)
+        if posts is None:
+            posts = self._posts[sender_id] = deque(maxlen=self.per_sender)
+            if len(self._posts) > self.max_senders:
+                self._posts.popitem(last=False)
+        else:
+            self._posts.move_to_end(sender_id)
+        cutoff = now - self.window
+        while posts and posts[0][0] < cutoff:
+            posts.popleft()
+        for post in posts:
+            if post[1] == fp:
+                # cross-post / qayta yuborish: yangi post emas, faqat vaqti yangilanadi
+                posts.remove(post)
+                break
+        posts.append((now, fp))
+        return len(posts)
+
+
+def repeat_bonus(posts: int, free: int, weight: float, cap: float) -> float:
+    """`free` tadan ortiq har bir post uchun `weight` ball (ko'pi bilan `cap`)."""
+    return min(cap, max(0, posts - free) * weight)
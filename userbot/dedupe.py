@@ -0,0 +1,211 @@
+"""Forward dedupe: (chat_id, message_id) va kontent bo'yicha.
+
+ForwardDedupe: (chat_id, message_id) -> queued/sent.
+
+- O(1) lookup (dict), vaqt bo'yicha tartiblangan (OrderedDict) -> expiry
+  faqat boshidan eskilarini olib tashlaydi (amortized O(1), to'liq sweep yo'q).
+- Qattiq limit (max_size): to'lsa eng eskisi chiqariladi.
+- Har bir yozuv: kichik tuple (ts, status, owner), dict emas.
+- Barcha metodlar sinxron: asyncio'da await yo'q joyda atomar, lock kerak emas.
+
+ContentDedupe: bir xil zakaz 20 ta guruhga tashlansa bitta forward.
+- Kalit: sender id + normallashgan matn tokenlari (sliding window).
+- Kichik tahrirlar (Jaccard >= threshold) ham dublikat hisoblanadi.
+"""
+
+import re
+import time
+from collections import OrderedDict
+from typing import FrozenSet, Hashable, List, Optional, Tuple
+
+from matcher import normalize_text
+
+QUEUED = 1
+SENT = 2
+
+_STATUS_NAMES = {QUEUED: "queued", SENT: "sent"}
+
+
+class ForwardDedupe:
+    __slots__ = ("ttl", "stale_ttl", "max_size", "_entries", "_clock", "expired", "evicted")
+
+    def __init__(self, ttl: float, stale_ttl: float, max_size: int = 200_000, clock=time.monotonic):
+        self.ttl = float(ttl)
+        self.stale_ttl = float(stale_ttl)
+        self.max_size = max(1, int(max_size))
+        self._entries: "OrderedDict[Hashable, Tuple[float, int, Optional[str]]]" = OrderedDict()
+        self._clock = clock
+        self.expired = 0
+        self.evicted = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key) -> bool:
+        return key in self._entries
+
+    def status(self, key) -> Optional[str]:
+        st = self._entries.get(key)
+        return _STATUS_NAMES.get(st[1]) if st else None
+
+    def owner(self, key) -> Optional[str]:
+        st = self._entries.get(key)
+        return st[2] if st else None
+
+    def _expire(self, now: float):
+        entries = self._entries
+        deadline = now - self.ttl
+        while entries:
+            key, st = next(iter(entries.items()))
+            if st[0] >= deadline:
+                break
+            entries.popitem(last=False)
+            self.expired += 1
+
+    def _put(self, key, st: Tuple[float, int, Optional[str]]):
+        entries = self._entries
+        entries[key] = st
+        entries.move_to_end(key)
+        while len(entries) > self.max_size:
+            entries.popitem(last=False)
+            self.evicted += 1
+
+    def claim(self, key, owner: Optional[str] = None) -> bool:
+        """
+        True bo'lsa: chaqiruvchi xabarni navbatga qo'yishi kerak (status=queued).
+        False: allaqachon yuborilgan yoki boshqa akkaunt yaqinda navbatga qo'ygan.
+        queued QUEUE_STALE_TTL dan eski bo'lsa boshqa akkaunt takeover qiladi.
+        """
+        now = self._clock()
+        self._expire(now)
+
+        st = self._entries.get(key)
+        if st:
+            if st[1] == SENT:
+                return False
+            if st[1] == QUEUED and (now - st[0]) < self.stale_ttl:
+                return False
+
+        self._put(key, (now, QUEUED, owner))
+        return True
+
+    def mark_sent(self, key):
+        now = self._clock()
+        old = self._entries.get(key)
+        self._put(key, (now, SENT, old[2] if old else None))
+        self._expire(now)
+
+    def release(self, key):
+        """Yuborilmadi / navbatga sig'madi: boshqa akkaunt qayta urinishi mumkin."""
+        self._entries.pop(key, None)
+
+
+# ===================== CONTENT DEDUPE =====================
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def content_tokens(text: str, max_tokens: int = 64) -> FrozenSet[str]:
+    """Normallashgan matn tokenlari (birinchi max_tokens ta, tartibsiz to'plam)."""
+    return frozenset(_TOKEN_RE.findall(normalize_text(text))[:max_tokens])
+
+
+class ContentEntry:
+    __slots__ = ("sender", "ts", "tokens", "groups")
+
+    def __init__(self, sender, ts: float, tokens: FrozenSet[str], chat_id: int):
+        self.sender = sender
+        self.ts = ts
+        self.tokens = tokens
+        self.groups = {chat_id}
+
+    @property
+    def also_posted(self) -> int:
+        """Birinchi guruhdan tashqari yana nechta guruhda ko'rildi."""
+        return len(self.groups) - 1
+
+
+class ContentDedupe:
+    """
+    sender -> oxirgi bir nechta zakaz (ts, tokens).
+    Xotira: max_senders * per_sender yozuvdan oshmaydi.
+    """
+
+    __slots__ = ("window", "threshold", "min_tokens", "max_senders", "per_sender",
+                 "_senders", "_clock", "duplicates")
+
+    def __init__(self, window: float, threshold: float = 0.8, min_tokens: int = 3,
+                 max_senders: int = 20_000, per_sender: int = 8, clock=time.monotonic):
+        self.window = float(window)
+        self.threshold = float(threshold)
+        self.min_tokens = int(min_tokens)
+        self.max_senders = max(1, int(max_senders))
+        self.per_sender = max(1, int(per_sender))
+        self._senders: "OrderedDict[Hashable, List[ContentEntry]]" = OrderedDict()
+        self._clock = clock
+        self.duplicates = 0
+
+    def __len__(self) -> int:
+        return len(self._senders)
+
+    def _similar(self, a: FrozenSet[str], b: FrozenSet[str]) -> bool:
+        if a == b:
+            return True
+        inter = len(a & b)
+        if not inter:
+            return False
+        return inter / (len(a) + len(b) - inter) >= self.threshold
+
+    def _expire(self, now: float):
+        senders = self._senders
+        deadline = now - self.window
+        while senders:
+            sender, entries = next(iter(senders.items()))
+            if entries and entries[-1].ts >= deadline:
+                break
+            senders.popitem(last=False)
+
+    def observe(self, sender_id, text: str, chat_id: int) -> Tuple[Optional[ContentEntry], bool]:
+        """
+        Qaytaradi: (entry, is_duplicate).
+        entry None bo'lsa kontent dedupe qo'llanmadi (sender yo'q / matn juda qisqa).
+        """
+        if sender_id is None:
+            return None, False
+        tokens = content_tokens(text)
+        if len(tokens) < self.min_tokens:
+            return None, False
+
+        now = self._clock()
+        self._expire(now)
+
+        deadline = now - self.window
+        entries = self._senders.get(sender_id)
+        if entries:
+            entries[:] = [e for e in entries if e.ts >= deadline]
+            for e in entries:
+                if self._similar(tokens, e.tokens):
+                    e.groups.add(chat_id)
+                    self.duplicates += 1
+                    return e, True
+        else:
+            entries = []
+
+        entry = ContentEntry(sender_id, now, tokens, chat_id)
+        entries.append(entry)
+        if len(entries) > self.per_sender:
+            del entries[0]
+
+        senders = self._senders
+        senders[sender_id] = entries
+        senders.move_to_end(sender_id)
+        while len(senders) > self.max_senders:
+            senders.popitem(last=False)
+        return entry, False
+
+    def forget(self, entry: Optional[ContentEntry]):
+        """Yuborish muvaffaqiyatsiz bo'lsa: keyingi nusxa qayta forward qilinsin."""
+        if entry is None:
+            return
+        entries = self._senders.get(entry.sender)
+        if entries and entry in entries:
+            entries.remove(entry)
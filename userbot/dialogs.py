@@ -0,0 +1,217 @@
+"""Inkremental dialog sync (get_dialogs to'liq skan o'rniga).
+
+- messages.GetDialogs raw sahifalash: har sahifadan keyin offset (date, id, peer)
+  checkpoint faylga yoziladi -> FloodWait yoki restartdan keyin shu joydan davom.
+- Dialoglar oxirgi xabar sanasi bo'yicha tartiblangan: inkremental rejimda
+  oldingi skandagi eng yangi sanadan (watermark) eskisiga yetganda to'xtaymiz.
+  Qo'shilish / nom o'zgarishi service xabar beradi -> dialog tepaga chiqadi.
+- Chiqib ketilgan guruhlarni faqat to'liq skan aniqlaydi (prune faqat shunda),
+  runtime'da esa join/leave update'lari bilan kesh yangilanadi.
+- Natija group_id bo'yicha dict (dublikat yo'q).
+"""
+
+import asyncio
+import json
+import os
+import time
+from typing import Dict, Optional, Tuple
+
+from pyrogram import raw, utils
+from pyrogram.errors import FloodWait
+
+
+# ===================== CHECKPOINT =====================
+class DialogCheckpoint:
+    """sessions/dialogs_<phone>.json: watermark + to'liq skan vaqti + tugallanmagan skan holati."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.watermark = 0            # oxirgi muvaffaqiyatli skandagi eng yangi top message sanasi
+        self.full_at = 0.0            # oxirgi tugallangan to'liq skan (unix)
+        self.scan: Optional[dict] = None  # {"offset_date", "offset_id", "offset_peer", "found", "max_date"}
+
+    @classmethod
+    def load(cls, path: str) -> "DialogCheckpoint":
+        cp = cls(path)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            cp.watermark = int(data.get("watermark") or 0)
+            cp.full_at = float(data.get("full_at") or 0)
+            cp.scan = data.get("scan") or None
+        except (OSError, ValueError):
+            pass
+        return cp
+
+    def save(self):
+        tmp = self.path + ".tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"watermark": self.watermark, "full_at": self.full_at, "scan": self.scan},
+                          f, ensure_ascii=False)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            print(f"⚠️ Dialog checkpoint yozilmadi: {e}")
+
+    def needs_full(self, max_age: float, have_groups: bool) -> bool:
+        return (
+            self.scan is not None           # tugallanmagan to'liq skan -> davom ettiramiz
+            or not have_groups              # keshda guruhlar yo'q -> inkremental yetarli emas
+            or not self.watermark
+            or time.time() - self.full_at > max_age
+        )
+
+    def commit(self, max_date: int, full: bool):
+        """Guruhlar bazaga yozilgandan keyin chaqiriladi (yo'qolgan yangilanish bo'lmasin)."""
+        self.watermark = max(self.watermark, int(max_date or 0))
+        if full:
+            self.full_at = time.time()
+            self.scan = None
+        self.save()
+
+
+# ===================== RAW HELPERS =====================
+def group_from_chat(chat) -> Optional[Tuple[int, str]]:
+    """raw Chat/Channel -> (group_id, title) faqat a'zo bo'lgan guruh/superguruh uchun."""
+    if isinstance(chat, raw.types.Chat):
+        if chat.left or chat.deactivated:
+            return None
+        return -chat.id, chat.title or f"Guruh {-chat.id}"
+    if isinstance(chat, raw.types.Channel):
+        if not chat.megagroup or chat.left:
+            return None
+        gid = utils.get_channel_id(chat.id)
+        return gid, chat.title or f"Guruh {gid}"
+    return None
+
+
+def _peer_to_json(peer, users: dict, chats: dict) -> dict:
+    if isinstance(peer, raw.types.PeerUser):
+        u = users.get(peer.user_id)
+        return {"kind": "user", "id": peer.user_id, "access_hash": getattr(u, "access_hash", 0) or 0}
+    if isinstance(peer, raw.types.PeerChat):
+        return {"kind": "chat", "id": peer.chat_id, "access_hash": 0}
+    c = chats.get(peer.channel_id)
+    return {"kind": "channel", "id": peer.channel_id, "access_hash": getattr(c, "access_hash", 0) or 0}
+
+
+def _input_peer(data: Optional[dict]):
+    if not data:
+        return raw.types.InputPeerEmpty()
+    if data["kind"] == "user":
+        return raw.types.InputPeerUser(user_id=data["id"], access_hash=data["access_hash"])
+    if data["kind"] == "chat":
+        return raw.types.InputPeerChat(chat_id=data["id"])
+    return raw.types.InputPeerChannel(channel_id=data["id"], access_hash=data["access_hash"])
+
+
+# ===================== SCAN =====================
+async def scan_dialogs(client, cp: DialogCheckpoint, full: bool,
+                       page_size: int = 100) -> Tuple[Dict[int, str], int, int]:
+    """
+    Qaytaradi: (groups {group_id: title}, max_date, pages).
+    full=True: oxirigacha (checkpoint'dagi offsetdan davom etadi, har sahifada saqlanadi).
+    full=False: watermark'dan eski dialogga yetganda to'xtaydi.
+    """
+    if full and cp.scan:
+        st = cp.scan
+        found = {int(k): v for k, v in (st.get("found") or {}).items()}
+        offset_date, offset_id = int(st.get("offset_date") or 0), int(st.get("offset_id") or 0)
+        offset_peer = st.get("offset_peer")
+        max_date = int(st.get("max_date") or 0)
+    else:
+        found, offset_date, offset_id, offset_peer, max_date = {}, 0, 0, None, 0
+
+    pages = 0
+    while True:
+        try:
+            r = await client.invoke(
+                raw.functions.messages.GetDialogs(
+                    offset_date=offset_date,
+                    offset_id=offset_id,
+                    offset_peer=_input_peer(offset_peer),
+                    limit=page_size,
+                    hash=0,
+                ),
+                sleep_threshold=60,
+            )
+        except FloodWait as fw:
+            # ✅ boshidan emas, shu sahifadan davom etamiz
+            wait_s = int(getattr(fw, "value", 0) or 0)
+            print(f"⏳ Dialog sync FloodWait {wait_s}s (sahifa {pages + 1}) -> davom etadi")
+            await asyncio.sleep(wait_s + 1)
+            continue
+
+        if isinstance(r, raw.types.messages.DialogsNotModified):
+            break
+
+        pages += 1
+        users = {u.id: u for u in r.users}
+        chats = {c.id: c for c in r.chats}
+
+        messages = {}
+        for m in r.messages:
+            if not isinstance(m, raw.types.MessageEmpty):
+                messages[(utils.get_peer_id(m.peer_id), m.id)] = m
+
+        dialogs = [d for d in r.dialogs if isinstance(d, raw.types.Dialog)]
+        reached_old = False
+        last = None
+        for d in dialogs:
+            peer = d.peer
+            if isinstance(peer, raw.types.PeerChat):
+                g = group_from_chat(chats.get(peer.chat_id))
+            elif isinstance(peer, raw.types.PeerChannel):
+                g = group_from_chat(chats.get(peer.channel_id))
+            else:
+                g = None
+            if g:
+                found[g[0]] = g[1]
+
+            top = messages.get((utils.get_peer_id(peer), d.top_message))
+            if top is None:
+                continue
+            max_date = max(max_date, top.date)
+            last = (d, top)
+            if not full and not d.pinned and top.date < cp.watermark:
+                reached_old = True
+
+        done = (
+            reached_old
+            or last is None
+            or isinstance(r, raw.types.messages.Dialogs)   # slice emas = hammasi keldi
+            or len(r.dialogs) < page_size
+        )
+        if done:
+            break
+
+        d, top = last
+        offset_date, offset_id = top.date, top.id
+        offset_peer = _peer_to_json(d.peer, users, chats)
+        if full:
+            cp.scan = {
+                "offset_date": offset_date, "offset_id": offset_id, "offset_peer": offset_peer,
+                "found": {str(k): v for k, v in found.items()}, "max_date": max_date,
+            }
+            cp.save()
+
+    return found, max_date, pages
+
+
+# ===================== RUNTIME UPDATES =====================
+def membership_change(update, chats: dict) -> Optional[Tuple[str, int, str]]:
+    """
+    raw UpdateChannel -> ("join" | "leave", group_id, title) yoki None.
+    Superguruhga qo'shilish / chiqarib yuborilish shu update bilan keladi.
+    """
+    if not isinstance(update, raw.types.UpdateChannel):
+        return None
+    chat = chats.get(update.channel_id)
+    gid = utils.get_channel_id(update.channel_id)
+    if isinstance(chat, raw.types.ChannelForbidden):
+        return "leave", gid, chat.title
+    if isinstance(chat, raw.types.Channel) and chat.megagroup:
+        if chat.left:
+            return "leave", gid, chat.title
+        return "join", gid, chat.title or f"Guruh {gid}"
+    return None
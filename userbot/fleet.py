@@ -0,0 +1,170 @@
+"""Akkauntlar flotini boshqarish (client yiqilsa qayta ishga tushirish).
+
+- Har bir raqam uchun supervise task: run() tugasa yoki xato bersa
+  exponential backoff bilan qayta ishga tushiradi (uzoq barqaror ishlagan
+  bo'lsa backoff qaytadan boshlanadi).
+- run() "fatal" qaytarsa (qayta login kerak / boshqa joyda ishlayapti)
+  to'xtaydi; bazada status qaytadan runnable bo'lganda plan() uni qayta yoqadi.
+- plan(): userbot_accounts holatiga qarab qo'shiladigan / olib tashlanadigan
+  raqamlar (process'ni restart qilmasdan): qator o'chirilsa yoki dashboard'da
+  status runnable bo'lmasa client to'xtaydi.
+- Uptime: har akkaunt qancha vaqt "up" bo'lgani.
+"""
+
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+RunFn = Callable[[str, Callable[[bool], None]], Awaitable[Optional[str]]]
+
+
+class AccountState:
+    __slots__ = ("phone", "status", "created_at", "up_since", "up_total",
+                 "restarts", "last_error", "backoff", "armed")
+
+    def __init__(self, phone: str, backoff: float, now: float):
+        self.phone = phone
+        self.status = "starting"     # starting | up | backoff | fatal | stopped
+        self.created_at = now
+        self.up_since: Optional[float] = None
+        self.up_total = 0.0
+        self.restarts = 0
+        self.last_error: Optional[str] = None
+        self.backoff = backoff
+        self.armed = False           # fatal: bazada bizning statusimiz ko'rindi -> endi o'zgarishni kutamiz
+
+
+class FleetSupervisor:
+    def __init__(self, run: RunFn, tasks: Optional[Dict[str, asyncio.Task]] = None,
+                 min_backoff: float = 5.0, max_backoff: float = 300.0, stable_after: float = 300.0,
+                 clock=time.monotonic):
+        self.run = run
+        self.tasks: Dict[str, asyncio.Task] = tasks if tasks is not None else {}
+        self.states: Dict[str, AccountState] = {}
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.stable_after = stable_after
+        self._clock = clock
+
+    # ---------- lifecycle ----------
+    def add(self, phone: str, on_ready: Optional[Callable[[bool], None]] = None) -> asyncio.Task:
+        task = self.tasks.get(phone)
+        if task is not None and not task.done():
+            return task
+        st = self.states.get(phone)
+        if st is None:
+            st = self.states[phone] = AccountState(phone, self.min_backoff, self._clock())
+        st.armed = False
+        st.backoff = self.min_backoff
+        task = self.tasks[phone] = asyncio.create_task(self._supervise(st, on_ready))
+        return task
+
+    async def remove(self, phone: str):
+        task = self.tasks.pop(phone, None)
+        if task is not None and not task.done():
+            task.cancel()
+            try:
+                await task
+            except (asyncio.CancelledError, Exception):
+                pass
+        st = self.states.get(phone)
+        if st:
+            st.status = "stopped"
+
+    def _mark_down(self, st: AccountState):
+        if st.up_since is not None:
+            st.up_total += self._clock() - st.up_since
+            st.up_since = None
+
+    async def _supervise(self, st: AccountState, on_ready):
+        while True:
+            st.status = "starting"
+            started = self._clock()
+
+            def ready(ok: bool = True):
+                if ok and st.up_since is None:
+                    st.up_since = self._clock()
+                    st.status = "up"
+                if on_ready:
+                    on_ready(ok)
+
+            try:
+                verdict = await self.run(st.phone, ready)
+            except asyncio.CancelledError:
+                self._mark_down(st)
+                st.status = "stopped"
+                raise
+            except Exception as e:
+                verdict = "retry"
+                st.last_error = str(e)
+            self._mark_down(st)
+
+            if verdict == "fatal":
+                st.status = "fatal"
+                print(f"⛔ [{st.phone}] to'xtatildi (bazada status o'zgarishi kutilmoqda)")
+                return
+
+            if self._clock() - started >= self.stable_after:
+                st.backoff = self.min_backoff
+            st.restarts += 1
+            st.status = "backoff"
+            print(f"🔁 [{st.phone}] {st.backoff:.0f}s dan keyin qayta ulanadi (restart #{st.restarts})")
+            await asyncio.sleep(st.backoff)
+            st.backoff = min(self.max_backoff, st.backoff * 2)
+
+    async def stop_all(self):
+        for phone in list(self.tasks):
+            await self.remove(phone)
+
+    # ---------- reconcile ----------
+    def plan(self, db_statuses: Dict[str, str], runnable: Iterable[str],
+             keep: Iterable[str] = ()) -> Tuple[List[str], List[str]]:
+        """
+        db_statuses: phone -> status (userbot_accounts).
+        keep: client o'zi yozadigan vaqtinchalik statuslar (masalan "error" -> backoff'da
+        qayta ulanadi) - ishlayotgan client bular uchun to'xtatilmaydi.
+        Qaytaradi: (ishga tushirish, to'xtatish).
+          - bazada runnable, lekin bizda yo'q        -> start
+          - fatal: avval runnable bo'lmagan status ko'rilgan, keyin yana runnable -> start
+          - bazadan o'chirilgan                       -> stop
+          - ishlayapti, status runnable/keep emas    -> stop (dashboard'dan o'chirildi)
+        """
+        runnable = set(runnable)
+        keep = set(keep)
+        to_start, to_stop = [], []
+        for phone, status in db_statuses.items():
+            st = self.states.get(phone)
+            task = self.tasks.get(phone)
+            if st is not None and st.status == "fatal":
+                if status not in runnable:
+                    st.armed = True
+                elif st.armed:
+                    to_start.append(phone)
+                continue
+            alive = task is not None and not task.done()
+            if status in runnable:
+                if not alive:
+                    to_start.append(phone)
+            elif alive and status not in keep:
+                to_stop.append(phone)
+        for phone in list(self.tasks):
+            if phone not in db_statuses:
+                to_stop.append(phone)
+        return to_start, to_stop
+
+    # ---------- stats ----------
+    def up_count(self) -> int:
+        return sum(1 for st in self.states.values() if st.status == "up")
+
+    def total_restarts(self) -> int:
+        return sum(st.restarts for st in self.states.values())
+
+    def uptime(self, phone: str) -> float:
+        """0..1: kuzatuv boshlanganidan beri "up" bo'lgan ulush."""
+        st = self.states.get(phone)
+        if st is None:
+            return 0.0
+        now = self._clock()
+        up = st.up_total + (now - st.up_since if st.up_since is not None else 0.0)
+        span = now - st.created_at
+        return up / span if span > 0 else 0.0
@@ -9,20 +9,39 @@ Muhim:
 
 import os
 import sys
+import signal
 import asyncio
 import aiohttp
 import time
-import html
 import re
+import random
 from typing import Optional, List, Tuple, Dict
 
 from dotenv import load_dotenv
 from pyrogram import Client, filters
 from pyrogram.types import Message
 from pyrogram.enums import ChatType, MessageEntityType
-from pyrogram.errors import FloodWait
 from supabase import create_client, Client as SupabaseClient
 
+from batching import send_orders, utf16_len
+from chatgate import ChatGate
+from classifier import OrderClassifier, SenderHistory, repeat_bonus
+from dedupe import ContentDedupe, ForwardDedupe
+from dialogs import DialogCheckpoint, membership_change, scan_dialogs
+from fleet import FleetSupervisor
+from matcher import KeywordSnapshot, compile_snapshot
+from metrics import Registry, start_metrics_server
+from orders import OrderRecord
+from outbox import Outbox
+from ownership import OwnershipMap
+from writer import SupabaseWriter
+from ratelimit import SendScheduler
+import render
+from session_store import BoundedMemoryStorage, valid_session_string
+from shards import IpcClient, IpcServer, WorkerSupervisor, shard_for_phone
+from stats import HourlyStats
+from startup import StartupScheduler
+
 load_dotenv()
 
 # ===================== ENV =====================
@@ -32,6 +51,7 @@ SUPABASE_URL = os.getenv("SUPABASE_URL", "")
 SUPABASE_KEY = os.getenv("SUPABASE_SERVICE_KEY", "")
 DRIVERS_GROUP_ID = int(os.getenv("DRIVERS_GROUP_ID", "-1003784903860"))
 BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN", "")
+BOT_API_BASE = (os.getenv("BOT_API_BASE", "") or "https://api.telegram.org").rstrip("/")  # local Bot API / replay.py
 ADMIN_ID = int(os.getenv("ADMIN_ID", "7748145808") or "7748145808")
 
 PHONE_NUMBERS_RAW = os.getenv("PHONE_NUMBER", "")
@@ -41,40 +61,175 @@ PHONE_NUMBERS_ENV_FALLBACK = [
 
 # Perf / scale knobs
 SEND_WORKERS = int(os.getenv("SEND_WORKERS", "10") or "10")  # katta guruhlar uchun ko'proq worker
+SEND_LANE_WORKERS = int(os.getenv("SEND_LANE_WORKERS", "3") or "3")  # qo'shimcha manzillar (har biriga)
 QUEUE_MAX = int(os.getenv("QUEUE_MAX", "15000") or "15000")  # katta guruhlar uchun katta queue
+SYNC_CHUNK = int(os.getenv("SYNC_CHUNK", "500") or "500")  # group sync: bitta upsert'dagi qatorlar
+MATCHER_ENGINE = os.getenv("MATCHER_ENGINE", "aho") or "aho"  # aho | regex
+
+# Startup: bir vaqtda nechta akkaunt ulanadi + har biri oldidan jitter (s)
+STARTUP_CONCURRENCY = int(os.getenv("STARTUP_CONCURRENCY", "3") or "3")
+STARTUP_JITTER = float(os.getenv("STARTUP_JITTER", "2") or "0")
+
+# Fleet: client yiqilsa qayta ulanish (exponential backoff) + userbot_accounts'ni kuzatish
+FLEET_MIN_BACKOFF = float(os.getenv("FLEET_MIN_BACKOFF", "5") or "5")
+FLEET_MAX_BACKOFF = float(os.getenv("FLEET_MAX_BACKOFF", "300") or "300")
+FLEET_STABLE_AFTER = float(os.getenv("FLEET_STABLE_AFTER", "300") or "300")  # shuncha ishlasa backoff reset
+ACCOUNTS_POLL = int(os.getenv("ACCOUNTS_POLL", os.getenv("OWNERSHIP_REFRESH", "30")) or "30")  # sekund
+RUNNABLE_STATUSES = ("pending", "active", "connecting")
+SELF_MANAGED_STATUSES = ("error",)  # client o'zi yozadi va backoff bilan qayta ulanadi -> to'xtatilmaydi
 
 # ===================== SESSION DIR (MUHIM) =====================
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 SESS_DIR = os.path.join(BASE_DIR, "sessions")
 os.makedirs(SESS_DIR, exist_ok=True)
 
-# ===================== GLOBALS =====================
-supabase: SupabaseClient = None
+# file = sessions/userbot_<raqam>.session (SQLite, har update'da diskka yozadi);
+# memory = userbot_accounts.session_string dan xotirada (disk I/O yo'q, host'lar orasida ko'chadi).
+# memory rejimida bazada haqiqiy string bo'lmasa fayl session ishlatiladi va ulangach string saqlanadi.
+SESSION_MODE = (os.getenv("SESSION_MODE", "file") or "file").lower()
+PEER_CACHE_MAX = int(os.getenv("PEER_CACHE_MAX", "50000") or "50000")  # memory: peers jadvali limiti
+SESSION_SNAPSHOT_SECONDS = int(os.getenv("SESSION_SNAPSHOT_SECONDS", "0") or "0")  # 0 = faqat ulanganda
 
-keywords_cache: List[str] = []
-keywords_map: Dict[str, int] = {}
-keywords_regex = None
-last_cache_update = 0
-CACHE_TTL = 300  # 5 min
+# Supabase write-behind (keyword_hits bulk insert)
+DB_WORKERS = int(os.getenv("DB_WORKERS", "4") or "4")
+DB_BATCH_SIZE = int(os.getenv("DB_BATCH_SIZE", "200") or "200")
+DB_FLUSH_MS = int(os.getenv("DB_FLUSH_MS", "500") or "500")
 
-watched_groups_cache = set()
-account_groups_cache: Dict[str, set] = {}
+# Statistika: soatlik rollup'lar xotirada, har N sekundda bitta RPC bilan bazaga.
+# keyword_hits (xom qator + preview) endi namuna: 1 = hammasi, 0 = o'chiq
+STATS_FLUSH_SECONDS = int(os.getenv("STATS_FLUSH_SECONDS", "60") or "60")
+KEYWORD_HITS_SAMPLE = float(os.getenv("KEYWORD_HITS_SAMPLE", "0.1") or "0")
+
+# ===================== GLOBALS =====================
+supabase: SupabaseClient = None
+db_writer: SupabaseWriter = None  # main() da ishga tushadi
+
+keywords_snapshot = KeywordSnapshot.empty()  # handler faqat shu referensni o'qiydi
+_keyword_rows: Dict[str, tuple] = {}           # keywords.id -> (keyword, dest_chat, dest_thread) (refresher ichki holati)
+_keywords_since: Optional[str] = None           # eng oxirgi created_at
+KEYWORDS_REFRESH = int(os.getenv("KEYWORDS_REFRESH", "60") or "60")  # sekund
+KEYWORDS_FULL_RELOAD_EVERY = int(os.getenv("KEYWORDS_FULL_RELOAD_EVERY", "30") or "30")  # har N siklda
+
+# ===== KLASSIFIKATOR (yo'lovchi zakazi vs haydovchi e'loni) =====
+# off | shadow (faqat log + keyword_hits'ga qaror yoziladi) | enforce (e'lon yuborilmaydi)
+CLASSIFIER_MODE = (os.getenv("CLASSIFIER_MODE", "shadow") or "shadow").lower()
+CLASSIFIER_THRESHOLD = float(os.getenv("CLASSIFIER_THRESHOLD", "1.5") or "1.5")
+CLASSIFIER_REPEAT_FREE = int(os.getenv("CLASSIFIER_REPEAT_FREE", "2") or "2")  # oynada shuncha post - normal
+CLASSIFIER_REPEAT_WEIGHT = float(os.getenv("CLASSIFIER_REPEAT_WEIGHT", "0.5") or "0")
+CLASSIFIER_REPEAT_CAP = float(os.getenv("CLASSIFIER_REPEAT_CAP", "1.0") or "0")  # < THRESHOLD
+CLASSIFIER_HISTORY_WINDOW = int(os.getenv("CLASSIFIER_HISTORY_WINDOW", "3600") or "3600")
+_negative_rows: Dict[str, float] = {}          # negative_keywords: ibora -> og'irlik
+sender_history = SenderHistory(CLASSIFIER_HISTORY_WINDOW)
+
+watched_groups_cache: Dict[int, str] = {}          # group_id -> group_name
+account_groups_cache: Dict[str, Dict[int, str]] = {}  # phone -> {group_id: group_name}
 groups_cache_loaded = False
+groups_cache_synced_at: Optional[str] = None  # eng oxirgi created_at (inkremental refresh uchun)
+CACHE_PAGE_SIZE = int(os.getenv("CACHE_PAGE_SIZE", "1000") or "1000")
+GROUPS_CACHE_REFRESH = int(os.getenv("GROUPS_CACHE_REFRESH", "600") or "600")
+DIALOGS_PAGE_SIZE = int(os.getenv("DIALOGS_PAGE_SIZE", "100") or "100")
+DIALOGS_FULL_SYNC_HOURS = float(os.getenv("DIALOGS_FULL_SYNC_HOURS", "24") or "24")  # prune shu skanda
+
+# ===== CHAT GATE (watched_groups.is_blocked -> Pyrogram filtr, handler'dan oldin) =====
+CHAT_GATE_REFRESH = int(os.getenv("CHAT_GATE_REFRESH", "15") or "15")  # sekund
+ALLOWED_GROUP_IDS = [int(x) for x in (os.getenv("ALLOWED_GROUP_IDS", "") or "").split(",") if x.strip()]
+chat_gate = ChatGate.empty()  # filtr faqat shu referensni o'qiydi
+
+# ===== GROUP OWNERSHIP (har guruhni bitta akkaunt qayta ishlaydi) =====
+GROUP_OWNERSHIP = os.getenv("GROUP_OWNERSHIP", "1") == "1"
+ownership_map = OwnershipMap.empty()  # handler faqat shu referensni o'qiydi
+account_status: Dict[str, str] = {}   # phone -> status (lokal + bazadan)
+_ownership_dirty = True
+_ownership_task: Optional[asyncio.Task] = None
 
 account_stats = {}          # phone -> {"groups_count": N, "active_count": N}
-running_clients = {}        # phone -> asyncio.Task
+hourly_stats = HourlyStats()  # soatlik rollup'lar (stats_flusher yozadi)
+running_clients = {}        # phone -> asyncio.Task (fleet supervise task)
+peer_storages: Dict[str, BoundedMemoryStorage] = {}  # phone -> xotiradagi session (memory rejimi)
+_session_strings: Dict[str, Optional[str]] = {}      # phone -> bazadagi oxirgi session_string
+fleet: FleetSupervisor = None
 ALL_PHONES = []             # full phones list for statistics
 
 # ===== DEDUPE (MUHIM!) =====
-forwarded_cache: Dict[Tuple[int, int], Dict[str, float]] = {}
 FORWARD_TTL = 300
 QUEUE_STALE_TTL = 15  # queued bo'lib qolsa 15s dan keyin boshqa akkaunt takeover qiladi
-forward_lock = asyncio.Lock()
-
-# ===== OUTBOUND QUEUE =====
-send_queue: asyncio.Queue = asyncio.Queue(maxsize=QUEUE_MAX)
+FORWARD_CACHE_MAX = int(os.getenv("FORWARD_CACHE_MAX", "200000") or "200000")
+forwarded_cache = ForwardDedupe(FORWARD_TTL, QUEUE_STALE_TTL, FORWARD_CACHE_MAX)
+
+# ===== CONTENT DEDUPE (bir zakaz ko'p guruhda) =====
+CONTENT_DEDUPE_WINDOW = int(os.getenv("CONTENT_DEDUPE_WINDOW", "600") or "600")  # 0 = o'chiq
+CONTENT_DEDUPE_SIMILARITY = float(os.getenv("CONTENT_DEDUPE_SIMILARITY", "0.8") or "0.8")
+CONTENT_DEDUPE_SHOW_GROUPS = os.getenv("CONTENT_DEDUPE_SHOW_GROUPS", "1") == "1"
+content_cache = ContentDedupe(CONTENT_DEDUPE_WINDOW, CONTENT_DEDUPE_SIMILARITY)
+
+# ===== OUTBOUND QUEUE (diskda, restartdan keyin qayta yuboriladi) =====
+OUTBOX_PATH = os.getenv("OUTBOX_PATH", "") or os.path.join(SESS_DIR, "outbox.db")
+OUTBOX_DISK_MAX = int(os.getenv("OUTBOX_DISK_MAX", "500000") or "500000")
+send_queue: Outbox = None  # main() da ochiladi
+# vaqtinchalik xato (tarmoq/5xx/429): SEND_RETRY_BASE_DELAY dan ikki baravar oshib
+# SEND_RETRY_MAX_DELAY gacha; SEND_RETRY_MAX urinishdan keyin tashlanadi (0 = cheksiz)
+SEND_RETRY_MAX = int(os.getenv("SEND_RETRY_MAX", "10") or "0")
+SEND_RETRY_BASE_DELAY = float(os.getenv("SEND_RETRY_BASE_DELAY", "2") or "2")
+SEND_RETRY_MAX_DELAY = float(os.getenv("SEND_RETRY_MAX_DELAY", "300") or "300")
 aiohttp_session: aiohttp.ClientSession = None
 
+# ===== BOT API RATE LIMIT (Telegram: ~30 msg/s global, guruhga ~20 msg/min) =====
+SEND_GLOBAL_RATE = float(os.getenv("SEND_GLOBAL_RATE", "30") or "30")
+SEND_CHAT_RATE_PER_MIN = float(os.getenv("SEND_CHAT_RATE_PER_MIN", "20") or "20")
+SEND_CHAT_BURST = float(os.getenv("SEND_CHAT_BURST", "3") or "3")
+send_scheduler = SendScheduler(SEND_GLOBAL_RATE, SEND_CHAT_RATE_PER_MIN, SEND_CHAT_BURST)
+
+# ===== ADAPTIVE BATCHING (navbat uzun bo'lsa bir nechta zakaz bitta xabarda) =====
+SEND_BATCH_THRESHOLD = int(os.getenv("SEND_BATCH_THRESHOLD", "50") or "0")  # 0 = o'chiq
+SEND_BATCH_MAX = int(os.getenv("SEND_BATCH_MAX", "10") or "10")
+TELEGRAM_TEXT_LIMIT = 4096
+BATCH_SEPARATOR = "\n\n➖➖➖➖➖➖\n\n"
+BATCH_SEPARATOR_LEN = utf16_len(BATCH_SEPARATOR)
+_batch_lanes = set()  # batch rejimidagi lane'lar
+
+# ===== MANZILLAR (kalit so'z -> chat/topic; har manzilga alohida lane + rate budget) =====
+send_lanes: Dict[int, List[asyncio.Task]] = {}  # lane -> send workerlar (0 = DRIVERS_GROUP_ID)
+
+# ===== METRICS (/metrics, Prometheus text format) =====
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1") or "127.0.0.1"
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9108") or "0")  # 0 = o'chiq
+metrics = Registry()
+
+# seen -> (not_owner | drivers_group | no_text | no_keyword | dup_message | dup_content) -> queued
+# (worker rejimida: ... -> submitted, qolgani supervisor'da)
+PIPELINE_STAGES = [
+    "seen", "not_owner", "drivers_group", "no_text", "no_keyword", "dup_message", "driver_ad", "dup_content",
+    "queue_full", "error", "queued", "submitted",
+]
+m_messages = metrics.counter("userbot_messages_total", "Handler'ga kelgan xabarlar, bosqich bo'yicha", ("phone", "stage"))
+m_handler_seconds = metrics.histogram("userbot_handler_seconds", "handle_message davomiyligi")
+m_sends = metrics.counter("userbot_sends_total", "Bot API sendMessage natijalari", ("result",))
+m_send_retries = metrics.counter("userbot_send_retries_total", "Vaqtinchalik xatodan keyin navbatga qaytgan zakazlar")
+m_send_seconds = metrics.histogram("userbot_send_seconds", "sendMessage HTTP latency")
+m_batch_fallbacks = metrics.counter("userbot_send_batch_fallbacks_total",
+                                    "Rad etilgan batch'lar (zakazlar bittalab qayta yuborildi)")
+m_batch_size = metrics.histogram("userbot_send_batch_size", "Bitta xabardagi zakazlar (batch rejimi)",
+                                 buckets=(2, 3, 4, 5, 6, 8, 10, 15, 20, 30))
+m_queue_wait_seconds = metrics.histogram(
+    "userbot_queue_wait_seconds", "Navbatda kutish vaqti",
+    buckets=(0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800),
+)
+m_keyword_refresh = metrics.counter("userbot_keyword_refresh_total", "Kalit so'z refresh natijalari", ("result",))
+m_keyword_compile_seconds = metrics.histogram("userbot_keyword_compile_seconds", "Matcher kompilyatsiya vaqti")
+m_classifier = metrics.counter("userbot_classifier_total", "Klassifikator qarorlari", ("mode", "decision"))
+m_blocked = metrics.counter("userbot_blocked_messages_total",
+                            "Chat filtri tashlagan xabarlar (handler'gacha yetmagan)", ("phone",))
+m_stats_flush = metrics.counter("userbot_stats_flush_total", "Soatlik statistika flush natijalari", ("result",))
+
+# ===== SHARDING (ko'p jarayon: supervisor = yagona sender, workerlar = clientlar) =====
+SHARDS = int(os.getenv("SHARDS", "1") or "1")  # 1 = bitta jarayon (eski rejim)
+ROLE = os.getenv("USERBOT_ROLE", "") or ("supervisor" if SHARDS > 1 else "single")
+SHARD_INDEX = int(os.getenv("SHARD_INDEX", "0") or "0")
+IPC_ADDRESS = os.getenv("USERBOT_IPC", "")       # supervisor workerga beradi
+IPC_TOKEN = os.getenv("USERBOT_IPC_TOKEN", "")
+IPC_ACK_TIMEOUT = float(os.getenv("IPC_ACK_TIMEOUT", "10") or "10")  # supervisor ack'i (sekund)
+ipc_client: IpcClient = None  # faqat worker'da
+
 # ===== ADMIN NOTIFY DEDUPE =====
 _admin_last_notify: Dict[str, float] = {}
 ADMIN_NOTIFY_TTL = 120  # 2 min
@@ -116,6 +271,13 @@ def init_supabase() -> bool:
         return False
 
 
+async def db_run(fn):
+    """Bloklaydigan supabase chaqiruvi: writer bo'lsa executor'da, bo'lmasa to'g'ridan-to'g'ri."""
+    if db_writer and not db_writer.closed:
+        return await db_writer.run(fn)
+    return fn()
+
+
 async def notify_admin_once(key: str, text: str):
     global aiohttp_session, _admin_last_notify
     if not BOT_TOKEN or not ADMIN_ID or not aiohttp_session:
@@ -127,7 +289,7 @@ async def notify_admin_once(key: str, text: str):
         return
     _admin_last_notify[key] = now
 
-    url = f"https://api.telegram.org/bot{BOT_TOKEN}/sendMessage"
+    url = f"{BOT_API_BASE}/bot{BOT_TOKEN}/sendMessage"
     payload = {"chat_id": ADMIN_ID, "text": text}
     try:
         async with aiohttp_session.post(url, json=payload, timeout=20) as resp:
@@ -227,80 +389,45 @@ def extract_text_and_urls(message: Message):
 # ===================== TELEGRAM LINKS =====================
 def get_message_link(message: Message) -> str:
     chat = message.chat
-    msg_id = message.id
-    if chat.username:
-        return f"https://t.me/{chat.username}/{msg_id}"
-    clean_id = str(chat.id).replace("-100", "")
-    return f"https://t.me/c/{clean_id}/{msg_id}"
-
-
-def get_chat_link(message: Message) -> str:
-    chat = message.chat
-    if chat.username:
-        return f"https://t.me/{chat.username}"
-    return get_message_link(message)
+    return render.message_link(chat.id, chat.username, message.id)
 
 
-def build_sender_anchor(message: Message):
+def sender_fields(message: Message) -> Tuple[Optional[int], Optional[str], Optional[str]]:
     """
-    Qaytaradi: (sender_html, sender_url)
-    sender_url: inline button uchun (username bo'lsa t.me, bo'lmasa tg://user?id=..)
+    Qaytaradi: (sender_id, username, title) - anchor/linklar send paytida
+    OrderRecord.sender() da yasaladi. title faqat sender_chat (kanal/anonim admin) uchun.
     """
     if message.from_user:
         u = message.from_user
-        title = f"@{u.username}" if u.username else "Клент личкаси"
-        if u.username:
-            url = f"https://t.me/{u.username}"
-        else:
-            url = f"tg://user?id={u.id}"
-        sender_html = f'<a href="{html.escape(url)}">{html.escape(title)}</a>'
-        return sender_html, url
+        return u.id, u.username, None
 
     if getattr(message, "sender_chat", None):
         sc = message.sender_chat
-        title = sc.title or "Sender"
-        if sc.username:
-            url = f"https://t.me/{sc.username}"
-            return f'<a href="{html.escape(url)}">{html.escape(title)}</a>', url
-
-        # anonymous/channel bo'lsa user lichka bo'lmaydi
-        ml = get_message_link(message)
-        return f'<a href="{html.escape(ml)}">{html.escape(title)}</a>', None
+        return sc.id, sc.username, sc.title or "Sender"
 
-    return "Noma'lum", None
+    return None, None, None
 
 
 # ===================== SEND TO DRIVERS GROUP =====================
-async def send_to_drivers_group(
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+
+async def send_text_to_drivers_group(
     text: str,
-    group_link: str,
-    message_link: str,
-    extra_urls: Optional[List[str]] = None,
-    sender_url: Optional[str] = None,
-    session: Optional[aiohttp.ClientSession] = None
-) -> bool:
-    url = f"https://api.telegram.org/bot{BOT_TOKEN}/sendMessage"
-
-    keyboard = []
-    if sender_url:
-        keyboard.append([{"text": "👤 Клент личкаси", "url": sender_url}])
-
-    keyboard.append([
-        {"text": "👥 Guruhga o'tish", "url": group_link},
-        {"text": "🔗 Xabarga o'tish", "url": message_link},
-    ])
-
-    extra_urls = uniq_keep_order(extra_urls or [])[:3]
-    for i, u in enumerate(extra_urls, 1):
-        keyboard.append([{"text": f"🔗 Link {i}", "url": u}])
-
-    payload = {
-        "chat_id": DRIVERS_GROUP_ID,
-        "text": text,
-        "parse_mode": "HTML",
-        "disable_web_page_preview": True,
-        "reply_markup": {"inline_keyboard": keyboard},
-    }
+    keyboard: Optional[str] = None,
+    session: Optional[aiohttp.ClientSession] = None,
+    chat_id: Optional[int] = None,
+    thread_id: Optional[int] = None
+) -> Optional[bool]:
+    """
+    keyboard: render.keyboard_json() / OrderRecord.keyboard() natijasi (JSON matn) yoki None.
+    chat_id/thread_id: kalit so'z manzili (yo'q bo'lsa DRIVERS_GROUP_ID).
+    Qaytaradi: True - yuborildi, False - doimiy xato (4xx), None - vaqtinchalik xato
+    (tarmoq, 5xx, 429 tugamadi) -> zakaz outbox'da qoladi va qayta urinadi.
+    """
+    chat_id = chat_id or DRIVERS_GROUP_ID
+    url = f"{BOT_API_BASE}/bot{BOT_TOKEN}/sendMessage"
+    body = render.send_payload(chat_id, text, keyboard, thread_id)
 
     own_session = False
     if session is None:
@@ -309,8 +436,15 @@ async def send_to_drivers_group(
 
     try:
         for _ in range(8):
-            async with session.post(url, json=payload, timeout=30) as resp:
+            # ✅ proaktiv: token bucket + 429 backoff (chat / umumiy, hamma workerlar uchun bitta)
+            await send_scheduler.acquire(chat_id)
+            t0 = time.monotonic()
+            async with session.post(url, data=body, headers=JSON_HEADERS, timeout=30) as resp:
                 if resp.status == 200:
+                    elapsed = time.monotonic() - t0
+                    send_scheduler.send_latency.add(elapsed)
+                    m_send_seconds.observe(elapsed)
+                    m_sends.inc("ok")
                     return True
 
                 if resp.status == 429:
@@ -320,61 +454,207 @@ async def send_to_drivers_group(
                         retry_after = int(j.get("parameters", {}).get("retry_after", retry_after))
                     except Exception:
                         pass
-                    await asyncio.sleep(retry_after + 1)
+                    # ✅ shu manzilning barcha workerlari kutadi; bir nechta manzil 429 olsa umumiy backoff
+                    send_scheduler.penalize(retry_after + 1, chat_id)
+                    m_sends.inc("429")
                     continue
 
                 body = await resp.text()
                 print(f"❌ Xabar yuborishda xato ({resp.status}): {body}")
-                return False
+                if 400 <= resp.status < 500:
+                    m_sends.inc("error")
+                    return False
+                m_sends.inc("server_error")
+                return None
+        m_sends.inc("throttled_out")
+        return None
     except Exception as e:
+        m_sends.inc("exception")
         print(f"❌ Xabar yuborishda xato: {e}")
-        return False
+        return None
     finally:
         if own_session:
             await session.close()
 
 
-async def send_worker(worker_id: int):
-    global aiohttp_session, forwarded_cache
+def _order_text(item: OrderRecord, content_entry) -> str:
+    # render shu yerda (navbatda faqat ixcham yozuv turadi)
+    text = item.html()
+    # navbatda turgan paytda boshqa guruhlarda ham ko'rilgan bo'lishi mumkin
+    if CONTENT_DEDUPE_SHOW_GROUPS and content_entry is not None and content_entry.also_posted:
+        text += f"\n\n📣 Yana {content_entry.also_posted} ta guruhda ham yozilgan"
+    return text
+
+
+def _batch_wanted(lane: int = 0) -> bool:
+    """Gisterezis (har lane uchun): THRESHOLD dan oshsa yoqiladi, yarmidan tushsa o'chadi."""
+    if SEND_BATCH_THRESHOLD <= 0 or SEND_BATCH_MAX < 2:
+        return False
+    depth = send_queue.qsize(lane)
+    on = lane in _batch_lanes
+    if not on and depth >= SEND_BATCH_THRESHOLD:
+        _batch_lanes.add(lane)
+        print(f"📦 Batch rejimi yoqildi ({lane_chat(lane)}, navbat: {depth})")
+        return True
+    if on and depth < SEND_BATCH_THRESHOLD // 2:
+        _batch_lanes.discard(lane)
+        print(f"📦 Batch rejimi o'chdi ({lane_chat(lane)}, navbat: {depth})")
+        return False
+    return on
+
+
+def _finish_order(oid: int, item: OrderRecord, content_entry, ok: Optional[bool], lane: int = 0):
+    """
+    ok=True: yuborildi -> ack. ok=False (doimiy 4xx) yoki SEND_RETRY_MAX tugadi -> ack + release.
+    ok=None (vaqtinchalik): qator diskda qoladi, backoff bilan navbatga qaytadi (dedupe kaliti band).
+    """
+    cache_key = item.key
+    if ok is None:
+        attempt = send_queue.attempts(oid) + 1
+        if SEND_RETRY_MAX <= 0 or attempt <= SEND_RETRY_MAX:
+            delay = min(SEND_RETRY_MAX_DELAY, SEND_RETRY_BASE_DELAY * 2 ** (attempt - 1))
+            send_queue.requeue(oid, item, content_entry, lane, delay)
+            m_send_retries.inc()
+            return
+        print(f"⚠️ Zakaz {cache_key} {SEND_RETRY_MAX} urinishdan keyin tashlandi")
+    if ok:
+        forwarded_cache.mark_sent(cache_key)
+    else:
+        forwarded_cache.release(cache_key)
+        content_cache.forget(content_entry)
+    send_queue.ack(oid, lane)
+
+
+def lane_for(dest_chat: Optional[int]) -> int:
+    """Manzil chat -> outbox lane (asosiy guruh = 0)."""
+    if not dest_chat or normalize_chat_id(dest_chat) == normalize_chat_id(DRIVERS_GROUP_ID):
+        return 0
+    return int(dest_chat)
+
+
+def lane_chat(lane: int) -> int:
+    return lane or DRIVERS_GROUP_ID
+
+
+def ensure_lane(lane: int):
+    """Lane uchun send workerlar (birinchi zakazda yoki restartda diskdan)."""
+    if lane in send_lanes:
+        return
+    n = max(1, SEND_WORKERS if lane == 0 else SEND_LANE_WORKERS)
+    send_lanes[lane] = [asyncio.create_task(send_worker(i + 1, lane)) for i in range(n)]
+    if lane:
+        print(f"🛣 Yangi manzil lane: {lane} ({n} worker)")
+
+
+async def send_worker(worker_id: int, lane: int = 0):
+    global aiohttp_session
+    chat_id = lane_chat(lane)
+    carry = None  # batch'ga sig'magan zakaz -> keyingi siklning birinchisi
     while True:
-        item = await send_queue.get()
-        try:
-            cache_key, forward_text, group_link, message_link, urls, sender_url = item
-
-            ok = await send_to_drivers_group(
-                forward_text,
-                group_link=group_link,
-                message_link=message_link,
-                extra_urls=urls,
-                sender_url=sender_url,
-                session=aiohttp_session
+        first = carry or await send_queue.get(lane)
+        carry = None
+        batch = [first]
+        texts = [_order_text(first[1], first[2])]
+
+        # ✅ navbat uzun bo'lsa: 4096 belgiga sig'guncha zakazlarni bitta xabarga yig'amiz
+        if _batch_wanted(lane):
+            thread_id = first[1].thread_id
+            size = utf16_len(texts[0])
+            while len(batch) < SEND_BATCH_MAX:
+                nxt = send_queue.get_nowait(lane)
+                if nxt is None:
+                    break
+                # bitta xabar = bitta topic
+                if nxt[1].thread_id != thread_id:
+                    carry = nxt
+                    break
+                text = _order_text(nxt[1], nxt[2])
+                add = BATCH_SEPARATOR_LEN + utf16_len(text)
+                # sig'masa keyingi xabarga (carry qayta render qilinadi - arzon)
+                if size + add > TELEGRAM_TEXT_LIMIT - 100:
+                    carry = nxt
+                    break
+                batch.append(nxt)
+                texts.append(text)
+                size += add
+
+        now = time.time()
+        for _, item, _ in batch:
+            waited = max(0.0, now - item.queued_at)
+            send_scheduler.queue_wait.add(waited)
+            m_queue_wait_seconds.observe(waited)
+
+        async def send_single(entry, text: str) -> Optional[bool]:
+            item = entry[1]
+            return await send_text_to_drivers_group(
+                text, item.keyboard(), session=aiohttp_session, chat_id=chat_id, thread_id=item.thread_id
             )
 
-            async with forward_lock:
-                if ok:
-                    old = forwarded_cache.get(cache_key, {}) or {}
-                    forwarded_cache[cache_key] = {"ts": time.time(), "status": "sent", "owner": old.get("owner")}
-                else:
-                    forwarded_cache.pop(cache_key, None)
+        async def send_joined(parts: List[str]) -> Optional[bool]:
+            # keyboard yo'q: har bir zakazda sender linki va 🔗 xabar linki matnning o'zida
+            text = f"📦 <b>{len(parts)} ta yangi buyurtma</b>{BATCH_SEPARATOR}" + BATCH_SEPARATOR.join(parts)
+            m_batch_size.observe(len(parts))
+            ok = await send_text_to_drivers_group(
+                text, session=aiohttp_session, chat_id=chat_id, thread_id=first[1].thread_id
+            )
+            if ok is False:
+                m_batch_fallbacks.inc()
+                print(f"📦 Batch rad etildi ({len(parts)} ta) -> bittalab yuborilmoqda")
+            return ok
 
-                now_ts = time.time()
-                for k, st in list(forwarded_cache.items()):
-                    if now_ts - float(st.get("ts", 0)) > FORWARD_TTL:
-                        forwarded_cache.pop(k, None)
+        finished = set()
 
+        def finish(entry, ok: Optional[bool]):
+            finished.add(entry[0])
+            _finish_order(entry[0], entry[1], entry[2], ok, lane)
+
+        try:
+            await send_orders(batch, texts, send_single, send_joined, finish)
+        except asyncio.CancelledError:
+            # shutdown: ack yo'q -> qatorlar outbox.db da qoladi va restartda qayta yuboriladi
+            raise
         except Exception as e:
-            try:
-                cache_key = item[0]
-                async with forward_lock:
-                    forwarded_cache.pop(cache_key, None)
-            except Exception:
-                pass
-            print(f"⚠️ send_worker[{worker_id}] xato: {e}")
-        finally:
-            send_queue.task_done()
+            print(f"⚠️ send_worker[{lane}:{worker_id}] xato: {e}")
+            for entry in batch:
+                if entry[0] not in finished:
+                    finish(entry, None)
 
 
 # ===================== STATISTICS =====================
+def format_pipeline_stats() -> str:
+    st = {name: int(m_messages.total(stage=name)) for name in PIPELINE_STAGES}
+    seen = st["seen"] or 1
+    parts = [f"{name}={st[name]} ({st[name] * 100 / seen:.1f}%)" for name in PIPELINE_STAGES[1:]]
+    return f"🧮 Pipeline: seen={st['seen']} | " + " | ".join(parts)
+
+
+def format_classifier_stats() -> str:
+    ads = int(m_classifier.total(decision="driver_ad"))
+    orders = int(m_classifier.total(decision="order"))
+    n = len(keywords_snapshot.classifier) if keywords_snapshot.classifier else 0
+    return (
+        f"🕵️ Klassifikator ({CLASSIFIER_MODE}, {n} ibora, chegara {CLASSIFIER_THRESHOLD}): "
+        f"e'lon={ads} zakaz={orders} | senderlar: {len(sender_history)}"
+    )
+
+
+def format_send_stats() -> str:
+    st = send_scheduler.stats()
+    qw, sl = st["queue_wait"], st["send_latency"]
+    return (
+        f"📤 Queue: {send_queue.qsize() if send_queue else 0} "
+        f"(xotira {send_queue.mem_size() if send_queue else 0}/{QUEUE_MAX}) | 429: {st['throttled']} "
+        f"(umumiy {st['throttled_global']}) | backoff: {st['backoff_left']:.1f}s\n"
+        f"⏳ Queue wait: p50={qw['p50']:.2f}s p99={qw['p99']:.2f}s (n={qw['count']})\n"
+        f"🚀 Send latency: p50={sl['p50'] * 1000:.0f}ms p99={sl['p99'] * 1000:.0f}ms (n={sl['count']})"
+    ) + "".join(
+        f"\n🛣 {lane_chat(lane)}: navbat {send_queue.qsize(lane)} | "
+        f"429: {send_scheduler.throttled_by_chat.get(lane_chat(lane), 0)} | "
+        f"backoff: {send_scheduler.chat_backoff_left(lane_chat(lane)):.1f}s"
+        for lane in sorted(send_lanes) if len(send_lanes) > 1
+    )
+
+
 def print_statistics():
     global account_stats, watched_groups_cache, ALL_PHONES
 
@@ -396,16 +676,76 @@ def print_statistics():
         active = int(stats.get("active_count", 0) or 0)
         total_groups_all += total
         total_active_all += active
-        print(f"  {phone}: {total} guruh, {active} ta faol kuzatilmoqda")
+        owned = f", {ownership_map.owned(phone)} tasining egasi" if GROUP_OWNERSHIP else ""
+        st = fleet.states.get(phone) if fleet else None
+        up = f" | {st.status}, uptime {fleet.uptime(phone) * 100:.1f}%, restart {st.restarts}" if st else ""
+        print(f"  {phone}: {total} guruh, {active} ta faol kuzatilmoqda{owned}{up}")
 
     print("-" * 40)
     print(f"  JAMI: {total_groups_all} guruh, {total_active_all} ta faol kuzatilmoqda")
-    print(f"\n🚫 Bloklangan: Faqat DRIVERS_GROUP_ID ({DRIVERS_GROUP_ID})")
+    print()
+    print(format_chat_gate_stats())
     print(f"💾 Keshda: {len(watched_groups_cache)} ta guruh")
+    print(format_send_stats())
+    print(format_pipeline_stats())
+    print(format_classifier_stats())
     print("=" * 60 + "\n")
 
 
 # ===================== SUPABASE CACHE LOAD =====================
+async def _fetch_rows(table: str, columns: str, since: Optional[str] = None,
+                      eq: Optional[Dict[str, object]] = None) -> list:
+    """
+    PostgREST javobi 1000 qator bilan cheklangan -> sahifalab o'qiymiz.
+      - to'liq yuklash: keyset (id > oxirgi_id), offset yo'q
+      - since berilsa: faqat created_at > since (inkremental)
+      - eq: ustun = qiymat filtrlari (masalan is_blocked = true)
+    """
+    rows = []
+    last_id = None
+    offset = 0
+    while True:
+        def page(last_id=last_id, offset=offset):
+            q = supabase.table(table).select(f"id, created_at, {columns}")
+            for col, value in (eq or {}).items():
+                q = q.eq(col, value)
+            if since is not None:
+                return q.gt("created_at", since).order("created_at").range(
+                    offset, offset + CACHE_PAGE_SIZE - 1
+                ).execute()
+            if last_id is not None:
+                q = q.gt("id", last_id)
+            return q.order("id").limit(CACHE_PAGE_SIZE).execute()
+
+        data = (await db_run(page)).data or []
+        rows.extend(data)
+        if len(data) < CACHE_PAGE_SIZE:
+            return rows
+        last_id = data[-1]["id"]
+        offset += len(data)
+
+
+def _merge_group_rows(watched_rows: list, account_rows: list):
+    """Qatorlarni keshga qo'shadi. Nomlar intern qilinadi (ko'p akkauntda bir xil guruh)."""
+    global groups_cache_synced_at
+    if account_rows:
+        schedule_ownership_rebuild()
+    for row in watched_rows:
+        name = row.get("group_name")
+        watched_groups_cache[row["group_id"]] = sys.intern(name) if name else name
+    for row in account_rows:
+        phone = row.get("phone_number")
+        gid = row.get("group_id")
+        if phone and gid:
+            name = row.get("group_name")
+            account_groups_cache.setdefault(phone, {})[gid] = sys.intern(name) if name else name
+
+    for row in watched_rows + account_rows:
+        ts = row.get("created_at")
+        if ts and (groups_cache_synced_at is None or ts > groups_cache_synced_at):
+            groups_cache_synced_at = ts
+
+
 async def load_groups_cache():
     global watched_groups_cache, account_groups_cache, groups_cache_loaded, supabase
 
@@ -413,22 +753,94 @@ async def load_groups_cache():
         return
 
     try:
-        result = supabase.table("watched_groups").select("group_id").execute()
-        watched_groups_cache = {row["group_id"] for row in (result.data or [])}
-        print(f"✅ Kesh yuklandi: {len(watched_groups_cache)} ta guruh bazada mavjud")
-
-        acc_result = supabase.table("account_groups").select("phone_number, group_id").execute()
-        for row in (acc_result.data or []):
-            phone = row.get("phone_number")
-            gid = row.get("group_id")
-            if phone and gid:
-                account_groups_cache.setdefault(phone, set()).add(gid)
-
+        t0 = time.perf_counter()
+        watched_rows, account_rows = await asyncio.gather(
+            _fetch_rows("watched_groups", "group_id, group_name"),
+            _fetch_rows("account_groups", "phone_number, group_id, group_name"),
+        )
+        _merge_group_rows(watched_rows, account_rows)
         groups_cache_loaded = True
+        print(
+            f"✅ Kesh yuklandi: {len(watched_groups_cache)} ta guruh bazada mavjud, "
+            f"{len(account_rows)} ta akkaunt-guruh ({len(account_groups_cache)} akkaunt) "
+            f"| {time.perf_counter() - t0:.2f}s"
+        )
     except Exception as e:
         print(f"⚠️ Kesh yuklashda xato: {e}")
 
 
+async def refresh_groups_cache():
+    """Inkremental: faqat oxirgi yuklashdan keyin qo'shilgan qatorlar (created_at)."""
+    if not groups_cache_loaded or not supabase:
+        return
+    since = groups_cache_synced_at
+    try:
+        watched_rows, account_rows = await asyncio.gather(
+            _fetch_rows("watched_groups", "group_id, group_name", since=since),
+            _fetch_rows("account_groups", "phone_number, group_id, group_name", since=since),
+        )
+        _merge_group_rows(watched_rows, account_rows)
+        if watched_rows or account_rows:
+            print(f"🔄 Kesh yangilandi: +{len(watched_rows)} guruh, +{len(account_rows)} akkaunt-guruh")
+    except Exception as e:
+        print(f"⚠️ Keshni yangilashda xato: {e}")
+
+
+async def periodic_groups_cache_refresh():
+    while True:
+        await asyncio.sleep(GROUPS_CACHE_REFRESH)
+        await refresh_groups_cache()
+
+
+# ===================== CHAT GATE =====================
+async def refresh_chat_gate():
+    """watched_groups.is_blocked -> yangi ChatGate (o'zgargan bo'lsa atomar almashtiriladi)."""
+    global chat_gate
+    if not supabase:
+        return
+    try:
+        rows = await _fetch_rows("watched_groups", "group_id", eq={"is_blocked": True})
+    except Exception as e:
+        print(f"⚠️ Bloklangan guruhlarni o'qishda xato: {e}")
+        return
+    blocked = {normalize_chat_id(r["group_id"]) for r in rows if r.get("group_id")}
+    blocked.add(normalize_chat_id(DRIVERS_GROUP_ID))  # o'zimiz yuboradigan guruh hech qachon kuzatilmaydi
+    gate = chat_gate.replace(blocked, ALLOWED_GROUP_IDS)
+    if gate is not chat_gate:
+        chat_gate = gate  # ✅ atomar almashtirish
+        print(f"🚫 Chat filtri yangilandi: {len(gate.blocked)} ta bloklangan"
+              + (f", {len(gate.allowed)} ta ruxsat etilgan" if gate.allowed else "") + f" | v{gate.version}")
+
+
+async def chat_gate_refresher():
+    while True:
+        await asyncio.sleep(CHAT_GATE_REFRESH)
+        await refresh_chat_gate()
+
+
+async def _chat_allowed(_, client, message: Message) -> bool:
+    """
+    Async bo'lishi shart: Pyrogram sinxron custom filtrni executor thread'da chaqiradi.
+    Bloklangan guruh -> False, handler coroutine yaratilmaydi.
+    """
+    chat = message.chat
+    if chat is None or chat_gate.allows(chat.id):
+        return True
+    m_blocked.inc(getattr(client, "phone_number", None) or "-")
+    return False
+
+
+allowed_chats = filters.create(_chat_allowed, "AllowedChats")
+
+
+def format_chat_gate_stats() -> str:
+    allowed = f" | ruxsat etilgan: {len(chat_gate.allowed)} ta" if chat_gate.allowed else ""
+    return (
+        f"🚫 Bloklangan guruhlar: {len(chat_gate.blocked)} ta (v{chat_gate.version}){allowed} "
+        f"| tashlangan xabarlar: {int(m_blocked.total())}"
+    )
+
+
 # ===================== SUPABASE PHONES =====================
 def fetch_phone_numbers_from_db() -> list:
     global supabase
@@ -443,7 +855,7 @@ def fetch_phone_numbers_from_db() -> list:
             phone = _normalize_phone(row.get("phone_number"))
             if not phone:
                 continue
-            if status in ["pending", "active", "connecting"]:
+            if status in RUNNABLE_STATUSES:
                 phones.append(phone)
 
         return uniq_keep_order(phones)
@@ -458,7 +870,7 @@ async def ensure_accounts_seeded_from_env():
         return
 
     try:
-        existing = supabase.table("userbot_accounts").select("phone_number").execute()
+        existing = await db_run(lambda: supabase.table("userbot_accounts").select("phone_number").execute())
         existing_phones = {_normalize_phone(row.get("phone_number", "")) for row in (existing.data or [])}
 
         for phone in PHONE_NUMBERS_ENV_FALLBACK:
@@ -466,11 +878,11 @@ async def ensure_accounts_seeded_from_env():
             if not phone or phone in existing_phones:
                 continue
             try:
-                supabase.table("userbot_accounts").insert({
+                await db_run(lambda: supabase.table("userbot_accounts").insert({
                     "phone_number": phone,
                     "status": "pending",
                     "two_fa_required": False,
-                }).execute()
+                }).execute())
                 print(f"✅ Yangi raqam qo'shildi: {phone}")
             except Exception as e:
                 if "duplicate" not in str(e).lower():
@@ -481,8 +893,18 @@ async def ensure_accounts_seeded_from_env():
 
 def update_account_status(phone: str, status: str):
     global supabase
+    if account_status.get(phone) != status:
+        was_active = account_status.get(phone) == "active"
+        account_status[phone] = status
+        if was_active or status == "active":
+            # ✅ lokal akkaunt tushdi/ko'tarildi -> failover darhol
+            schedule_ownership_rebuild()
     if not supabase:
         return
+    # ✅ event loop bloklanmasin: writer bo'lsa coalesce + fonda yoziladi
+    if db_writer and not db_writer.closed:
+        db_writer.set_status(phone, status)
+        return
     try:
         supabase.table("userbot_accounts").update(
             {"status": status, "updated_at": "now()"}
@@ -493,82 +915,142 @@ def update_account_status(phone: str, status: str):
 
 
 # ===================== GROUP SYNC =====================
-async def sync_account_groups(phone: str, groups: list):
+def _chunks(items: list, size: int):
+    size = max(1, size)
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+async def sync_account_groups(phone: str, groups: list, prune: bool = True):
+    """
+    Diff asosida bulk sync:
+      - yangi / nomi o'zgargan guruhlar -> chunk'lab upsert (on_conflict)
+      - akkaunt chiqib ketgan guruhlar (prune=True) -> bitta delete ... in_()
+    """
     global supabase, account_groups_cache
     if not supabase:
         return
 
     try:
-        existing_ids = account_groups_cache.get(phone, set())
-        new_groups = [g for g in groups if g["group_id"] not in existing_ids]
-        if not new_groups:
-            return
+        existing = account_groups_cache.setdefault(phone, {})
+        found = {g["group_id"]: g["group_name"] for g in groups}
 
-        for group in new_groups:
-            try:
-                supabase.table("account_groups").insert({
-                    "phone_number": phone,
-                    "group_id": group["group_id"],
-                    "group_name": group["group_name"],
-                }).execute()
-                account_groups_cache.setdefault(phone, set()).add(group["group_id"])
-            except Exception:
-                pass
+        changed = [
+            {"phone_number": phone, "group_id": gid, "group_name": name}
+            for gid, name in found.items() if gid not in existing or existing[gid] != name
+        ]
+        left = [gid for gid in existing if gid not in found] if prune else []
+
+        added = sum(1 for row in changed if row["group_id"] not in existing)
+        for chunk in _chunks(changed, SYNC_CHUNK):
+            await db_run(lambda c=chunk: supabase.table("account_groups").upsert(
+                c, on_conflict="phone_number,group_id"
+            ).execute())
+            for row in chunk:
+                existing[row["group_id"]] = row["group_name"]
 
-        print(f"📝 [{phone}] {len(new_groups)} ta yangi guruh qo'shildi")
+        await _delete_account_groups(phone, left)
+
+        if changed or left:
+            schedule_ownership_rebuild()
+            print(f"📝 [{phone}] guruhlar: +{added} yangi, ~{len(changed) - added} nomi o'zgardi, -{len(left)} chiqildi")
     except Exception as e:
         print(f"⚠️ Guruhlarni saqlashda xato: {e}")
 
 
-async def sync_all_groups(client: Client, phone: str) -> list:
-    global supabase, account_stats, watched_groups_cache
+async def _delete_account_groups(phone: str, group_ids: list):
+    existing = account_groups_cache.setdefault(phone, {})
+    for chunk in _chunks(group_ids, SYNC_CHUNK):
+        await db_run(lambda c=chunk: supabase.table("account_groups").delete().eq(
+            "phone_number", phone
+        ).in_("group_id", c).execute())
+        for gid in chunk:
+            existing.pop(gid, None)
+    if group_ids:
+        schedule_ownership_rebuild()
+
 
+async def sync_watched_groups(groups: list):
+    """watched_groups: yangilari insert (is_blocked bilan), nomi o'zgarganlari faqat group_name."""
+    global supabase, watched_groups_cache
     if not supabase:
-        return []
+        return
+
+    drivers_id = normalize_chat_id(DRIVERS_GROUP_ID)
+    new_rows, renamed = [], []
+    for g in {g["group_id"]: g for g in groups}.values():
+        gid, name = g["group_id"], g["group_name"]
+        if gid not in watched_groups_cache:
+            new_rows.append({
+                "group_id": gid,
+                "group_name": name,
+                "is_blocked": normalize_chat_id(gid) == drivers_id,
+            })
+        elif watched_groups_cache[gid] != name:
+            # is_blocked yuborilmaydi -> admin qo'ygan blok saqlanadi
+            renamed.append({"group_id": gid, "group_name": name})
 
     try:
-        groups_found = []
+        for chunk in _chunks(new_rows, SYNC_CHUNK):
+            await db_run(lambda c=chunk: supabase.table("watched_groups").upsert(
+                c, on_conflict="group_id", ignore_duplicates=True
+            ).execute())
+            for row in chunk:
+                watched_groups_cache[row["group_id"]] = row["group_name"]
+
+        for chunk in _chunks(renamed, SYNC_CHUNK):
+            await db_run(lambda c=chunk: supabase.table("watched_groups").upsert(
+                c, on_conflict="group_id"
+            ).execute())
+            for row in chunk:
+                watched_groups_cache[row["group_id"]] = row["group_name"]
+    except Exception as e:
+        print(f"⚠️ watched_groups sync xato: {e}")
 
-        try:
-            async for dialog in client.get_dialogs():
-                chat = dialog.chat
-                if chat.type in [ChatType.GROUP, ChatType.SUPERGROUP]:
-                    groups_found.append({
-                        "group_id": chat.id,
-                        "group_name": chat.title or f"Guruh {chat.id}"
-                    })
-        except FloodWait as fw:
-            wait_s = int(getattr(fw, "value", 0) or 0)
-            await asyncio.sleep(wait_s + 1)
-            async for dialog in client.get_dialogs():
-                chat = dialog.chat
-                if chat.type in [ChatType.GROUP, ChatType.SUPERGROUP]:
-                    groups_found.append({
-                        "group_id": chat.id,
-                        "group_name": chat.title or f"Guruh {chat.id}"
-                    })
-
-        await sync_account_groups(phone, groups_found)
-
-        new_groups = [g for g in groups_found if g["group_id"] not in watched_groups_cache]
-        for g in new_groups:
-            try:
-                is_blocked = normalize_chat_id(g["group_id"]) == normalize_chat_id(DRIVERS_GROUP_ID)
-                supabase.table("watched_groups").insert({
-                    "group_id": g["group_id"],
-                    "group_name": g["group_name"],
-                    "is_blocked": is_blocked
-                }).execute()
-                watched_groups_cache.add(g["group_id"])
-            except Exception:
-                pass
 
-        active_groups = [
-            g for g in groups_found
-            if normalize_chat_id(g["group_id"]) != normalize_chat_id(DRIVERS_GROUP_ID)
-        ]
+def dialogs_checkpoint_path(phone: str) -> str:
+    clean = phone.replace("+", "").replace(" ", "")
+    return os.path.join(SESS_DIR, f"dialogs_{clean}.json")
+
+
+def _update_account_stats(phone: str):
+    groups = account_groups_cache.get(phone, {})
+    drivers_id = normalize_chat_id(DRIVERS_GROUP_ID)
+    active = sum(1 for gid in groups if normalize_chat_id(gid) != drivers_id)
+    account_stats[phone] = {"groups_count": len(groups), "active_count": active}
 
-        account_stats[phone] = {"groups_count": len(groups_found), "active_count": len(active_groups)}
+
+async def sync_all_groups(client: Client, phone: str) -> list:
+    """
+    Inkremental dialog sync (dialogs.py):
+      - odatda faqat oxirgi sync'dan keyin faollashgan dialoglar (1-2 sahifa)
+      - har DIALOGS_FULL_SYNC_HOURS da (yoki tugallanmagan skan bo'lsa) to'liq skan;
+        chiqib ketilgan guruhlar faqat shunda o'chiriladi
+      - FloodWait / restart: checkpoint'dagi sahifadan davom
+    """
+    global supabase, account_stats, watched_groups_cache
+
+    if not supabase:
+        return []
+
+    try:
+        t0 = time.perf_counter()
+        cp = DialogCheckpoint.load(dialogs_checkpoint_path(phone))
+        full = cp.needs_full(DIALOGS_FULL_SYNC_HOURS * 3600, bool(account_groups_cache.get(phone)))
+
+        found, max_date, pages = await scan_dialogs(client, cp, full, DIALOGS_PAGE_SIZE)
+        groups_found = [{"group_id": gid, "group_name": name} for gid, name in found.items()]
+
+        await sync_account_groups(phone, groups_found, prune=full)
+        await sync_watched_groups(groups_found)
+        cp.commit(max_date, full)
+
+        _update_account_stats(phone)
+        mode = "to'liq" if full else "inkremental"
+        print(
+            f"🗂 [{phone}] Dialog sync ({mode}): "
+            f"{pages} sahifa, {len(found)} guruh | {time.perf_counter() - t0:.1f}s"
+        )
         return groups_found
 
     except Exception as e:
@@ -576,53 +1058,325 @@ async def sync_all_groups(client: Client, phone: str) -> list:
         return []
 
 
+async def on_group_joined(phone: str, group_id: int, group_name: str):
+    """Runtime: qo'shildi yoki nomi o'zgardi (qayta skan qilmasdan)."""
+    groups = [{"group_id": group_id, "group_name": group_name or f"Guruh {group_id}"}]
+    await sync_account_groups(phone, groups, prune=False)
+    await sync_watched_groups(groups)
+    _update_account_stats(phone)
+
+
+async def on_group_left(phone: str, group_id: int):
+    if group_id not in account_groups_cache.get(phone, {}):
+        return
+    try:
+        await _delete_account_groups(phone, [group_id])
+        print(f"📝 [{phone}] guruhdan chiqildi: {group_id}")
+    except Exception as e:
+        print(f"⚠️ Guruhni o'chirishda xato: {e}")
+    _update_account_stats(phone)
+
+
+def create_membership_handlers(phone: str):
+    """Service xabarlar (oddiy guruh join/leave/rename) + raw UpdateChannel (superguruh)."""
+    async def on_service(client: Client, message: Message):
+        chat = message.chat
+        if chat.type not in (ChatType.GROUP, ChatType.SUPERGROUP):
+            return
+        if message.new_chat_members and any(u.is_self for u in message.new_chat_members):
+            await on_group_joined(phone, chat.id, chat.title)
+        elif message.left_chat_member and message.left_chat_member.is_self:
+            await on_group_left(phone, chat.id)
+        elif message.new_chat_title:
+            await on_group_joined(phone, chat.id, message.new_chat_title)
+
+    async def on_raw(client: Client, update, users, chats):
+        change = membership_change(update, chats)
+        if not change:
+            return
+        kind, gid, title = change
+        if kind == "leave":
+            await on_group_left(phone, gid)
+        elif gid not in account_groups_cache.get(phone, {}):
+            await on_group_joined(phone, gid, title)
+
+    return on_service, on_raw
+
+
+# ===================== GROUP OWNERSHIP =====================
+def schedule_ownership_rebuild():
+    """Belgilaydi va (ishlamayotgan bo'lsa) fonda qayta qurishni boshlaydi."""
+    global _ownership_dirty, _ownership_task
+    _ownership_dirty = True
+    if not GROUP_OWNERSHIP or (_ownership_task is not None and not _ownership_task.done()):
+        return
+    try:
+        _ownership_task = asyncio.get_running_loop().create_task(rebuild_ownership())
+    except RuntimeError:
+        pass  # loop yo'q (chiqish paytida)
+
+
+async def rebuild_ownership():
+    """
+    account_groups_cache + faol akkauntlar -> yangi egalik snapshot'i.
+    Hisob thread'da (katta keshda ~100ms+), natija atomar almashtiriladi.
+    Qurish paytida yana o'zgarish bo'lsa sikl qaytadan aylanadi.
+    """
+    global ownership_map, _ownership_dirty
+    while GROUP_OWNERSHIP and _ownership_dirty:
+        _ownership_dirty = False
+        groups = {p: tuple(g) for p, g in account_groups_cache.items()}
+        live = {p for p, st in account_status.items() if st == "active"}
+        try:
+            new_map = await asyncio.to_thread(OwnershipMap.build, groups, live)
+        except Exception as e:
+            print(f"⚠️ Egalikni qurishda xato: {e}")
+            return
+        moved = new_map.moved_from(ownership_map)
+        ownership_map = new_map
+        if moved:
+            print(
+                f"🧭 Egalik yangilandi: {len(new_map)} guruh, {len(live)} faol akkaunt "
+                f"| {moved} ta ko'chdi | {new_map.build_ms:.1f}ms"
+            )
+
+
+async def refresh_account_statuses() -> Optional[Dict[str, str]]:
+    """
+    userbot_accounts: phone -> status (o'qib bo'lmasa None).
+    Boshqa jarayon/shard'dagi akkauntlar statusi egalik failover'i uchun ham shu yerda.
+    """
+    if not supabase:
+        return None
+    try:
+        res = await db_run(lambda: supabase.table("userbot_accounts").select("phone_number,status").execute())
+    except Exception as e:
+        print(f"⚠️ Statuslarni o'qishda xato: {e}")
+        return None
+    statuses = {}
+    for row in res.data or []:
+        phone = _normalize_phone(row.get("phone_number"))
+        if not phone:
+            continue
+        status = (row.get("status") or "").lower()
+        statuses[phone] = status
+        task = running_clients.get(phone)
+        if task is not None and not task.done():
+            continue  # lokal client statusi aniqroq
+        if GROUP_OWNERSHIP and account_status.get(phone) != status:
+            account_status[phone] = status
+            schedule_ownership_rebuild()
+    return statuses
+
+
+async def reconcile_fleet(statuses: Dict[str, str]):
+    """
+    Process'ni restart qilmasdan: yangi raqam -> ishga tushadi; o'chirilgan yoki
+    status runnable bo'lmagan (dashboard'dan to'xtatilgan) -> to'xtaydi.
+    """
+    global ALL_PHONES
+    if fleet is None:
+        return
+    if ROLE == "worker":
+        statuses = {p: s for p, s in statuses.items() if shard_for_phone(p, SHARDS) == SHARD_INDEX}
+    if not statuses:
+        return  # bazada hech narsa yo'q -> .env fallback'dagi clientlarni to'xtatmaymiz
+
+    to_start, to_stop = fleet.plan(statuses, RUNNABLE_STATUSES, SELF_MANAGED_STATUSES)
+    for phone in to_stop:
+        reason = f"status: {statuses[phone]}" if phone in statuses else "bazadan o'chirildi"
+        print(f"➖ [{phone}] {reason} -> to'xtatilmoqda")
+        await fleet.remove(phone)
+        running_clients.pop(phone, None)
+        if account_status.pop(phone, None) == "active":
+            schedule_ownership_rebuild()
+    for phone in to_start:
+        print(f"➕ [{phone}] ishga tushirilmoqda (status: {statuses.get(phone)})")
+        fleet.add(phone)
+    if to_start or to_stop:
+        ALL_PHONES = [p for p in uniq_keep_order(ALL_PHONES + to_start) if p not in to_stop]
+
+
+async def accounts_poller():
+    """Statuslar (egalik failover) + fleet hot-add/remove."""
+    while True:
+        await asyncio.sleep(ACCOUNTS_POLL)
+        statuses = await refresh_account_statuses()
+        if statuses is not None:
+            await reconcile_fleet(statuses)
+
+
 # ===================== KEYWORDS =====================
-async def refresh_keywords():
-    global keywords_cache, keywords_map, keywords_regex, last_cache_update, supabase
+async def _keywords_count() -> Optional[int]:
+    res = await db_run(lambda: supabase.table("keywords").select("id", count="exact").limit(1).execute())
+    return getattr(res, "count", None)
+
+
+KEYWORD_COLUMNS = "keyword, destination_chat_id, destination_thread_id"
+
+
+def _keyword_row(r: dict) -> tuple:
+    dest, thread = r.get("destination_chat_id"), r.get("destination_thread_id")
+    return r["keyword"], int(dest) if dest else None, int(thread) if thread else None
+
+
+async def _fetch_negative_keywords() -> Optional[Dict[str, float]]:
+    """negative_keywords -> {ibora: og'irlik}; xato bo'lsa None (eski ro'yxat qoladi)."""
+    if CLASSIFIER_MODE == "off":
+        return {}
+    try:
+        rows = await _fetch_rows("negative_keywords", "keyword, weight")
+    except Exception as e:
+        print(f"⚠️ negative_keywords o'qilmadi: {e}")
+        return None
+    return {
+        r["keyword"].lower(): float(r["weight"] if r.get("weight") is not None else 1.0)
+        for r in rows if r.get("keyword")
+    }
+
+
+async def refresh_keywords(full: bool = False):
+    """
+    Faqat fon refresher'dan chaqiriladi (handler hech qachon kutmaydi).
+      - odatda: created_at > oxirgi -> faqat yangi kalit so'zlar
+      - soni mos kelmasa (o'chirilgan) yoki full=True: to'liq qayta yuklash
+    O'zgarish bo'lsa matcher thread'da kompilyatsiya qilinadi va snapshot almashtiriladi.
+    """
+    global keywords_snapshot, _keyword_rows, _negative_rows, _keywords_since, supabase
     if not supabase:
         return
     try:
-        result = supabase.table("keywords").select("id, keyword").execute()
-        keywords_cache = [k["keyword"].lower() for k in (result.data or []) if k.get("keyword")]
-        keywords_map = {k["keyword"].lower(): k["id"] for k in (result.data or []) if k.get("keyword")}
-        last_cache_update = time.time()
-
-        if keywords_cache:
-            keywords_regex = re.compile(
-                "|".join(re.escape(k) for k in sorted(keywords_cache, key=len, reverse=True)),
-                re.IGNORECASE
-            )
+        if full or _keywords_since is None:
+            rows = await _fetch_rows("keywords", KEYWORD_COLUMNS)
+            new_rows = {r["id"]: _keyword_row(r) for r in rows if r.get("keyword")}
+            changed = new_rows != _keyword_rows
         else:
-            keywords_regex = None
+            rows = await _fetch_rows("keywords", KEYWORD_COLUMNS, since=_keywords_since)
+            new_rows = dict(_keyword_rows)
+            new_rows.update({r["id"]: _keyword_row(r) for r in rows if r.get("keyword")})
+            changed = len(new_rows) != len(_keyword_rows) or any(
+                _keyword_rows.get(r["id"]) != _keyword_row(r) for r in rows
+            )
+            total = await _keywords_count()
+            if total is not None and total != len(new_rows):
+                return await refresh_keywords(full=True)
+
+        for r in rows:
+            ts = r.get("created_at")
+            if ts and (_keywords_since is None or ts > _keywords_since):
+                _keywords_since = ts
+
+        negatives = await _fetch_negative_keywords()
+        if negatives is None:
+            negatives = _negative_rows  # o'qib bo'lmadi -> eskisi qoladi
+        changed = changed or negatives != _negative_rows
+
+        if not changed and keywords_snapshot.version:
+            m_keyword_refresh.inc("unchanged")
+            return
 
-        print(f"✅ Kalit so'zlar yangilandi: {len(keywords_cache)} ta")
+        keyword_ids = {kw.lower(): kid for kid, (kw, _, _) in new_rows.items()}
+        # ✅ kalit so'z -> manzil indeksi (handler'da bitta dict lookup)
+        routes = {
+            kw.lower(): (dest or DRIVERS_GROUP_ID, thread)
+            for kw, dest, thread in new_rows.values() if dest or thread
+        }
+        # ✅ klassifikator ham shu snapshot ichida (bitta atomar almashtirish)
+        factory = (lambda: OrderClassifier(negatives, MATCHER_ENGINE, CLASSIFIER_THRESHOLD)) if negatives else None
+        snap = await asyncio.to_thread(
+            compile_snapshot, keywords_snapshot.version + 1, keyword_ids, MATCHER_ENGINE, routes, factory
+        )
+        _keyword_rows = new_rows
+        _negative_rows = negatives
+        keywords_snapshot = snap  # ✅ atomar almashtirish
+        m_keyword_refresh.inc("reloaded")
+        m_keyword_compile_seconds.observe(snap.compile_ms / 1000.0)
+        for kept, same in (snap.matcher.collisions.items() if snap.matcher else ()):
+            # qolganlarining id/manzili ishlatilmaydi -> hit va routing tanlangan kalit so'zga
+            print(f"⚠️ Kalit so'zlar bir xil normallashdi: {', '.join(same)} -> faqat '{kept}' ishlatiladi")
+
+        print(
+            f"✅ Kalit so'zlar yangilandi: {len(snap)} ta ({MATCHER_ENGINE}) "
+            f"| v{snap.version} | compile {snap.compile_ms:.1f}ms | manzillar: {len(snap.destinations)} "
+            f"| e'lon iboralari: {len(negatives)} ({CLASSIFIER_MODE})"
+        )
     except Exception as e:
+        m_keyword_refresh.inc("error")
         print(f"❌ Kalit so'zlar yangilashda xato: {e}")
 
 
-async def periodic_keywords_refresh():
+async def keywords_refresher():
+    cycle = 0
     while True:
-        await asyncio.sleep(CACHE_TTL)
-        await refresh_keywords()
+        await asyncio.sleep(KEYWORDS_REFRESH)
+        cycle += 1
+        await refresh_keywords(full=(cycle % max(1, KEYWORDS_FULL_RELOAD_EVERY) == 0))
 
 
 # ===================== HIT LOG =====================
-async def save_keyword_hit(keyword: str, group_id: int, group_name: str, phone: str, message_text: str):
-    global supabase, keywords_map
-    if not supabase:
+def save_keyword_hit(keyword_id, group_id: int, group_name: str, phone: str, message_text: str,
+                     verdict: Optional[list] = None, count: bool = True):
+    """
+    Soatlik rollup'ga +1 (count=True bo'lsa); xom qator (preview bilan) faqat namuna
+    sifatida buferga qo'shiladi, db_writer bulk insert qiladi (await yo'q).
+    verdict = [score, decision]: "driver_ad" qatorlari har doim yoziladi (aniqlikni tekshirish uchun).
+    """
+    global supabase
+    if count:
+        hourly_stats.hit(keyword_id, group_id, group_name)
+    if not supabase or not db_writer:
+        return
+    flagged = bool(verdict) and verdict[1] == "driver_ad"
+    if not flagged and KEYWORD_HITS_SAMPLE < 1 and random.random() >= KEYWORD_HITS_SAMPLE:
+        return
+    preview = (message_text or "")[:200]
+    db_writer.add("keyword_hits", {
+        "keyword_id": keyword_id,
+        "group_id": group_id,
+        "group_name": group_name,
+        "phone_number": phone,
+        "message_preview": preview,
+        # bulk insert: hamma qatorda bir xil ustunlar bo'lishi kerak
+        "classifier_score": verdict[0] if verdict else None,
+        "classifier_decision": verdict[1] if verdict else None,
+    })
+
+
+def classify_order(classifier: OrderClassifier, text: str, sender_id: Optional[int]) -> list:
+    """[score, decision]: iboralar og'irligi + sender tarixi (qisqa vaqtda ko'p turli post)."""
+    score, found = classifier.score(text)
+    posts = sender_history.observe(sender_id, text)
+    # tarix yolg'iz o'zi e'lon qilolmaydi: cap har doim chegaradan kichik
+    cap = min(CLASSIFIER_REPEAT_CAP, classifier.threshold * 0.9)
+    score += repeat_bonus(posts, CLASSIFIER_REPEAT_FREE, CLASSIFIER_REPEAT_WEIGHT, cap)
+    decision = classifier.decide(score)
+    m_classifier.inc(CLASSIFIER_MODE, decision)
+    if decision == "driver_ad" and CLASSIFIER_MODE == "shadow":
+        print(f"🕵️ [shadow] e'lon deb topildi: score={score:.1f} {', '.join(found) or '-'} | {posts} post/oyna")
+    return [round(score, 2), decision]
+
+
+async def flush_stats():
+    """Soatlik rollup'lar -> increment_hourly_stats (bitta RPC, qiymatlar qo'shiladi)."""
+    batch = hourly_stats.drain()
+    if batch is None or not supabase:
         return
+    params = HourlyStats.params(batch)
     try:
-        keyword_id = keywords_map.get(keyword.lower())
-        preview = (message_text or "")[:200]
-        supabase.table("keyword_hits").insert({
-            "keyword_id": keyword_id,
-            "group_id": group_id,
-            "group_name": group_name,
-            "phone_number": phone,
-            "message_preview": preview,
-        }).execute()
-    except Exception:
-        pass
+        await db_run(lambda: supabase.rpc("increment_hourly_stats", params).execute())
+        hourly_stats.flushed_rows += sum(len(v) for v in params.values())
+        m_stats_flush.inc("ok")
+    except Exception as e:
+        # ✅ sanoq yo'qolmasin: keyingi flush'da qayta
+        hourly_stats.merge(batch)
+        m_stats_flush.inc("error")
+        print(f"⚠️ Statistika flush xato ({hourly_stats.pending()} ta kalit kutmoqda): {e}")
+
+
+async def stats_flusher():
+    while True:
+        await asyncio.sleep(STATS_FLUSH_SECONDS)
+        await flush_stats()
 
 
 # ===================== ADMIN COMMAND POLLER =====================
@@ -631,7 +1385,7 @@ async def admin_command_poller():
     if not BOT_TOKEN or not ADMIN_ID:
         return
 
-    url = f"https://api.telegram.org/bot{BOT_TOKEN}/getUpdates"
+    url = f"{BOT_API_BASE}/bot{BOT_TOKEN}/getUpdates"
     offset = 0
 
     while True:
@@ -665,105 +1419,281 @@ async def admin_command_poller():
                 )
                 continue
 
+            if text.startswith("/stats"):
+                await notify_admin_once(
+                    f"stats_{upd.get('update_id')}", format_send_stats() + "\n" + format_pipeline_stats() + "\n" + format_classifier_stats()
+                    + "\n" + format_chat_gate_stats()
+                )
+                continue
+
+
+# ===================== ORDER INTAKE =====================
+async def accept_order(order: dict, claimed: bool = False) -> str:
+    """
+    Sender tomoni: kontent dedupe -> hit log -> outbox.
+    claimed=False bo'lsa (worker'dan kelgan) forward dedupe shu yerda global tekshiriladi.
+    """
+    cache_key = tuple(order["key"])
+    phone = order.get("phone")
+    group_name = order.get("group_name")
+
+    if not claimed and not forwarded_cache.claim(cache_key, phone):
+        return "dup_message"
+
+    # ✅ kontent dedupe: bir xil sender + o'xshash matn boshqa guruhda allaqachon navbatda
+    content_entry = None
+    if CONTENT_DEDUPE_WINDOW > 0:
+        content_entry, is_dup = content_cache.observe(
+            order.get("sender_id"), order.get("text") or "", order.get("chat_id")
+        )
+        if is_dup:
+            forwarded_cache.mark_sent(cache_key)
+            return "dup_content"
+
+    save_keyword_hit(order.get("keyword_id"), order.get("chat_id"), group_name, phone, order.get("text"),
+                     order.get("verdict"))
+
+    # ✅ katta guruhda BLOCK bo'lmasin (xotira to'lsa diskka spill bo'ladi)
+    lane = lane_for(order.get("dest_chat"))
+    ensure_lane(lane)
+    oid = send_queue.put(OrderRecord.from_order(order), extra=content_entry, lane=lane)
+    if oid is None:
+        forwarded_cache.release(cache_key)
+        content_cache.forget(content_entry)
+        await notify_admin_once("queue_full", f"⚠️ Outbox FULL (disk). Xabar drop.\n📍 {group_name}\n📱 {phone}")
+        return "queue_full"
+
+    return "queued"
+
+
+async def submit_order(order: dict) -> str:
+    """Bitta jarayonda -> accept_order; worker'da -> IPC orqali supervisor'ga."""
+    if ipc_client is None:
+        return await accept_order(order, claimed=True)
+
+    # kalit ack kelguncha "queued" holatda (boshqa akkaunt shu paytda takeover qilmaydi)
+    cache_key = tuple(order["key"])
+    try:
+        stage = await ipc_client.request({"type": "order", "order": order}, cache_key, IPC_ACK_TIMEOUT)
+    except Exception as e:
+        # timeout / supervisor yo'qoldi: outbox'ga yozilgani noma'lum -> kalit bo'shatiladi,
+        # boshqa akkaunt (yoki shu xabarning keyingi nusxasi) qayta yuborishi mumkin
+        forwarded_cache.release(cache_key)
+        print(f"⚠️ IPC zakaz ack'i kelmadi: {e!r}")
+        return "error"
+    if stage in IPC_ACCEPTED_STAGES:
+        # shard ichida qayta yubormaslik uchun; global dedupe supervisor'da
+        forwarded_cache.mark_sent(cache_key)
+        return "submitted"
+    forwarded_cache.release(cache_key)
+    return stage or "error"
+
+
+# supervisor bu bosqichlarda zakazni qabul qilgan (outbox'da) yoki u allaqachon yuborilgan
+IPC_ACCEPTED_STAGES = frozenset(("queued", "dup_message", "dup_content"))
+
+
+async def on_ipc_message(msg: dict) -> Optional[dict]:
+    """Supervisor: worker'dan kelgan zakaz -> accept_order (outbox put) -> ack."""
+    if msg.get("type") != "order":
+        return None
+    order = msg["order"]
+    try:
+        stage = await accept_order(order)
+    except Exception as e:
+        print(f"⚠️ IPC zakazni qabul qilishda xato: {e}")
+        stage = "error"
+    m_messages.inc(order.get("phone"), stage)
+    return {"type": "ack", "key": order["key"], "stage": stage}
+
 
 # ===================== HANDLER =====================
 def create_message_handler(phone: str):
     async def handle_message(client: Client, message: Message):
-        global last_cache_update, forwarded_cache, keywords_regex
+        t0 = time.perf_counter()
+        stage = "error"
+        try:
+            stage = await _handle_message(message)
+        finally:
+            m_messages.inc(phone, "seen")
+            m_messages.inc(phone, stage)
+            hourly_stats.message(phone, message.chat.id, stage)
+            m_handler_seconds.observe(time.perf_counter() - t0)
 
-        chat_id = message.chat.id
-        group_name = getattr(message.chat, "title", None) or f"Chat {chat_id}"
+    async def _handle_message(message: Message) -> str:
+        """Qaytaradi: xabar qaysi bosqichda to'xtagani (metrics uchun)."""
+        global forwarded_cache
 
-        if normalize_chat_id(chat_id) == normalize_chat_id(DRIVERS_GROUP_ID):
-            return
+        chat_id = message.chat.id
 
-        now = time.time()
-        if now - last_cache_update > CACHE_TTL:
-            await refresh_keywords()
+        # ✅ 0-bosqich: guruhning egasi boshqa akkaunt -> bitta dict lookup bilan chiqamiz
+        owner = ownership_map.owners.get(chat_id)
+        if owner is not None and owner != phone:
+            return "not_owner"
 
-        cleaned_text, urls, raw_text = extract_text_and_urls(message)
+        # manzil guruhlar (asosiy + kalit so'z manzillari) kuzatilmaydi -> loop yo'q
+        if normalize_chat_id(chat_id) == normalize_chat_id(DRIVERS_GROUP_ID) or chat_id in keywords_snapshot.destinations:
+            return "drivers_group"
 
-        # ✅ MUHIM: keywordni RAW ichidan qidiramiz (katta guruhda link/caption ichida bo'ladi)
-        if not keywords_regex:
-            return
+        # ✅ 1-bosqich (arzon): service / sticker / captionsiz media / bo'sh matn
+        raw_text = message.text or message.caption or ""
+        if message.service or not raw_text or raw_text.isspace():
+            return "no_text"
 
-        blob = (raw_text or cleaned_text or "")
-        if not blob:
-            return
+        # ✅ 2-bosqich: keywordni RAW ichidan qidiramiz (katta guruhda link/caption ichida bo'ladi)
+        matcher = keywords_snapshot.matcher
+        if not matcher:
+            return "no_keyword"
 
-        m = keywords_regex.search(blob)
-        if not m:
-            return
-        matched_keyword = m.group(0).lower()
+        matched_keyword = matcher.search(raw_text)
+        if not matched_keyword:
+            return "no_keyword"
 
         cache_key = (normalize_chat_id(chat_id), int(message.id))
 
-        # ✅ dedupe + takeover
-        async with forward_lock:
-            st = forwarded_cache.get(cache_key)
-            if st:
-                status = st.get("status")
-                ts = float(st.get("ts", 0) or 0)
-                if status == "sent":
-                    return
-                if status == "queued" and (time.time() - ts) < QUEUE_STALE_TTL:
-                    return
+        # ✅ dedupe + takeover (sinxron, await yo'q -> lock shart emas)
+        if not forwarded_cache.claim(cache_key, phone):
+            return "dup_message"
 
-        sender_html, sender_url = build_sender_anchor(message)
-        message_link = get_message_link(message)
-        group_link = get_chat_link(message)
+        group_name = getattr(message.chat, "title", None) or f"Chat {chat_id}"
+        sender_id, sender_username, sender_title = sender_fields(message)
+        keyword_id = keywords_snapshot.keyword_ids.get(matched_keyword)
+
+        # ✅ 2.5-bosqich: haydovchi e'loni? (snapshot ichidagi klassifikator, mikrosekundlar)
+        verdict = None
+        classifier = keywords_snapshot.classifier
+        if classifier is not None and CLASSIFIER_MODE != "off":
+            verdict = classify_order(classifier, raw_text, sender_id)
+            if verdict[1] == "driver_ad" and CLASSIFIER_MODE == "enforce":
+                forwarded_cache.mark_sent(cache_key)  # boshqa akkauntlar ham qayta ishlamasin
+                save_keyword_hit(keyword_id, normalize_chat_id(chat_id), group_name, phone, raw_text,
+                                 verdict, count=False)
+                return "driver_ad"
+
+        # ✅ 3-bosqich (qimmat): faqat mos kelgan xabarlar uchun link/matn ajratish
+        cleaned_text, urls, _ = extract_text_and_urls(message)
+
+        # ✅ render yo'q: navbatga faqat id'lar + tozalangan matn (send_worker render qiladi)
+        dest_chat, thread_id = keywords_snapshot.routes.get(matched_keyword, (None, None))
+        return await submit_order({
+            "key": list(cache_key),
+            "phone": phone,
+            "chat_id": normalize_chat_id(chat_id),
+            "group_name": group_name,
+            "keyword_id": keyword_id,
+            "chat_username": message.chat.username,
+            "sender_id": sender_id,
+            "sender_username": sender_username,
+            "sender_title": sender_title,
+            "text": cleaned_text,
+            "urls": urls,
+            "dest_chat": dest_chat,
+            "thread_id": thread_id,
+            "verdict": verdict,
+            "queued_at": time.time(),
+        })
 
-        safe_text = html.escape(cleaned_text)
+    return handle_message
 
-        extra_links_text = ""
-        if urls:
-            show = urls[:3]
-            extra_links_text = "\n\n" + "\n".join([f"🔗 {html.escape(u)}" for u in show])
-
-        forward_text = (
-            f"🔔 <b>Yangi buyurtma</b>\n"
-            f"📍 Guruh: <b>{html.escape(group_name)}</b>\n"
-            f"👤 Kimdan: {sender_html}\n\n"
-            f"{safe_text}"
-            f"{extra_links_text}\n\n"
-            f"🔗 {message_link}"
-        )
 
-        asyncio.create_task(save_keyword_hit(matched_keyword, chat_id, group_name, phone, cleaned_text))
+# ===================== SESSIONS =====================
+async def load_session_string(phone: str) -> Optional[str]:
+    """userbot_accounts.session_string (haqiqiy Pyrogram string bo'lmasa None)."""
+    if not supabase:
+        return None
+    try:
+        res = await db_run(lambda: supabase.table("userbot_accounts").select("session_string")
+                           .eq("phone_number", phone).limit(1).execute())
+    except Exception as e:
+        print(f"⚠️ [{phone}] session_string o'qilmadi: {e}")
+        return None
+    value = (res.data or [{}])[0].get("session_string")
+    _session_strings[phone] = value
+    return value if valid_session_string(value) else None
 
-        # ✅ katta guruhda BLOCK bo'lmasin
-        try:
-            send_queue.put_nowait((cache_key, forward_text, group_link, message_link, urls, sender_url))
-        except asyncio.QueueFull:
-            await notify_admin_once("queue_full", f"⚠️ send_queue FULL. Xabar drop.\n📍 {group_name}\n📱 {phone}")
-            async with forward_lock:
-                forwarded_cache.pop(cache_key, None)
-            return
 
-        async with forward_lock:
-            forwarded_cache[cache_key] = {"ts": time.time(), "status": "queued", "owner": phone}
+async def save_session_string(phone: str, value: Optional[str]) -> bool:
+    """Bazaga faqat o'zgargan bo'lsa yoziladi; True = yozildi."""
+    if not supabase or _session_strings.get(phone, "") == value:
+        return False
+    try:
+        await db_run(lambda: supabase.table("userbot_accounts").update(
+            {"session_string": value, "updated_at": "now()"}
+        ).eq("phone_number", phone).execute())
+    except Exception as e:
+        print(f"⚠️ [{phone}] session_string saqlanmadi: {e}")
+        return False
+    _session_strings[phone] = value
+    return True
 
-    return handle_message
+
+def build_client(phone: str, session_string: Optional[str]) -> Client:
+    """session_string bo'lsa xotiradagi session (chegaralangan peer kesh), aks holda fayl."""
+    session_base = session_base_for_phone(phone)
+    options = dict(
+        api_id=API_ID,
+        api_hash=API_HASH,
+        phone_number=phone,
+        workers=32,          # katta guruh uchun ko'proq worker
+        sleep_threshold=30
+    )
+    if not session_string:
+        peer_storages.pop(phone, None)
+        return Client(session_base, **options)
+
+    client = Client(os.path.basename(session_base), session_string=session_string, in_memory=True, **options)
+    client.storage = BoundedMemoryStorage(client.name, session_string, PEER_CACHE_MAX)
+    peer_storages[phone] = client.storage
+    return client
+
+
+async def session_snapshotter(client: Client, phone: str):
+    """
+    Client ishlayotgan payt davomida ishlaydi (run_client shu yerda kutadi).
+    memory rejimi yoki SESSION_SNAPSHOT_SECONDS > 0: ulangach session string bazaga,
+    keyin har SESSION_SNAPSHOT_SECONDS da (o'zgargan bo'lsa, masalan DC ko'chishi).
+    """
+    if SESSION_MODE != "memory" and SESSION_SNAPSHOT_SECONDS <= 0:
+        await asyncio.Event().wait()
+    while True:
+        try:
+            if await save_session_string(phone, await client.export_session_string()):
+                print(f"💾 [{phone}] session_string bazaga saqlandi")
+        except Exception as e:
+            print(f"⚠️ [{phone}] Session snapshot xato: {e}")
+        if SESSION_SNAPSHOT_SECONDS <= 0:
+            await asyncio.Event().wait()
+        await asyncio.sleep(SESSION_SNAPSHOT_SECONDS)
 
 
 # ===================== RUN CLIENT =====================
-async def run_client(phone: str):
+async def run_client(phone: str, on_ready=None) -> str:
+    """
+    on_ready(ok): StartupScheduler slotini bo'shatish uchun (ulandi + sync tugadi / xato).
+    Qaytaradi (FleetSupervisor uchun): "retry" - vaqtinchalik xato, backoff bilan qayta ulanadi;
+    "fatal" - qayta login kerak / boshqa joyda ishlayapti, bazada status o'zgarguncha kutadi.
+    """
     print(f"\n📱 [{phone}] Ishga tushmoqda...")
     update_account_status(phone, "connecting")
 
     session_base = session_base_for_phone(phone)
 
-    client = Client(
-        session_base,
-        api_id=API_ID,
-        api_hash=API_HASH,
-        phone_number=phone,
-        workers=32,          # katta guruh uchun ko'proq worker
-        sleep_threshold=30
+    session_string = None
+    if SESSION_MODE == "memory":
+        session_string = await load_session_string(phone)
+        if not session_string:
+            print(f"💽 [{phone}] Bazada session_string yo'q -> fayl session (ulangach bazaga saqlanadi)")
+    client = build_client(phone, session_string)
+
+    # ✅ incoming group/channel; bloklangan guruhlar birinchi filtrda tushadi (handler chaqirilmaydi)
+    client.on_message(allowed_chats & (filters.group | filters.channel) & filters.incoming)(
+        create_message_handler(phone)
     )
 
-    # ✅ incoming group/channel
-    client.on_message((filters.group | filters.channel) & filters.incoming)(create_message_handler(phone))
+    # ✅ a'zolik o'zgarishlari (qayta skan o'rniga)
+    on_service, on_raw = create_membership_handlers(phone)
+    client.on_message(filters.service & filters.group, group=1)(on_service)
+    client.on_raw_update(group=1)(on_raw)
 
     try:
         await client.start()
@@ -771,13 +1701,26 @@ async def run_client(phone: str):
         update_account_status(phone, "active")
 
         await sync_all_groups(client, phone)
-        print_statistics()
+        if on_ready:
+            on_ready(True)
+        else:
+            print_statistics()
 
-        await asyncio.Event().wait()
+        await session_snapshotter(client, phone)
+
+    except asyncio.CancelledError:
+        # fleet: bazadan o'chirildi yoki shutdown
+        try:
+            await client.stop()
+        except Exception:
+            pass
+        raise
 
     except Exception as e:
         msg = str(e)
         print(f"❌ [{phone}] Xato: {msg}")
+        if on_ready:
+            on_ready(False)
 
         try:
             await client.stop()
@@ -792,12 +1735,15 @@ async def run_client(phone: str):
                 f"📱 Raqam: {phone}\n"
                 "✅ Session o'chirilmadi.\n"
                 "📌 Bu raqam boshqa joyda ishlayapti. O'sha joyni STOP qiling.\n"
-                "🔁 Keyin qayta ishga tushiring."
+                "🔁 Keyin dashboard'dan qayta ulang (status pending/active bo'lsa o'zi ishga tushadi)."
             )
-            return
+            return "fatal"
 
         if "AUTH_KEY_UNREGISTERED" in msg:
             deleted = await safe_delete_session_files(session_base, tries=12)
+            if _session_strings.get(phone):
+                # o'lik kalit bazada qolmasin (boshqa host ham shu bilan ulanmasin)
+                await save_session_string(phone, None)
             update_account_status(phone, "relogin_required")
             await notify_admin_once(
                 f"unreg_{phone}",
@@ -806,18 +1752,141 @@ async def run_client(phone: str):
                 f"🧹 Session delete: {'✅' if deleted else '❌'}\n"
                 "🔁 Qayta login kerak."
             )
-            return
+            return "fatal"
 
         update_account_status(phone, "error")
         await notify_admin_once(f"err_{phone}", f"❌ Userbot error\n📱 {phone}\n🧾 {msg}")
+        return "retry"
+
+
+# ===================== METRICS SERVER =====================
+def register_gauges():
+    metrics.gauge("userbot_send_queue_depth", "Ack qilinmagan zakazlar (xotira + disk)",
+                  lambda: send_queue.qsize() if send_queue else 0)
+    metrics.gauge("userbot_send_queue_memory", "Xotiradagi navbat",
+                  lambda: send_queue.mem_size() if send_queue else 0)
+    metrics.gauge("userbot_send_lanes", "Manzil lane'lari (har biri alohida navbat + rate budget)",
+                  lambda: len(send_lanes))
+    metrics.gauge("userbot_bot_api_throttled", "Bot API 429 soni (jami)", lambda: send_scheduler.throttled)
+    metrics.gauge("userbot_send_backoff_seconds", "Umumiy 429 backoff qoldig'i",
+                  lambda: send_scheduler.stats()["backoff_left"])
+    metrics.gauge("userbot_forward_cache_size", "Forward dedupe yozuvlari", lambda: len(forwarded_cache))
+    metrics.gauge("userbot_forward_cache_evicted", "Limit tufayli chiqarilganlar", lambda: forwarded_cache.evicted)
+    metrics.gauge("userbot_content_cache_senders", "Kontent dedupe: senderlar", lambda: len(content_cache))
+    metrics.gauge("userbot_keywords", "Joriy snapshot'dagi kalit so'zlar", lambda: len(keywords_snapshot))
+    metrics.gauge("userbot_keywords_version", "Joriy snapshot versiyasi", lambda: keywords_snapshot.version)
+    metrics.gauge("userbot_db_rows_written", "Supabase bulk insert qatorlari",
+                  lambda: db_writer.written if db_writer else 0)
+    metrics.gauge("userbot_stats_pending", "Flush kutayotgan soatlik statistika kalitlari",
+                  hourly_stats.pending)
+    metrics.gauge("userbot_stats_rows_flushed", "Bazaga yozilgan rollup qatorlari",
+                  lambda: hourly_stats.flushed_rows)
+    metrics.gauge("userbot_blocked_groups", "Chat filtridagi bloklangan guruhlar", lambda: len(chat_gate.blocked))
+    metrics.gauge("userbot_peer_cache_size", "Xotiradagi session'lar peers jadvali (jami)",
+                  lambda: sum(len(st) for st in peer_storages.values()))
+    metrics.gauge("userbot_peer_cache_evicted", "Limit tufayli o'chirilgan peer'lar (jami)",
+                  lambda: sum(st.evicted for st in peer_storages.values()))
+    metrics.gauge("userbot_owned_groups", "Egasi aniqlangan guruhlar", lambda: len(ownership_map))
+    metrics.gauge("userbot_ownership_build_ms", "Egalik snapshot'ini qurish vaqti", lambda: ownership_map.build_ms)
+    metrics.gauge("userbot_running_clients", "Ulangan (up) clientlar",
+                  lambda: fleet.up_count() if fleet else 0)
+    metrics.gauge("userbot_client_restarts", "Clientlar qayta ulangan soni (jami)",
+                  lambda: fleet.total_restarts() if fleet else 0)
+
+
+async def start_metrics():
+    if METRICS_PORT <= 0:
         return
+    register_gauges()
+    # workerlar: METRICS_PORT+1+shard (supervisor asosiy portda)
+    port = METRICS_PORT + 1 + SHARD_INDEX if ROLE == "worker" else METRICS_PORT
+    try:
+        await start_metrics_server(metrics, METRICS_HOST, port)
+        print(f"📈 Metrics: http://{METRICS_HOST}:{port}/metrics")
+    except Exception as e:
+        print(f"⚠️ Metrics server ishga tushmadi: {e}")
 
 
 # ===================== MAIN =====================
+async def start_sender():
+    """Outbox + yuborish workerlari (bitta jarayonda yoki supervisor'da)."""
+    global send_queue
+    send_queue = Outbox(OUTBOX_PATH, mem_max=QUEUE_MAX, disk_max=OUTBOX_DISK_MAX,
+                        dumps=OrderRecord.dumps, loads=OrderRecord.loads)
+    if send_queue.replayed:
+        print(f"♻️ Outbox: {send_queue.replayed} ta yuborilmagan zakaz qayta navbatga qo'yildi")
+
+    # asosiy lane + restartdan keyin diskda qolgan boshqa manzillar
+    for lane in [0] + send_queue.lanes():
+        ensure_lane(lane)
+    print(f"📤 Yuborish workerlari: {max(1, SEND_WORKERS)} ta | lane'lar: {len(send_lanes)} | queue={QUEUE_MAX}")
+
+
+async def start_clients(phones: list):
+    """Kesh + kalit so'zlar + Pyrogram clientlar (bitta jarayonda yoki worker'da)."""
+    global fleet
+    await load_groups_cache()
+    asyncio.create_task(periodic_groups_cache_refresh())
+
+    await refresh_keywords(full=True)
+    asyncio.create_task(keywords_refresher())
+    await refresh_account_statuses()  # egalik: boshqa shard'lardagi akkauntlar
+    await refresh_chat_gate()  # clientlar ulanishidan oldin (birinchi xabardan bloklar ishlaydi)
+    asyncio.create_task(chat_gate_refresher())
+
+    fleet = FleetSupervisor(run_client, running_clients,
+                            FLEET_MIN_BACKOFF, FLEET_MAX_BACKOFF, FLEET_STABLE_AFTER)
+
+    def spawn(p: str, mark_ready) -> asyncio.Task:
+        # supervise task: xato bo'lsa ham tugamaydi, mark_ready(False) slotni bo'shatadi
+        return fleet.add(p, on_ready=mark_ready)
+
+    # ✅ hammasi birdan emas: semaphore + jitter, ko'p guruhli akkauntlar birinchi
+    phones = StartupScheduler.prioritize(
+        [p for p in phones if p not in running_clients],
+        lambda p: len(account_groups_cache.get(p, {})),
+    )
+    scheduler = StartupScheduler(STARTUP_CONCURRENCY, STARTUP_JITTER)
+    print(f"\n🔄 Akkauntlar ishga tushirilmoqda... ({len(phones)} ta, bir vaqtda {scheduler.concurrency})")
+    scheduler.launch(phones, spawn)
+
+    summary = await scheduler.wait_ready()
+    print(
+        f"🏁 Tayyor: {summary['ready']}/{len(phones)} akkaunt (xato: {summary['failed']}) "
+        f"| time-to-ready {summary['time_to_ready']:.1f}s (p50 {summary['p50']:.1f}s)"
+    )
+    print_statistics()
+    # startup tugagach: yangi / o'chirilgan raqamlar bazadan kuzatiladi (hot-add/remove)
+    asyncio.create_task(accounts_poller())
+    return summary
+
+
+async def run_supervisor():
+    """SHARDS > 1: IPC server + N ta worker jarayon. Bu jarayon faqat yuboradi."""
+    ipc_server = IpcServer(on_ipc_message)
+    await ipc_server.start()
+    workers = WorkerSupervisor(SHARDS, os.path.abspath(__file__), {
+        "USERBOT_IPC": ipc_server.address,
+        "USERBOT_IPC_TOKEN": ipc_server.token,
+    })
+    workers.start()
+    print(f"🧩 Supervisor: {SHARDS} ta shard | IPC {ipc_server.address}")
+
+    metrics.gauge("userbot_ipc_orders_received", "Workerlardan kelgan zakazlar", lambda: ipc_server.received)
+    metrics.gauge("userbot_shard_restarts", "Worker jarayonlar qayta ishga tushirilgan soni",
+                  lambda: sum(workers.restarts.values()))
+    try:
+        await notify_admin_once("started", f"✅ Userbot ishga tushdi ({SHARDS} shard).")
+        await asyncio.Event().wait()
+    finally:
+        await workers.stop()
+        await ipc_server.close()
+
+
 async def main():
-    global ALL_PHONES, aiohttp_session
+    global ALL_PHONES, aiohttp_session, db_writer, ipc_client
 
-    print("🚀 UserBot Multi-Account ishga tushmoqda...")
+    print(f"🚀 UserBot Multi-Account ishga tushmoqda... ({ROLE})")
     print(f"📁 BASE_DIR: {BASE_DIR}")
     print(f"📁 SESS_DIR: {SESS_DIR}")
     print(f"📁 CWD: {os.getcwd()}")
@@ -826,50 +1895,85 @@ async def main():
         print("❌ Supabase'ga ulanib bo'lmadi. Chiqish...")
         sys.exit(1)
 
-    connector = aiohttp.TCPConnector(limit=300, ttl_dns_cache=300)
-    aiohttp_session = aiohttp.ClientSession(connector=connector)
+    db_writer = SupabaseWriter(supabase, DB_WORKERS, DB_BATCH_SIZE, DB_FLUSH_MS)
+    db_writer.start()
+    asyncio.create_task(stats_flusher())
 
-    for i in range(max(1, SEND_WORKERS)):
-        asyncio.create_task(send_worker(i + 1))
-    print(f"📤 Yuborish workerlari: {max(1, SEND_WORKERS)} ta | queue={QUEUE_MAX}")
+    try:
+        connector = aiohttp.TCPConnector(limit=300, ttl_dns_cache=300)
+        aiohttp_session = aiohttp.ClientSession(connector=connector)
+
+        if ROLE == "worker":
+            # ✅ worker: outbox/admin poller yo'q (ular supervisor'da), faqat o'z shard'idagi raqamlar
+            ipc_client = IpcClient(IPC_ADDRESS, IPC_TOKEN)
+            await ipc_client.connect()
+            await start_metrics()
+
+            phones = await db_run(fetch_phone_numbers_from_db) or PHONE_NUMBERS_ENV_FALLBACK
+            phones = [p for p in uniq_keep_order(phones) if shard_for_phone(p, SHARDS) == SHARD_INDEX]
+            ALL_PHONES = phones
+            print(f"📱 Shard {SHARD_INDEX}/{SHARDS}: {len(phones)} ta raqam")
+
+            await start_clients(phones)
+            # supervisor yo'qolsa worker ham chiqadi (yetim jarayon qolmasin)
+            await ipc_client.wait_closed()
+            print(f"👋 Shard {SHARD_INDEX}: supervisor bilan aloqa uzildi")
+            return
 
-    await load_groups_cache()
-    await ensure_accounts_seeded_from_env()
+        await start_sender()
+        await start_metrics()
+        await ensure_accounts_seeded_from_env()
+        asyncio.create_task(admin_command_poller())
 
-    asyncio.create_task(admin_command_poller())
+        phones = await db_run(fetch_phone_numbers_from_db) or PHONE_NUMBERS_ENV_FALLBACK
+        phones = uniq_keep_order(phones)
+        ALL_PHONES = phones
 
-    phones = fetch_phone_numbers_from_db() or PHONE_NUMBERS_ENV_FALLBACK
-    phones = uniq_keep_order(phones)
-    ALL_PHONES = phones
+        print(f"📱 Raqamlar soni: {len(phones)}")
+        if not phones:
+            print("❌ Bazada ham, .env fallback'da ham raqam yo'q!")
+            sys.exit(1)
 
-    print(f"📱 Raqamlar soni: {len(phones)}")
-    if not phones:
-        print("❌ Bazada ham, .env fallback'da ham raqam yo'q!")
-        sys.exit(1)
+        if ROLE == "supervisor":
+            await run_supervisor()
+            return
 
-    await refresh_keywords()
-    asyncio.create_task(periodic_keywords_refresh())
+        summary = await start_clients(phones)
 
-    async def start_phone(p: str):
-        if p in running_clients:
-            return
-        running_clients[p] = asyncio.create_task(run_client(p))
+        await notify_admin_once(
+            "started",
+            f"✅ Userbot ishga tushdi: {summary['ready']}/{len(phones)} akkaunt, "
+            f"{summary['time_to_ready']:.0f}s"
+        )
+        await asyncio.Event().wait()
+    finally:
+        # ✅ buferdagi statistika / keyword_hits / statuslar yo'qolmasin
+        await flush_stats()
+        await db_writer.close()
 
-    print("\n🔄 Akkauntlar ishga tushirilmoqda...")
-    for p in phones:
-        await start_phone(p)
 
-    await notify_admin_once("started", "✅ Userbot ishga tushdi.")
-    await asyncio.Event().wait()
+def _is_fatal(phone: str) -> bool:
+    st = fleet.states.get(phone) if fleet else None
+    return st is not None and st.status == "fatal"
+
+
+def _sigterm(*_):
+    # worker: supervisor terminate() qilganda ham statuslar "stopped" bo'lsin
+    raise KeyboardInterrupt
 
 
 # ===================== ENTRY =====================
 if __name__ == "__main__":
+    if ROLE == "worker":
+        signal.signal(signal.SIGTERM, _sigterm)
     try:
         asyncio.run(main())
     except KeyboardInterrupt:
         print("\n👋 UserBot to'xtatildi")
-        for phone in list(running_clients.keys()) or PHONE_NUMBERS_ENV_FALLBACK:
+        # supervisor'da clientlar yo'q: statuslarni workerlar o'zi yozadi
+        # fatal (relogin_required / duplicated) statuslar ustidan yozilmaydi
+        stoppable = [p for p in running_clients if not _is_fatal(p)]
+        for phone in [] if ROLE == "supervisor" else (stoppable or PHONE_NUMBERS_ENV_FALLBACK):
             update_account_status(phone, "stopped")
 
         try:
@@ -881,10 +1985,14 @@ if __name__ == "__main__":
         except Exception:
             pass
 
+        if send_queue:
+            send_queue.close()
+
     except Exception as e:
         print(f"❌ Kritik xato: {e}")
         for phone in list(running_clients.keys()):
-            update_account_status(phone, "error")
+            if not _is_fatal(phone):
+                update_account_status(phone, "error")
 
         try:
             loop = asyncio.new_event_loop()
@@ -894,3 +2002,6 @@ if __name__ == "__main__":
             loop.close()
         except Exception:
             pass
+
+        if send_queue:
+            send_queue.close()
@@ -0,0 +1,266 @@
+"""Kalit so'z matcher'lari.
+
+- Matn bir marta normallashtiriladi: casefold + kirill -> lotin + apostroflar.
+- AhoCorasickMatcher: barcha kalit so'zlarni bitta chiziqli o'tishda topadi
+  (katta alternation regex kabi har pozitsiyada qayta urinmaydi).
+- RegexMatcher: eski usul (fallback), lekin normallashtirish bir xil.
+- KeywordSnapshot: matcher + id'lar + manzillar + klassifikator, o'zgarmas;
+  refresher atomar almashtiradi.
+"""
+
+import re
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# ===================== NORMALIZE =====================
+# O'zbek kirill -> lotin (kichik harflar, casefold'dan keyin ishlatiladi)
+_CYR_TO_LAT = {
+    "а": "a", "б": "b", "в": "v", "г": "g", "д": "d", "е": "e", "ё": "yo",
+    "ж": "j", "з": "z", "и": "i", "й": "y", "к": "k", "л": "l", "м": "m",
+    "н": "n", "о": "o", "п": "p", "р": "r", "с": "s", "т": "t", "у": "u",
+    "ф": "f", "х": "x", "ц": "ts", "ч": "ch", "ш": "sh", "щ": "sh", "ъ": "'",
+    "ы": "i", "ь": "", "э": "e", "ю": "yu", "я": "ya",
+    "ў": "o'", "қ": "q", "ғ": "g'", "ҳ": "h",
+}
+_APOSTROPHES = "ʻʼ’‘`´"
+
+_TRANSLIT = str.maketrans({
+    **_CYR_TO_LAT,
+    **{a: "'" for a in _APOSTROPHES},
+})
+
+
+def normalize_text(text: str) -> str:
+    """casefold + kirill/lotin + apostrof variantlari -> bitta ko'rinish."""
+    if not text:
+        return ""
+    return text.casefold().translate(_TRANSLIT)
+
+
+def _normalized_patterns(keywords: Iterable[str]) -> Tuple[Dict[str, str], Dict[str, Tuple[str, ...]]]:
+    """
+    Qaytaradi: (normalized -> original (lower), to'qnashuvlar).
+    Bir nechta kalit so'z bir xil normal ko'rinishga tushsa (masalan "xiva" va "хива")
+    ulardan alifbo bo'yicha birinchisi tanlanadi (DB tartibiga bog'liq emas);
+    to'qnashuvlar: tanlangan -> hammasi (chaqiruvchi ogohlantirish chiqaradi).
+    Boshidagi/oxiridagi bo'shliq kesilmaydi: admin " xiva " yozsa so'z chegarasi
+    sifatida ishlaydi ("xivaga" mos kelmaydi), eski regex bilan bir xil.
+    """
+    groups: Dict[str, List[str]] = {}
+    for kw in keywords:
+        if not kw:
+            continue
+        norm = normalize_text(kw)
+        if norm.strip():
+            originals = groups.setdefault(norm, [])
+            if kw.lower() not in originals:
+                originals.append(kw.lower())
+    patterns: Dict[str, str] = {}
+    collisions: Dict[str, Tuple[str, ...]] = {}
+    for norm, originals in groups.items():
+        originals.sort()
+        patterns[norm] = originals[0]
+        if len(originals) > 1:
+            collisions[originals[0]] = tuple(originals)
+    return patterns, collisions
+
+
+def _leftmost_longest(hits: List[Tuple[int, int, str]]) -> Optional[str]:
+    best = None
+    for start, length, kw in hits:
+        if best is None or start < best[0] or (start == best[0] and length > best[1]):
+            best = (start, length, kw)
+    return best[2] if best else None
+
+
+# ===================== AHO-CORASICK =====================
+class AhoCorasickMatcher:
+    """
+    Oldindan kompilyatsiya qilingan avtomat.
+    search()/find_all() matnni o'zi normallashtiradi (bir marta).
+    """
+
+    engine = "aho"
+
+    __slots__ = ("_goto", "_fail", "_out", "_alphabet", "_keywords", "collisions")
+
+    def __init__(self, keywords: Iterable[str]):
+        patterns, self.collisions = _normalized_patterns(keywords)
+        self._keywords: Tuple[str, ...] = tuple(patterns.values())
+
+        goto: List[Dict[str, int]] = [{}]
+        out: List[Tuple[Tuple[int, str], ...]] = [()]
+
+        for norm, original in patterns.items():
+            state = 0
+            for ch in norm:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][ch] = nxt
+                    goto.append({})
+                    out.append(())
+                state = nxt
+            out[state] = out[state] + ((len(norm), original),)
+
+        # BFS: fail linklar + outputlarni fail zanjiri bo'ylab birlashtirish
+        fail = [0] * len(goto)
+        queue = list(goto[0].values())
+        head = 0
+        while head < len(queue):
+            state = queue[head]
+            head += 1
+            for ch, nxt in goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                target = goto[f].get(ch, 0)
+                fail[nxt] = target if target != nxt else 0
+                if out[fail[nxt]]:
+                    out[nxt] = out[nxt] + out[fail[nxt]]
+
+        self._goto = goto
+        self._fail = fail
+        self._out = out
+        self._alphabet = frozenset(ch for trans in goto for ch in trans)
+
+    def __len__(self) -> int:
+        return len(self._keywords)
+
+    @property
+    def keywords(self) -> Tuple[str, ...]:
+        return self._keywords
+
+    def find_normalized(self, norm: str) -> List[Tuple[int, int, str]]:
+        """Oldindan normallashtirilgan matn uchun: [(start, length, keyword), ...]."""
+        goto = self._goto
+        fail = self._fail
+        out = self._out
+        alphabet = self._alphabet
+
+        hits = []
+        state = 0
+        for i, ch in enumerate(norm):
+            if ch not in alphabet:
+                state = 0
+                continue
+            nxt = goto[state].get(ch)
+            while nxt is None and state:
+                state = fail[state]
+                nxt = goto[state].get(ch)
+            state = nxt or 0
+            if out[state]:
+                for length, kw in out[state]:
+                    hits.append((i - length + 1, length, kw))
+        return hits
+
+    def find_all(self, text: str) -> List[Tuple[int, int, str]]:
+        return self.find_normalized(normalize_text(text))
+
+    def search(self, text: str) -> Optional[str]:
+        """Eng chapdagi (teng bo'lsa eng uzun) kalit so'z yoki None."""
+        return _leftmost_longest(self.find_all(text))
+
+
+# ===================== REGEX (FALLBACK) =====================
+class RegexMatcher:
+    """Eski alternation regex, lekin AhoCorasickMatcher bilan bir xil semantika."""
+
+    engine = "regex"
+
+    __slots__ = ("_regex", "_patterns", "_keywords", "collisions")
+
+    def __init__(self, keywords: Iterable[str]):
+        self._patterns, self.collisions = _normalized_patterns(keywords)
+        self._keywords: Tuple[str, ...] = tuple(self._patterns.values())
+        self._regex = None
+        if self._patterns:
+            self._regex = re.compile(
+                "|".join(re.escape(k) for k in sorted(self._patterns, key=len, reverse=True))
+            )
+
+    def __len__(self) -> int:
+        return len(self._keywords)
+
+    @property
+    def keywords(self) -> Tuple[str, ...]:
+        return self._keywords
+
+    def find_normalized(self, norm: str) -> List[Tuple[int, int, str]]:
+        if not self._regex:
+            return []
+        hits = []
+        pos = 0
+        while True:
+            m = self._regex.search(norm, pos)
+            if not m:
+                return hits
+            hits.append((m.start(), m.end() - m.start(), self._patterns[m.group(0)]))
+            pos = m.start() + 1
+
+    def find_all(self, text: str) -> List[Tuple[int, int, str]]:
+        return self.find_normalized(normalize_text(text))
+
+    def search(self, text: str) -> Optional[str]:
+        if not self._regex:
+            return None
+        m = self._regex.search(normalize_text(text))
+        return self._patterns[m.group(0)] if m else None
+
+
+MATCHER_ENGINES = {
+    AhoCorasickMatcher.engine: AhoCorasickMatcher,
+    RegexMatcher.engine: RegexMatcher,
+}
+
+
+def build_matcher(keywords: Iterable[str], engine: str = "aho"):
+    """Matcher yaratadi. Kalit so'z bo'lmasa None (handler tez chiqadi)."""
+    cls = MATCHER_ENGINES.get((engine or "aho").lower(), AhoCorasickMatcher)
+    matcher = cls(keywords)
+    return matcher if len(matcher) else None
+
+
+# ===================== SNAPSHOT =====================
+class KeywordSnapshot:
+    """
+    O'zgarmas kalit so'z snapshot'i. Handler faqat global referensni o'qiydi,
+    refresher yangisini tayyorlab bitta assignment bilan almashtiradi.
+    """
+
+    __slots__ = ("version", "matcher", "keyword_ids", "routes", "destinations", "classifier",
+                 "compiled_at", "compile_ms")
+
+    def __init__(self, version: int, matcher, keyword_ids: Dict[str, object],
+                 compiled_at: float, compile_ms: float,
+                 routes: Optional[Dict[str, Tuple[int, Optional[int]]]] = None, classifier=None):
+        self.version = version
+        self.matcher = matcher
+        self.keyword_ids = keyword_ids      # keyword (lower) -> keywords.id
+        self.routes = routes or {}          # keyword (lower) -> (chat_id, thread_id); yo'q = asosiy manzil
+        self.destinations = frozenset(chat for chat, _ in self.routes.values())  # kuzatilmaydi
+        self.classifier = classifier        # classifier.OrderClassifier yoki None (o'chiq)
+        self.compiled_at = compiled_at
+        self.compile_ms = compile_ms
+
+    def __len__(self) -> int:
+        return len(self.keyword_ids)
+
+    @classmethod
+    def empty(cls) -> "KeywordSnapshot":
+        return cls(0, None, {}, 0.0, 0.0)
+
+
+def compile_snapshot(version: int, keyword_ids: Dict[str, object], engine: str = "aho",
+                     routes: Optional[Dict[str, Tuple[int, Optional[int]]]] = None,
+                     classifier_factory=None) -> KeywordSnapshot:
+    """
+    Yangi snapshot (og'ir ish, event loop'dan tashqarida chaqirish mumkin).
+    classifier_factory(): klassifikatorni shu yerda (bir xil thread'da) kompilyatsiya qiladi.
+    """
+    t0 = time.perf_counter()
+    matcher = build_matcher(keyword_ids.keys(), engine)
+    classifier = classifier_factory() if classifier_factory else None
+    return KeywordSnapshot(version, matcher, dict(keyword_ids), time.time(),
+                           (time.perf_counter() - t0) * 1000.0, dict(routes or {}), classifier)
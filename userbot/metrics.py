@@ -0,0 +1,148 @@
+"""Prometheus text formatidagi metrikalar (/metrics).
+
+Hot-path uchun arzon: barcha yangilanishlar event loop thread'ida bo'ladi,
+shuning uchun oddiy dict += yetarli (lock yo'q). Scrape paytida bir marta
+matnga yig'iladi. Gauge'lar scrape paytida callback orqali o'qiladi.
+"""
+
+import math
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Tuple[str, ...], values: Tuple, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _fmt(v: float) -> str:
+    if v == math.inf:
+        return "+Inf"
+    if float(v).is_integer():
+        return str(int(v))
+    return repr(float(v))
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.values: Dict[Tuple, float] = {}
+
+    def inc(self, *labels, value: float = 1.0):
+        self.values[labels] = self.values.get(labels, 0.0) + value
+
+    def total(self, **match) -> float:
+        idx = [(self.labels.index(k), v) for k, v in match.items()]
+        return sum(v for key, v in self.values.items() if all(key[i] == m for i, m in idx))
+
+    def collect(self) -> List[str]:
+        return [f"{self.name}{_labels(self.labels, k)} {_fmt(v)}" for k, v in self.values.items()]
+
+
+class Gauge:
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, fn: Callable[[], float]):
+        self.name = name
+        self.help = help_text
+        self.fn = fn
+
+    def collect(self) -> List[str]:
+        try:
+            return [f"{self.name} {_fmt(float(self.fn()))}"]
+        except Exception:
+            return []
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: Iterable[str] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self.values: Dict[Tuple, list] = {}   # labels -> [counts..., sum, count]
+
+    def observe(self, value: float, *labels):
+        st = self.values.get(labels)
+        if st is None:
+            st = self.values[labels] = [0] * len(self.buckets) + [0.0, 0]
+        i = bisect_left(self.buckets, value)
+        if i < len(self.buckets):
+            st[i] += 1
+        st[-2] += value
+        st[-1] += 1
+
+    def collect(self) -> List[str]:
+        out = []
+        for key, st in self.values.items():
+            acc = 0
+            for le, n in zip(self.buckets, st):
+                acc += n
+                le_label = 'le="%s"' % _fmt(le)
+                out.append(f"{self.name}_bucket{_labels(self.labels, key, le_label)} {acc}")
+            inf_label = 'le="+Inf"'
+            out.append(f"{self.name}_bucket{_labels(self.labels, key, inf_label)} {st[-1]}")
+            out.append(f"{self.name}_sum{_labels(self.labels, key)} {_fmt(st[-2])}")
+            out.append(f"{self.name}_count{_labels(self.labels, key)} {st[-1]}")
+        return out
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[object] = []
+
+    def counter(self, name: str, help_text: str, labels: Iterable[str] = ()) -> Counter:
+        m = Counter(name, help_text, labels)
+        self._metrics.append(m)
+        return m
+
+    def gauge(self, name: str, help_text: str, fn: Callable[[], float]) -> Gauge:
+        m = Gauge(name, help_text, fn)
+        self._metrics.append(m)
+        return m
+
+    def histogram(self, name: str, help_text: str, labels: Iterable[str] = (),
+                  buckets: Optional[Tuple[float, ...]] = None) -> Histogram:
+        m = Histogram(name, help_text, labels, buckets or DEFAULT_BUCKETS)
+        self._metrics.append(m)
+        return m
+
+    def render(self) -> str:
+        lines = []
+        for m in self._metrics:
+            lines.append(f"# HELP {m.name} {m.help}")
+            lines.append(f"# TYPE {m.name} {m.kind}")
+            lines.extend(m.collect())
+        return "\n".join(lines) + "\n"
+
+
+async def start_metrics_server(registry: Registry, host: str, port: int):
+    """aiohttp.web: GET /metrics (text exposition format 0.0.4)."""
+    from aiohttp import web
+
+    async def handle(_request):
+        return web.Response(text=registry.render(),
+                            headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"})
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    return runner
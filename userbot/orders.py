@@ -0,0 +1,102 @@
+"""Navbatdagi zakaz yozuvi (ixcham, render send paytida).
+
+- OrderRecord: __slots__ (dict yo'q) - faqat id'lar, intern qilingan guruh/sender
+  nomlari va tozalangan matn (bir marta). HTML matn, linklar va keyboard
+  send_worker'da render.py orqali yasaladi -> navbatda 15000 zakaz
+  turganda bir xil satrlar takrorlanmaydi va matn yuborish paytidagi holatda bo'ladi.
+- Diskda (outbox.db) ixcham JSON massiv.
+
+Pyrogram'ga bog'liq emas (bench.py ham ishlatadi).
+"""
+
+import json
+import sys
+from typing import Any, Dict, List, Optional, Tuple
+
+import render
+
+# json.dumps(..., ensure_ascii=False) har chaqiruvda yangi encoder yaratadi
+_dumps = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+
+
+def _intern(value: Optional[str]) -> Optional[str]:
+    return sys.intern(value) if value else None
+
+
+class OrderRecord:
+    """
+    sender_* maydonlari:
+      sender_title yo'q, sender_id bor -> foydalanuvchi (username bo'lsa t.me, bo'lmasa tg://user)
+      sender_title bor                 -> sender_chat (kanal/anonim admin)
+      ikkalasi ham yo'q                -> noma'lum
+    """
+
+    __slots__ = ("chat_id", "msg_id", "chat_username", "group_name", "sender_id",
+                 "sender_username", "sender_title", "text", "urls", "thread_id", "queued_at")
+
+    def __init__(self, chat_id: int, msg_id: int, chat_username: Optional[str], group_name: str,
+                 sender_id: Optional[int], sender_username: Optional[str], sender_title: Optional[str],
+                 text: str, urls: Optional[List[str]] = None, thread_id: Optional[int] = None,
+                 queued_at: float = 0.0):
+        self.chat_id = chat_id
+        self.msg_id = msg_id
+        self.chat_username = _intern(chat_username)
+        self.group_name = _intern(group_name)
+        self.sender_id = sender_id
+        self.sender_username = _intern(sender_username)
+        self.sender_title = _intern(sender_title)
+        self.text = text
+        self.urls = tuple(urls) if urls else None   # ko'p zakazda link yo'q -> bo'sh list saqlanmaydi
+        self.thread_id = thread_id
+        self.queued_at = queued_at
+
+    @property
+    def key(self) -> Tuple[int, int]:
+        """forwarded_cache kaliti (normalize_chat_id(chat_id), message.id)."""
+        return self.chat_id, self.msg_id
+
+    @classmethod
+    def from_order(cls, order: Dict[str, Any]) -> "OrderRecord":
+        """Handler/IPC dict'idan (accept_order)."""
+        chat_id, msg_id = order["key"]
+        return cls(chat_id, msg_id, order.get("chat_username"), order.get("group_name") or f"Chat {chat_id}",
+                   order.get("sender_id"), order.get("sender_username"), order.get("sender_title"),
+                   order.get("text") or "", order.get("urls"), order.get("thread_id"),
+                   float(order.get("queued_at") or 0.0))
+
+    # ===================== RENDER =====================
+    def message_link(self) -> str:
+        return render.message_link(self.chat_id, self.chat_username, self.msg_id)
+
+    def sender(self) -> Tuple[str, Optional[str]]:
+        """(sender_html, sender_url) - main.build_sender_anchor bilan bir xil."""
+        if self.sender_title is None:
+            if self.sender_id is None:
+                return render.UNKNOWN_SENDER, None
+            return render.user_anchor(self.sender_id, self.sender_username)
+        if self.sender_username:
+            url = f"https://t.me/{self.sender_username}"
+            return render.link_anchor(url, self.sender_title), url
+        # anonymous/channel bo'lsa user lichka bo'lmaydi
+        return render.link_anchor(self.message_link(), self.sender_title), None
+
+    def html(self) -> str:
+        sender_html, _ = self.sender()
+        return render.render_order(render.group_header(self.chat_id, self.group_name), sender_html,
+                                   self.text, self.urls, self.message_link())
+
+    def keyboard(self) -> str:
+        msg_link = self.message_link()
+        group_link = render.chat_link(self.chat_id, self.chat_username, self.msg_id)
+        return render.keyboard_json(group_link, msg_link, self.urls, self.sender()[1])
+
+    # ===================== OUTBOX CODEC =====================
+    def dumps(self) -> str:
+        return _dumps([self.chat_id, self.msg_id, self.chat_username, self.group_name, self.sender_id,
+                       self.sender_username, self.sender_title, self.text, self.urls, self.thread_id,
+                       self.queued_at])
+
+    @staticmethod
+    def loads(raw: str) -> "OrderRecord":
+        return OrderRecord(*json.loads(raw))
+
@@ -0,0 +1,192 @@
+"""Diskka yoziladigan outbound queue (SQLite, WAL).
+
+- put(): sinxron, bloklamaydi (await yo'q), har bir zakaz darhol diskka yoziladi.
+- get(): xotiradagi navbatdan oladi; xotira to'lsa zakazlar faqat diskda qoladi
+  (spill) va navbat bo'shagan sari diskdan tartib bilan qayta yuklanadi.
+- ack(): yuborilgandan (yoki doimiy xatodan) keyin o'chiriladi. Ack qilinmaganlar
+  restartda qayta o'qiladi (at-least-once).
+- requeue(): vaqtinchalik xato -> qator diskda qoladi, delay'dan keyin xotiradagi
+  navbatga qaytadi (shutdown bo'lsa restartda diskdan).
+- dumps/loads: payload <-> disk matni (standart JSON dict; main.py orders.OrderRecord
+  beradi -> xotirada ixcham obyekt, diskda ixcham massiv).
+- lane: har bir manzil (chat) uchun alohida navbat -> sekin manzil boshqalarini
+  to'sib qo'ymaydi. 0 = asosiy manzil.
+"""
+
+import asyncio
+import json
+import sqlite3
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+class _Lane:
+    __slots__ = ("queue", "last_loaded", "pending", "spilled")
+
+    def __init__(self, pending: int = 0):
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.last_loaded = 0
+        self.pending = pending
+        self.spilled = pending > 0   # restart: hammasi diskdan o'qiladi
+
+
+class Outbox:
+    def __init__(self, path: str, mem_max: int = 15000, disk_max: int = 500_000,
+                 refill_batch: int = 500, dumps: Optional[Callable[[Any], str]] = None,
+                 loads: Optional[Callable[[str], Any]] = None):
+        self.path = path
+        self._dumps = dumps or (lambda payload: json.dumps(payload, ensure_ascii=False))
+        self._loads = loads or json.loads
+        self.mem_max = max(1, int(mem_max))
+        self.disk_max = max(self.mem_max, int(disk_max))
+        self.refill_batch = max(1, int(refill_batch))
+
+        self._db = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS outbox ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " payload TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " lane INTEGER NOT NULL DEFAULT 0)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS outbox_lane_id ON outbox (lane, id)")
+
+        self._lanes: Dict[int, _Lane] = {}
+        self._extras: Dict[int, Any] = {}   # faqat xotirada (masalan ContentEntry)
+        self._attempts: Dict[int, int] = {}  # oid -> requeue soni (faqat xotirada)
+        self._pending = 0
+        for lane, count in self._db.execute("SELECT lane, COUNT(*) FROM outbox GROUP BY lane"):
+            self._lanes[lane] = _Lane(count)
+            self._pending += count
+        self.replayed = self._pending
+        self.spilled_total = 0
+        self.rejected = 0
+
+    def _lane(self, lane: int) -> _Lane:
+        st = self._lanes.get(lane)
+        if st is None:
+            st = self._lanes[lane] = _Lane()
+        return st
+
+    def lanes(self) -> List[int]:
+        """Ma'lum bo'lgan lane'lar (restartdan keyin diskdagilari ham)."""
+        return list(self._lanes)
+
+    def qsize(self, lane: Optional[int] = None) -> int:
+        """Ack qilinmagan zakazlar soni (xotira + disk), lane berilmasa hammasi."""
+        if lane is None:
+            return self._pending
+        st = self._lanes.get(lane)
+        return st.pending if st else 0
+
+    def mem_size(self, lane: Optional[int] = None) -> int:
+        if lane is None:
+            return sum(st.queue.qsize() for st in self._lanes.values())
+        st = self._lanes.get(lane)
+        return st.queue.qsize() if st else 0
+
+    @property
+    def spilled(self) -> bool:
+        return any(st.spilled for st in self._lanes.values())
+
+    def put(self, payload: Any, extra: Any = None, lane: int = 0) -> Optional[int]:
+        """Zakaz id sini qaytaradi; disk limiti to'lgan bo'lsa None."""
+        if self._pending >= self.disk_max:
+            self.rejected += 1
+            return None
+
+        cur = self._db.execute(
+            "INSERT INTO outbox (payload, created_at, lane) VALUES (?, ?, ?)",
+            (self._dumps(payload), time.time(), lane),
+        )
+        oid = cur.lastrowid
+        st = self._lane(lane)
+        self._pending += 1
+        st.pending += 1
+        if extra is not None:
+            self._extras[oid] = extra
+
+        if not st.spilled and st.queue.qsize() < self.mem_max:
+            st.queue.put_nowait((oid, payload))
+            st.last_loaded = oid
+        else:
+            # tartib buzilmasin: spill bo'lgandan keyin hammasi diskdan o'qiladi
+            st.spilled = True
+            self.spilled_total += 1
+        return oid
+
+    def _refill(self, lane: int, st: _Lane):
+        free = self.mem_max - st.queue.qsize()
+        if free <= 0:
+            return
+        limit = min(free, self.refill_batch)
+        rows = self._db.execute(
+            "SELECT id, payload FROM outbox WHERE lane = ? AND id > ? ORDER BY id LIMIT ?",
+            (lane, st.last_loaded, limit),
+        ).fetchall()
+        for oid, raw in rows:
+            try:
+                payload = self._loads(raw)
+            except (ValueError, TypeError):
+                self.ack(oid, lane)
+                continue
+            st.queue.put_nowait((oid, payload))
+            st.last_loaded = oid
+        if len(rows) < limit:
+            st.spilled = False
+
+    async def get(self, lane: int = 0) -> Tuple[int, Any, Any]:
+        st = self._lane(lane)
+        if st.spilled and st.queue.qsize() <= self.mem_max // 2:
+            self._refill(lane, st)
+        oid, payload = await st.queue.get()
+        return oid, payload, self._extras.pop(oid, None)
+
+    def get_nowait(self, lane: int = 0) -> Optional[Tuple[int, Any, Any]]:
+        """Batch yig'ish uchun: navbat bo'sh bo'lsa None (kutmaydi)."""
+        st = self._lane(lane)
+        if st.spilled and st.queue.qsize() <= self.mem_max // 2:
+            self._refill(lane, st)
+        try:
+            oid, payload = st.queue.get_nowait()
+        except asyncio.QueueEmpty:
+            return None
+        return oid, payload, self._extras.pop(oid, None)
+
+    def attempts(self, oid: int) -> int:
+        return self._attempts.get(oid, 0)
+
+    def requeue(self, oid: int, payload: Any, extra: Any = None, lane: int = 0, delay: float = 0.0):
+        """
+        Ack qilinmagan zakazni navbatga qaytaradi (pending o'zgarmaydi).
+        oid < last_loaded -> _refill uni diskdan ikkinchi marta o'qimaydi.
+        """
+        self._attempts[oid] = self._attempts.get(oid, 0) + 1
+        if extra is not None:
+            self._extras[oid] = extra
+        st = self._lane(lane)
+
+        def _put():
+            st.queue.put_nowait((oid, payload))
+
+        if delay > 0:
+            asyncio.get_running_loop().call_later(delay, _put)
+        else:
+            _put()
+
+    def ack(self, oid: int, lane: int = 0):
+        self._db.execute("DELETE FROM outbox WHERE id = ?", (oid,))
+        self._pending = max(0, self._pending - 1)
+        st = self._lanes.get(lane)
+        if st:
+            st.pending = max(0, st.pending - 1)
+        self._extras.pop(oid, None)
+        self._attempts.pop(oid, None)
+
+    def close(self):
+        try:
+            self._db.close()
+        except Exception:
+            pass
@@ -0,0 +1,72 @@
+"""Guruh egaligi: har bir guruhni faqat bitta akkaunt qayta ishlaydi.
+
+- Guruh a'zolari (account_groups) ichidan rendezvous (HRW) hashing bilan
+  eng katta og'irlikdagi *faol* akkaunt egasi bo'ladi.
+- Egasi faol bo'lmay qolsa keyingi og'irlikdagi a'zo avtomatik egallaydi
+  (failover); faqat o'sha akkauntning guruhlari ko'chadi.
+- Hech bir a'zosi faol bo'lmagan / keshda yo'q guruhning egasi yo'q ->
+  handler uni odatdagidek qayta ishlaydi (dedupe baribir bor).
+- Snapshot o'zgarmas, refresher yangisini qurib atomar almashtiradi.
+"""
+
+import hashlib
+import time
+from typing import Dict, Iterable, Mapping, Optional, Set
+
+
+def _weight(phone: str, group_id: int) -> int:
+    return int.from_bytes(hashlib.blake2b(f"{phone}:{group_id}".encode(), digest_size=8).digest(), "big")
+
+
+def assign_owners(account_groups: Mapping[str, Iterable[int]], live: Iterable[str]) -> Dict[int, str]:
+    """group_id -> egasi (faqat live akkauntlar orasidan)."""
+    live = set(live)
+    best: Dict[int, tuple] = {}
+    for phone, groups in account_groups.items():
+        if phone not in live:
+            continue
+        for gid in groups:
+            w = _weight(phone, gid)
+            cur = best.get(gid)
+            if cur is None or w > cur[0]:
+                best[gid] = (w, phone)
+    return {gid: phone for gid, (_, phone) in best.items()}
+
+
+class OwnershipMap:
+    __slots__ = ("owners", "counts", "live", "built_at", "build_ms")
+
+    def __init__(self, owners: Dict[int, str], live: Set[str], build_ms: float = 0.0):
+        self.owners = owners
+        self.live = frozenset(live)
+        self.built_at = time.time()
+        self.build_ms = build_ms
+        counts: Dict[str, int] = {}
+        for phone in owners.values():
+            counts[phone] = counts.get(phone, 0) + 1
+        self.counts = counts
+
+    def __len__(self) -> int:
+        return len(self.owners)
+
+    def owner(self, group_id: int) -> Optional[str]:
+        return self.owners.get(group_id)
+
+    def owned(self, phone: str) -> int:
+        return self.counts.get(phone, 0)
+
+    @classmethod
+    def empty(cls) -> "OwnershipMap":
+        return cls({}, set())
+
+    @classmethod
+    def build(cls, account_groups: Mapping[str, Iterable[int]], live: Iterable[str]) -> "OwnershipMap":
+        t0 = time.perf_counter()
+        live = set(live)
+        owners = assign_owners(account_groups, live)
+        return cls(owners, live, (time.perf_counter() - t0) * 1000.0)
+
+    def moved_from(self, other: "OwnershipMap") -> int:
+        """Oldingi snapshot'ga nisbatan egasi o'zgargan guruhlar soni."""
+        prev = other.owners
+        return sum(1 for gid, phone in self.owners.items() if prev.get(gid) != phone)
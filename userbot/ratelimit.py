@@ -0,0 +1,144 @@
+"""Bot API yuborish uchun proaktiv rate scheduler.
+
+- Token bucket: global (msg/s) + har bir chat uchun (msg/min).
+- Reservation usuli: har bir worker navbat bilan slot oladi va o'z vaqtigacha
+  uxlaydi -> workerlar bir vaqtda "stampede" qilmaydi.
+- 429 bo'lsa penalize(): shu chatga yuboradigan barcha workerlar birga kutadi
+  (chat bucket bo'shatiladi, har worker o'zi uxlamaydi). Boshqa chat ham hali
+  backoff'da bo'lsa bu chatga xos emas (bot bo'yicha flood) -> umumiy backoff,
+  hamma lane'lar kutadi. Bitta manzilda (odatiy holat) bu umumiy backoff bilan bir xil.
+- Queue-wait va send-latency statistikasi (p50/p99).
+"""
+
+import asyncio
+import time
+from collections import deque
+from typing import Dict
+
+
+class TokenBucket:
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float, now: float):
+        self.rate = float(rate)          # token / sekund
+        self.capacity = max(1.0, float(capacity))
+        self.tokens = self.capacity
+        self.updated = now
+
+    def _refill(self, now: float):
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def reserve(self, now: float) -> float:
+        """Bitta token band qiladi; qancha kutish kerakligini qaytaradi (sekund)."""
+        self._refill(now)
+        self.tokens -= 1.0
+        if self.tokens >= 0:
+            return 0.0
+        # drain_until() dan keyin to'ldirish kelajakdan (updated) boshlanadi
+        return max(0.0, self.updated - now) + -self.tokens / self.rate
+
+    def drain_until(self, now: float, ts: float):
+        """ts gacha token yo'q (429 dan keyin)."""
+        self._refill(now)
+        self.tokens = min(self.tokens, 0.0)
+        self.updated = max(self.updated, ts)
+
+
+class LatencyStats:
+    """Oxirgi N ta o'lchov bo'yicha p50/p99 (sekund)."""
+
+    __slots__ = ("samples", "count", "total")
+
+    def __init__(self, maxlen: int = 2048):
+        self.samples = deque(maxlen=maxlen)
+        self.count = 0
+        self.total = 0.0
+
+    def add(self, value: float):
+        self.samples.append(value)
+        self.count += 1
+        self.total += value
+
+    def percentile(self, p: float) -> float:
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        idx = min(len(ordered) - 1, int(round(p / 100.0 * (len(ordered) - 1))))
+        return ordered[idx]
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            "count": self.count,
+            "p50": self.percentile(50),
+            "p99": self.percentile(99),
+            "avg": (self.total / self.count) if self.count else 0.0,
+        }
+
+
+class SendScheduler:
+    """Barcha send_worker'lar uchun bitta (umumiy) scheduler."""
+
+    def __init__(self, global_rate: float = 30.0, chat_rate_per_min: float = 20.0,
+                 chat_burst: float = 3.0, clock=time.monotonic):
+        self.global_rate = float(global_rate)
+        self.chat_rate = float(chat_rate_per_min) / 60.0
+        self.chat_burst = float(chat_burst)
+        self._clock = clock
+        self._global = TokenBucket(self.global_rate, self.global_rate, clock())
+        self._chats: Dict[int, TokenBucket] = {}
+        self.backoff_until = 0.0     # umumiy backoff (hamma chatlar)
+        self.throttled = 0           # 429 soni
+        self.throttled_global = 0    # shulardan umumiy backoff'ga olib kelganlari
+        self.throttled_by_chat: Dict[int, int] = {}
+        self.queue_wait = LatencyStats()
+        self.send_latency = LatencyStats()
+
+    def _chat_bucket(self, chat_id: int, now: float) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            bucket = self._chats[chat_id] = TokenBucket(self.chat_rate, self.chat_burst, now)
+        return bucket
+
+    def reserve(self, chat_id: int) -> float:
+        now = self._clock()
+        start = max(now, self.backoff_until)
+        wait_chat = self._chat_bucket(chat_id, now).reserve(start)
+        wait_global = self._global.reserve(start)
+        return (start - now) + max(wait_chat, wait_global)
+
+    async def acquire(self, chat_id: int):
+        delay = self.reserve(chat_id)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def penalize(self, retry_after: float, chat_id: int):
+        """
+        429: shu chat retry_after tugaguncha kutadi. Boshqa chat ham hali backoff'da
+        bo'lsa -> umumiy backoff (hamma workerlar), aks holda boshqa manzillar davom etadi.
+        """
+        self.throttled += 1
+        now = self._clock()
+        until = now + max(0.0, float(retry_after))
+        self.throttled_by_chat[chat_id] = self.throttled_by_chat.get(chat_id, 0) + 1
+        if any(b.updated > now for cid, b in self._chats.items() if cid != chat_id):
+            self.throttled_global += 1
+            self.backoff_until = max(self.backoff_until, until)
+            self._global.drain_until(now, self.backoff_until)
+        self._chat_bucket(chat_id, now).drain_until(now, until)
+
+    def chat_backoff_left(self, chat_id: int) -> float:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            return 0.0
+        return max(0.0, bucket.updated - self._clock())
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "throttled": self.throttled,
+            "throttled_global": self.throttled_global,
+            "backoff_left": max(0.0, self.backoff_until - self._clock()),
+            "queue_wait": self.queue_wait.summary(),
+            "send_latency": self.send_latency.summary(),
+        }
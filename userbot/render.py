@@ -0,0 +1,105 @@
+"""Zakaz xabarini render qilish (HTML matn + sendMessage JSON).
+
+- Matn shabloni: bitta "".join (bir nechta f-string o'rniga).
+- Keyboard tugmalarining o'zgarmas qismi (label) oldindan JSON qilingan;
+  send paytida faqat URL'lar escape qilinadi va payload tayyor bytes bo'ladi
+  (aiohttp json= bilan butun dict'ni qayta serializatsiya qilmaydi). Yutuqning
+  asosiy qismi shu yerda (python bench.py render: matn / payload alohida);
+  sarlavha/anchor'lar uchun LRU kesh o'lchanadigan foyda bermagani uchun yo'q.
+
+Pyrogram'ga bog'liq emas: faqat oddiy maydonlar (bench.py ham ishlatadi).
+"""
+
+import html
+import json
+from typing import List, Optional, Tuple
+
+ORDER_TITLE = "🔔 <b>Yangi buyurtma</b>\n"
+SENDER_LABEL = "Клент личкаси"
+UNKNOWN_SENDER = "Noma'lum"
+
+
+# ===================== LINKS =====================
+def chat_base(chat_id: int, username: Optional[str]) -> str:
+    if username:
+        return f"https://t.me/{username}"
+    return f"https://t.me/c/{str(chat_id).replace('-100', '')}"
+
+
+def message_link(chat_id: int, username: Optional[str], msg_id: int) -> str:
+    return f"{chat_base(chat_id, username)}/{msg_id}"
+
+
+def chat_link(chat_id: int, username: Optional[str], msg_id: int) -> str:
+    """Username bo'lmasa guruhga umumiy link yo'q -> xabar linki (eski xulq)."""
+    if username:
+        return chat_base(chat_id, username)
+    return message_link(chat_id, username, msg_id)
+
+
+# ===================== HTML FRAGMENTS =====================
+def group_header(chat_id: int, title: str) -> str:
+    """'🔔 Yangi buyurtma / 📍 Guruh: ... / 👤 Kimdan: ' qismi."""
+    return f"{ORDER_TITLE}📍 Guruh: <b>{html.escape(title)}</b>\n👤 Kimdan: "
+
+
+def user_anchor(user_id: int, username: Optional[str]) -> Tuple[str, str]:
+    """(sender_html, sender_url) foydalanuvchi uchun."""
+    if username:
+        title, url = f"@{username}", f"https://t.me/{username}"
+    else:
+        title, url = SENDER_LABEL, f"tg://user?id={user_id}"
+    return f'<a href="{html.escape(url)}">{html.escape(title)}</a>', url
+
+
+def link_anchor(url: str, title: str) -> str:
+    return f'<a href="{html.escape(url)}">{html.escape(title)}</a>'
+
+
+def render_order(header: str, sender_html: str, text: str, urls: List[str], msg_link: str) -> str:
+    parts = [header, sender_html, "\n\n", html.escape(text)]
+    if urls:
+        parts.append("\n\n")
+        parts.append("\n".join(["🔗 " + html.escape(u) for u in urls[:3]]))
+    parts.append("\n\n🔗 ")
+    parts.append(msg_link)
+    return "".join(parts)
+
+
+# ===================== SEND PAYLOAD =====================
+# json.dumps(..., ensure_ascii=False) har chaqiruvda yangi encoder yaratadi
+_js = json.JSONEncoder(ensure_ascii=False).encode
+
+
+def _button(label: str) -> str:
+    return '{"text":' + _js(label) + ',"url":'
+
+
+_BTN_SENDER = "[" + _button("👤 " + SENDER_LABEL)
+_BTN_GROUP = "[" + _button("👥 Guruhga o'tish")
+_BTN_MESSAGE = "}," + _button("🔗 Xabarga o'tish")
+_BTN_LINKS = ["[" + _button(f"🔗 Link {i}") for i in (1, 2, 3)]
+
+
+def keyboard_json(group_link: str, msg_link: str, urls: Optional[List[str]] = None,
+                  sender_url: Optional[str] = None) -> str:
+    """inline_keyboard massivi (JSON matn)."""
+    rows = []
+    if sender_url:
+        rows.append(_BTN_SENDER + _js(sender_url) + "}]")
+    rows.append(_BTN_GROUP + _js(group_link) + _BTN_MESSAGE + _js(msg_link) + "}]")
+    for prefix, u in zip(_BTN_LINKS, urls or ()):
+        rows.append(prefix + _js(u) + "}]")
+    return "[" + ",".join(rows) + "]"
+
+
+def send_payload(chat_id: int, text: str, keyboard: Optional[str] = None,
+                 thread_id: Optional[int] = None) -> bytes:
+    """sendMessage body (HTML, preview o'chiq); thread_id = forum topic."""
+    body = '{"chat_id":%d,"text":%s,"parse_mode":"HTML","disable_web_page_preview":true' % (chat_id, _js(text))
+    if thread_id:
+        body += ',"message_thread_id":%d' % thread_id
+    if keyboard:
+        body += ',"reply_markup":{"inline_keyboard":' + keyboard + "}"
+    return (body + "}").encode()
+
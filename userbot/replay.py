@@ -0,0 +1,375 @@
+"""Pipeline replay harness: create_message_handler -> outbox -> send_worker -> fake Bot API.
+
+Haqiqiy main.py kodi ishlaydi; faqat tashqi tomonlar almashtiriladi:
+  - Supabase -> xotiradagi stub (keyword_hits / status yozuvlari sanaladi)
+  - Bot API  -> 127.0.0.1 dagi fake server (BOT_API_BASE orqali)
+  - Pyrogram -> sintetik yoki yozib olingan pyrogram.types.Message obyektlari
+
+Ishlatish:
+    python replay.py                                   # 500 kalit so'z, 5 akkaunt, 20k xabar
+    python replay.py --keywords 5000 --accounts 10 --messages 50000 --dup-ratio 0.3
+    python replay.py --input recorded.jsonl            # JSON lines: chat_id, chat_title,
+                                                       # chat_username, msg_id, sender_id,
+                                                       # sender_username, text
+    python replay.py --rate 500                        # bir tekis oqim (latency uchun)
+    python replay.py --real-limits                     # Bot API rate limit bilan (sekin)
+    python replay.py --real-limits --destinations 4    # kalit so'zlar 4 ta manzilga (lane'lar)
+    python replay.py --classifier enforce --ad-ratio 0.4  # haydovchi e'lonlari filtrlanadi
+    python replay.py --blocked-ratio 0.3               # 30% guruh bloklangan (chat filtri)
+
+Hisobot: xabar/s, handler -> send p50/p99, bosqichlar bo'yicha CPU vaqti,
+forwarded_cache hajmi va xotira o'sishi (--tracemalloc).
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import resource
+import tempfile
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+from bench import make_keywords, make_messages
+
+_LINK_RE = re.compile(r"🔗 (https://t\.me/\S+/\d+)")
+
+
+# ===================== STUBS =====================
+class _StubQuery:
+    def __init__(self, sink: dict, table: str):
+        self._sink = sink
+        self._table = table
+        self._rows = 0
+
+    def insert(self, rows):
+        self._rows = len(rows) if isinstance(rows, list) else 1
+        return self
+
+    def upsert(self, rows, **_kw):
+        return self.insert(rows)
+
+    def __getattr__(self, _name):
+        # update/select/eq/in_/delete/... -> zanjir davom etadi
+        return lambda *a, **kw: self
+
+    def execute(self):
+        self._sink[self._table] = self._sink.get(self._table, 0) + self._rows
+        return SimpleNamespace(data=[], count=0)
+
+
+class StubSupabase:
+    def __init__(self):
+        self.rows = {}
+
+    def table(self, name: str) -> _StubQuery:
+        return _StubQuery(self.rows, name)
+
+    def rpc(self, name: str, params: dict) -> _StubQuery:
+        # increment_hourly_stats: har massivdagi qatorlar sanaladi
+        return _StubQuery(self.rows, f"rpc:{name}").insert(
+            [r for v in (params or {}).values() if isinstance(v, list) for r in v]
+        )
+
+
+class FakeBotApi:
+    """sendMessage qabul qiladi; matndagi xabar linklari bo'yicha yetib kelish vaqtini yozadi."""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.requests = 0
+        self.arrivals = {}   # message_link -> perf_counter
+        self.port = 0
+        self._runner = None
+
+    async def start(self):
+        from aiohttp import web
+
+        async def handle(request):
+            data = json.loads(await request.read())
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            now = time.perf_counter()
+            self.requests += 1
+            for link in _LINK_RE.findall(data.get("text") or ""):
+                self.arrivals.setdefault(link, now)
+            return web.json_response({"ok": True, "result": {"message_id": self.requests}})
+
+        app = web.Application()
+        app.router.add_post("/bot{token}/sendMessage", handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        if self._runner:
+            await self._runner.cleanup()
+
+
+# ===================== MESSAGES =====================
+def _load_recorded(path: str) -> list:
+    out = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                out.append(json.loads(line))
+    return out
+
+
+# klassifikator uchun: migratsiyadagi boshlang'ich iboralar
+DEFAULT_NEGATIVES = {
+    "olaman": 1.0, "olamiz": 1.0, "mashina bor": 1.5, "joy bor": 1.0, "bo'sh joy": 1.0,
+    "odam kerak": 1.5, "yo'lovchi kerak": 1.5, "pochta olaman": 1.0,
+    "taksi kerak": -1.5, "mashina kerak": -1.5, "ketishim kerak": -1.0,
+}
+_AD_SUFFIXES = [" Mashina bor, 3 ta joy bor", " Odam olaman, cobalt", " Pochta olaman"]
+
+
+def _synthetic(args, rnd: random.Random) -> list:
+    """
+    dup_ratio: shu ulushdagi xabarlar boshqa guruhga qayta yozilgan (kontent dublikat).
+    ad_ratio: shu ulushdagi xabarlarga haydovchi e'loni iborasi qo'shiladi.
+    """
+    texts = make_messages(args.messages, rnd, hit_ratio=args.hit_ratio)
+    rows, posted = [], []
+    for i, text in enumerate(texts):
+        if args.ad_ratio and rnd.random() < args.ad_ratio:
+            text += rnd.choice(_AD_SUFFIXES)
+        if posted and rnd.random() < args.dup_ratio:
+            prev = rnd.choice(posted)
+            sender_id, sender_username, text = prev["sender_id"], prev["sender_username"], prev["text"]
+        else:
+            s = rnd.randrange(args.senders)
+            sender_id, sender_username = 500000 + s, (f"user_{s}" if s % 2 else None)
+        g = rnd.randrange(args.groups)
+        row = {
+            "chat_id": -1001000000000 - g,
+            "chat_title": f"Toshkent - Xorazm taxi #{g}",
+            "chat_username": f"taxi_group_{g}" if g % 3 else None,
+            "msg_id": 1000 + i,
+            "sender_id": sender_id,
+            "sender_username": sender_username,
+            "text": text,
+        }
+        rows.append(row)
+        posted.append(row)
+    return rows
+
+
+def _to_message(row: dict):
+    from pyrogram import enums, types
+    return types.Message(
+        id=row["msg_id"],
+        chat=types.Chat(id=row["chat_id"], type=enums.ChatType.SUPERGROUP,
+                        title=row.get("chat_title"), username=row.get("chat_username")),
+        from_user=types.User(id=row["sender_id"], username=row.get("sender_username")),
+        text=row.get("text"),
+        outgoing=False,
+    )
+
+
+# ===================== RUN =====================
+def _pct(values: list, q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+async def run(args) -> dict:
+    rnd = random.Random(args.seed)
+    rows = _load_recorded(args.input) if args.input else _synthetic(args, rnd)
+    messages = [_to_message(r) for r in rows]
+
+    bot = FakeBotApi(args.bot_latency)
+    await bot.start()
+
+    tmp = tempfile.mkdtemp(prefix="replay_")
+    os.environ.update({
+        "TELEGRAM_BOT_TOKEN": "replay",
+        "BOT_API_BASE": f"http://127.0.0.1:{bot.port}",
+        "ADMIN_ID": "0",
+        "METRICS_PORT": "0",
+        "OUTBOX_PATH": os.path.join(tmp, "outbox.db"),
+        "GROUP_OWNERSHIP": "0",
+        "SEND_BATCH_THRESHOLD": str(args.batch_threshold),
+        "MATCHER_ENGINE": args.engine,
+        "CLASSIFIER_MODE": args.classifier,
+    })
+    if not args.real_limits:
+        os.environ.update({"SEND_GLOBAL_RATE": "1000000", "SEND_CHAT_RATE_PER_MIN": "60000000",
+                           "SEND_CHAT_BURST": "1000000"})
+
+    import aiohttp
+    import main
+    from matcher import compile_snapshot
+    from writer import SupabaseWriter
+
+    stub = StubSupabase()
+    main.supabase = stub
+    main.db_writer = SupabaseWriter(stub)
+    main.db_writer.start()
+    main.aiohttp_session = aiohttp.ClientSession()
+    keywords = make_keywords(args.keywords, rnd)
+    # --destinations N: kalit so'zlar N ta manzilga (har biri alohida lane + chat rate budget)
+    routes = {kw: (-1009000000000 - i % args.destinations, None)
+              for i, kw in enumerate(keywords)} if args.destinations > 1 else None
+    from classifier import OrderClassifier
+    factory = (lambda: OrderClassifier(DEFAULT_NEGATIVES, args.engine, main.CLASSIFIER_THRESHOLD)) \
+        if args.classifier != "off" else None
+    main.keywords_snapshot = compile_snapshot(1, {kw: f"kw-{i}" for i, kw in enumerate(keywords)},
+                                              args.engine, routes, factory)
+    await main.start_sender()
+    # --blocked-ratio: shu ulushdagi guruhlar bloklangan (watched_groups.is_blocked)
+    if args.blocked_ratio > 0:
+        blocked = {-1001000000000 - g for g in range(args.groups) if rnd.random() < args.blocked_ratio}
+        main.chat_gate = main.chat_gate.replace(blocked)
+
+    # bosqich bo'yicha CPU: handler oxirida inc(phone, stage) chaqiriladi
+    last_stage = [None]
+    orig_inc = main.m_messages.inc
+
+    def inc(*labels, value=1.0):
+        if labels[1] != "seen":
+            last_stage[0] = labels[1]
+        orig_inc(*labels, value=value)
+
+    main.m_messages.inc = inc
+
+    phones = [f"+99890{i:07d}" for i in range(args.accounts)]
+    handlers = [main.create_message_handler(p) for p in phones]
+    clients = [SimpleNamespace(phone_number=p) for p in phones]
+
+    if args.tracemalloc:
+        tracemalloc.start()
+    rss0 = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    stage_cpu, stage_n = {}, {}
+    handled_at = {}
+    checkpoints = []
+    step = max(1, len(messages) // 10)
+
+    t0 = time.perf_counter()
+    for i, msg in enumerate(messages):
+        link = main.get_message_link(msg)
+        handled_at[link] = time.perf_counter()
+        # har bir akkaunt bir xil guruhlarda -> bir xil xabar K marta keladi
+        for h, client in zip(handlers, clients):
+            c0 = time.thread_time_ns()
+            # Pyrogram dispatch: chat filtri o'tkazmasa handler chaqirilmaydi
+            if await main.allowed_chats(client, msg):
+                await h(client, msg)
+                st = last_stage[0]
+            else:
+                st = "blocked"
+            dt = time.thread_time_ns() - c0
+            stage_cpu[st] = stage_cpu.get(st, 0) + dt
+            stage_n[st] = stage_n.get(st, 0) + 1
+        if args.rate > 0:
+            # bir tekis oqim: keyingi xabar vaqtigacha kutamiz (send workerlar ham ishlaydi)
+            delay = t0 + (i + 1) / args.rate - time.perf_counter()
+            await asyncio.sleep(max(0.0, delay))
+        elif i % 64 == 0:
+            await asyncio.sleep(0)
+        if (i + 1) % step == 0:
+            checkpoints.append({
+                "messages": i + 1,
+                "forward_cache": len(main.forwarded_cache),
+                "content_senders": len(main.content_cache),
+                "traced_mb": tracemalloc.get_traced_memory()[0] / 1e6 if args.tracemalloc else None,
+                "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+            })
+    handle_s = time.perf_counter() - t0
+
+    # outbox bo'shaguncha (hammasi fake serverga yetib borguncha)
+    deadline = time.perf_counter() + args.drain_timeout
+    while main.send_queue.qsize() and time.perf_counter() < deadline:
+        await asyncio.sleep(0.05)
+    total_s = time.perf_counter() - t0
+
+    latencies = [bot.arrivals[k] - handled_at[k] for k in bot.arrivals if k in handled_at]
+
+    await main.flush_stats()
+    await main.db_writer.close()
+    await main.aiohttp_session.close()
+    main.send_queue.close()
+    await bot.close()
+
+    return {
+        "deliveries": len(messages) * len(handlers),
+        "messages": len(messages),
+        "handle_s": handle_s,
+        "total_s": total_s,
+        "sent_orders": len(latencies),
+        "requests": bot.requests,
+        "left_in_outbox": main.send_queue.qsize(),
+        "p50": _pct(latencies, 0.5),
+        "p99": _pct(latencies, 0.99),
+        "stage_cpu": stage_cpu,
+        "stage_n": stage_n,
+        "checkpoints": checkpoints,
+        "rss_growth_mb": (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss0) / 1024,
+        "db_rows": stub.rows,
+        "lanes": len(main.send_lanes),
+    }
+
+
+def report(args, r: dict):
+    print(f"\n📊 Replay: {r['messages']} xabar x {args.accounts} akkaunt = {r['deliveries']} handler chaqiruvi "
+          f"| {args.keywords} kalit so'z ({args.engine}) | dup_ratio={args.dup_ratio}")
+    print(f"⚡ Handler: {r['deliveries'] / r['handle_s']:.0f} chaqiruv/s "
+          f"({r['messages'] / r['handle_s']:.0f} xabar/s), {r['handle_s']:.2f}s")
+    print(f"📤 Yuborildi: {r['sent_orders']} zakaz, {r['requests']} sendMessage "
+          f"| outbox'da qoldi: {r['left_in_outbox']} | jami {r['total_s']:.2f}s")
+    print(f"⏱ Handler -> send: p50={r['p50'] * 1000:.1f}ms p99={r['p99'] * 1000:.1f}ms "
+          f"| lane'lar: {r['lanes']}")
+
+    print(f"\n{'stage':>14} | {'calls':>8} | {'CPU ms':>9} | {'us/call':>8}")
+    print("-" * 48)
+    for st, ns in sorted(r["stage_cpu"].items(), key=lambda kv: -kv[1]):
+        n = r["stage_n"][st]
+        print(f"{str(st):>14} | {n:>8} | {ns / 1e6:>9.1f} | {ns / 1e3 / n:>8.2f}")
+
+    print(f"\n{'messages':>9} | {'fwd_cache':>9} | {'senders':>8} | {'traced MB':>9} | {'maxrss MB':>9}")
+    print("-" * 56)
+    for c in r["checkpoints"]:
+        traced = f"{c['traced_mb']:.1f}" if c["traced_mb"] is not None else "-"
+        print(f"{c['messages']:>9} | {c['forward_cache']:>9} | {c['content_senders']:>8} | "
+              f"{traced:>9} | {c['rss_mb']:>9.1f}")
+    print(f"\n💾 Supabase stub: {r['db_rows']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="UserBot pipeline replay harness")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--input", help="yozib olingan xabarlar (JSON lines)")
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--keywords", type=int, default=500)
+    parser.add_argument("--accounts", type=int, default=5)
+    parser.add_argument("--groups", type=int, default=300)
+    parser.add_argument("--senders", type=int, default=3000)
+    parser.add_argument("--hit-ratio", type=float, default=0.05)
+    parser.add_argument("--dup-ratio", type=float, default=0.1)
+    parser.add_argument("--rate", type=float, default=0.0, help="xabar/s oqimi (0 = iloji boricha tez)")
+    parser.add_argument("--engine", default="aho")
+    parser.add_argument("--batch-threshold", type=int, default=0, help="SEND_BATCH_THRESHOLD (0 = o'chiq)")
+    parser.add_argument("--bot-latency", type=float, default=0.0, help="fake Bot API javob kechikishi (s)")
+    parser.add_argument("--real-limits", action="store_true", help="SEND_* rate limitlarini o'chirmaslik")
+    parser.add_argument("--destinations", type=int, default=1, help="kalit so'z manzillari soni (lane'lar)")
+    parser.add_argument("--classifier", default="off", choices=("off", "shadow", "enforce"))
+    parser.add_argument("--ad-ratio", type=float, default=0.0, help="haydovchi e'loni iborali xabarlar ulushi")
+    parser.add_argument("--blocked-ratio", type=float, default=0.0, help="bloklangan guruhlar ulushi")
+    parser.add_argument("--drain-timeout", type=float, default=60.0)
+    parser.add_argument("--tracemalloc", action="store_true")
+    args = parser.parse_args()
+
+    report(args, asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    main()
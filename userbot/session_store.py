@@ -0,0 +1,68 @@
+"""Xotiradagi Pyrogram session (userbot_accounts.session_string dan).
+
+- Fayl session (SQLite) har update'da peers jadvaliga yozadi -> disk I/O va
+  qulflangan fayllar. Bu yerda hammasi ":memory:" SQLite'da, diskka tegmaydi.
+- BoundedMemoryStorage: peers jadvali max_peers bilan chegaralangan; oshsa eng
+  eski (last_update_on) peer'lar o'chiriladi. O'chirilgan peer keyingi
+  update'da (users/chats ichida access_hash bilan) qayta keladi.
+- valid_session_string(): bazadagi qiymat haqiqiy Pyrogram session string'mi
+  (userbot-auth "verified_<ts>" placeholder yozadi) - aks holda fayl rejimi.
+"""
+
+import base64
+import binascii
+import struct
+from typing import List, Optional, Tuple
+
+from pyrogram.storage import MemoryStorage, Storage
+
+_STRING_SIZES = frozenset(struct.calcsize(fmt) for fmt in (
+    Storage.SESSION_STRING_FORMAT, Storage.OLD_SESSION_STRING_FORMAT, Storage.OLD_SESSION_STRING_FORMAT_64,
+))
+
+
+def valid_session_string(value: Optional[str]) -> bool:
+    if not value or len(value) < 64:
+        return False
+    try:
+        raw = base64.urlsafe_b64decode(value + "=" * (-len(value) % 4))
+    except (binascii.Error, ValueError):
+        return False
+    return len(raw) in _STRING_SIZES
+
+
+class BoundedMemoryStorage(MemoryStorage):
+    def __init__(self, name: str, session_string: Optional[str] = None, max_peers: int = 50000):
+        super().__init__(name, session_string)
+        self.max_peers = max(100, int(max_peers))
+        self.evicted = 0
+        # COUNT(*) har update'da emas: shuncha yangi peer yozilgandan keyin tekshiriladi
+        self._check_every = max(50, self.max_peers // 10)
+        self._since_check = 0
+
+    def __len__(self) -> int:
+        if self.conn is None:
+            return 0
+        try:
+            return self.conn.execute("SELECT COUNT(*) FROM peers").fetchone()[0]
+        except Exception:
+            return 0
+
+    async def update_peers(self, peers: List[Tuple[int, int, str, str, str]]):
+        await super().update_peers(peers)
+        self._since_check += len(peers)
+        if self._since_check >= self._check_every:
+            self._since_check = 0
+            self.trim()
+
+    def trim(self) -> int:
+        """Limitdan oshgan eng eski peer'larni o'chiradi; o'chirilganlar soni."""
+        extra = len(self) - self.max_peers
+        if extra <= 0:
+            return 0
+        self.conn.execute(
+            "DELETE FROM peers WHERE id IN (SELECT id FROM peers ORDER BY last_update_on LIMIT ?)",
+            (extra,),
+        )
+        self.evicted += extra
+        return extra
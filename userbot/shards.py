@@ -0,0 +1,246 @@
+"""Ko'p jarayonli (multi-process) rejim.
+
+Supervisor (asosiy jarayon):
+  - yagona sender: outbox, rate limit, dedupe global bo'lib qoladi
+  - lokal IPC server (127.0.0.1, JSON lines) orqali workerlardan zakaz oladi;
+    outbox'ga yozilgandan keyin har zakazga ack qaytaradi (kalit + bosqich)
+  - N ta worker jarayonni ishga tushiradi, yiqilsa backoff bilan qayta ko'taradi
+Worker:
+  - faqat o'ziga tegishli raqamlar (rendezvous hashing) uchun Pyrogram clientlar
+  - zakazlarni IPC orqali supervisor'ga yuboradi va ack'ni kutadi; ack kelmasa
+    (timeout / EOF) zakaz yo'qolgan hisoblanadi -> dedupe kaliti bo'shatiladi
+  - supervisor yo'qolsa chiqadi
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import secrets
+import sys
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+
+
+# ===================== SHARD ASSIGNMENT =====================
+def shard_for_phone(phone: str, shards: int) -> int:
+    """
+    Rendezvous (HRW) hashing: shardlar soni o'zgarganda faqat ~1/N raqam ko'chadi.
+    """
+    if shards <= 1:
+        return 0
+    best, best_w = 0, -1
+    for i in range(shards):
+        w = int.from_bytes(hashlib.blake2b(f"{i}:{phone}".encode(), digest_size=8).digest(), "big")
+        if w > best_w:
+            best, best_w = i, w
+    return best
+
+
+# ===================== IPC =====================
+class IpcServer:
+    """
+    Supervisor tomoni: har bir qator = bitta JSON xabar.
+    on_message javob (dict) qaytarsa o'sha ulanishga JSON qator bo'lib yoziladi (ack).
+    """
+
+    def __init__(self, on_message: Callable[[dict], Awaitable[Optional[dict]]], token: Optional[str] = None):
+        self.on_message = on_message
+        self.token = token or secrets.token_hex(16)
+        self.host = "127.0.0.1"
+        self.port = 0
+        self._server: Optional[asyncio.AbstractServer] = None
+        self.connections = 0
+        self.received = 0
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, 0, limit=4 * 1024 * 1024)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    @property
+    def address(self) -> str:
+        return f"{self.host}:{self.port}"
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            hello = await asyncio.wait_for(reader.readline(), timeout=10)
+            if hello.decode().strip() != self.token:
+                return
+            self.connections += 1
+            while True:
+                line = await reader.readline()
+                if not line:
+                    return
+                try:
+                    msg = json.loads(line)
+                except ValueError:
+                    continue
+                self.received += 1
+                try:
+                    reply = await self.on_message(msg)
+                except Exception as e:
+                    print(f"⚠️ IPC xabarni qayta ishlashda xato: {e}")
+                    continue
+                if reply is not None:
+                    writer.write(json.dumps(reply, ensure_ascii=False).encode() + b"\n")
+                    await writer.drain()
+        except Exception:
+            pass
+        finally:
+            try:
+                writer.close()
+            except Exception:
+                pass
+
+    async def close(self):
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+
+
+class IpcClient:
+    """
+    Worker tomoni. request(): xabar yuboriladi va supervisor ack'i kutiladi
+    ({"type": "ack", "key": ..., "stage": ...}). Ulanish uzilsa kutayotganlar
+    ConnectionError oladi va closed event o'rnatiladi (worker chiqadi).
+    """
+
+    def __init__(self, address: str, token: str):
+        host, port = address.rsplit(":", 1)
+        self.host = host
+        self.port = int(port)
+        self.token = token
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._closed = asyncio.Event()
+        self._pending: Dict[tuple, asyncio.Future] = {}
+        self.sent = 0
+        self.acked = 0
+
+    async def connect(self):
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        writer.write((self.token + "\n").encode())
+        await writer.drain()
+        self._writer = writer
+        asyncio.create_task(self._watch(reader))
+
+    async def _watch(self, reader: asyncio.StreamReader):
+        # supervisor faqat ack yuboradi; EOF = supervisor yo'q
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    reply = json.loads(line)
+                except ValueError:
+                    continue
+                if reply.get("type") != "ack":
+                    continue
+                fut = self._pending.get(tuple(reply.get("key") or ()))
+                if fut is not None and not fut.done():
+                    fut.set_result(reply.get("stage"))
+        except Exception:
+            pass
+        self._closed.set()
+        for fut in self._pending.values():
+            if not fut.done():
+                fut.set_exception(ConnectionError("IPC ulanish uzildi"))
+
+    async def send(self, msg: dict):
+        if self._writer is None or self._closed.is_set():
+            raise ConnectionError("IPC ulanish yo'q")
+        self._writer.write(json.dumps(msg, ensure_ascii=False).encode() + b"\n")
+        self.sent += 1
+        await self._writer.drain()
+
+    async def request(self, msg: dict, key, timeout: float = 10.0) -> Optional[str]:
+        """
+        Xabarni yuboradi va shu kalit uchun ack'dagi bosqichni qaytaradi.
+        Timeout -> asyncio.TimeoutError, ulanish uzilsa -> ConnectionError.
+        """
+        key = tuple(key)
+        fut = asyncio.get_running_loop().create_future()
+        self._pending[key] = fut
+        try:
+            await self.send(msg)
+            stage = await asyncio.wait_for(fut, timeout)
+            self.acked += 1
+            return stage
+        finally:
+            if self._pending.get(key) is fut:
+                del self._pending[key]
+
+    async def wait_closed(self):
+        await self._closed.wait()
+
+
+# ===================== WORKER SUPERVISOR =====================
+class WorkerSupervisor:
+    """
+    N ta worker jarayon. Har biri yiqilsa exponential backoff bilan qayta
+    ishga tushadi (uzoq ishlagan bo'lsa backoff qaytadan boshlanadi).
+    """
+
+    def __init__(self, shards: int, script: str, env: Dict[str, str],
+                 min_backoff: float = 1.0, max_backoff: float = 60.0, stable_after: float = 60.0):
+        self.shards = shards
+        self.script = script
+        self.env = env
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.stable_after = stable_after
+        self._procs: Dict[int, asyncio.subprocess.Process] = {}
+        self._tasks: List[asyncio.Task] = []
+        self._stopping = False
+        self.restarts: Dict[int, int] = {i: 0 for i in range(shards)}
+
+    def start(self):
+        for i in range(self.shards):
+            self._tasks.append(asyncio.create_task(self._keep_alive(i)))
+
+    async def _keep_alive(self, index: int):
+        backoff = self.min_backoff
+        while not self._stopping:
+            env = dict(os.environ)
+            env.update(self.env)
+            env["USERBOT_ROLE"] = "worker"
+            env["SHARD_INDEX"] = str(index)
+            env["SHARDS"] = str(self.shards)
+
+            started = time.monotonic()
+            try:
+                proc = await asyncio.create_subprocess_exec(sys.executable, self.script, env=env)
+            except Exception as e:
+                print(f"❌ Shard {index} ishga tushmadi: {e}")
+                proc = None
+
+            if proc is not None:
+                self._procs[index] = proc
+                print(f"🧩 Shard {index}/{self.shards} ishga tushdi (pid={proc.pid})")
+                code = await proc.wait()
+                self._procs.pop(index, None)
+                if self._stopping:
+                    return
+                print(f"⚠️ Shard {index} to'xtadi (exit={code})")
+
+            if time.monotonic() - started >= self.stable_after:
+                backoff = self.min_backoff
+            self.restarts[index] += 1
+            print(f"🔁 Shard {index}: {backoff:.0f}s dan keyin qayta ishga tushadi")
+            await asyncio.sleep(backoff)
+            backoff = min(self.max_backoff, backoff * 2)
+
+    async def stop(self):
+        self._stopping = True
+        for proc in list(self._procs.values()):
+            try:
+                proc.terminate()
+            except ProcessLookupError:
+                pass
+        for proc in list(self._procs.values()):
+            try:
+                await asyncio.wait_for(proc.wait(), timeout=10)
+            except asyncio.TimeoutError:
+                proc.kill()
+        for t in self._tasks:
+            t.cancel()
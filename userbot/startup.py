@@ -0,0 +1,89 @@
+"""Akkauntlarni bosqichma-bosqich ishga tushirish.
+
+- Bir vaqtda faqat `concurrency` ta akkaunt ulanish + dialog sync bosqichida
+  bo'ladi (Telegram FloodWait va Supabase'ga "thundering herd" bo'lmasin).
+- Har bir start oldidan tasodifiy jitter (0..jitter s).
+- Tartib: faol guruhlari ko'p akkauntlar birinchi.
+- Readiness barrier: hammasi tayyor (yoki xato) bo'lganda umumiy
+  time-to-ready hisoboti.
+
+Pyrogram'ga bog'liq emas: spawn(phone, mark_ready) -> asyncio.Task.
+"""
+
+import asyncio
+import random
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+ReadyCallback = Callable[[bool], None]
+
+
+class StartupScheduler:
+    def __init__(self, concurrency: int = 3, jitter: float = 2.0,
+                 rnd: Optional[random.Random] = None, clock=time.monotonic):
+        self.concurrency = max(1, int(concurrency))
+        self.jitter = max(0.0, float(jitter))
+        self._rnd = rnd or random.Random()
+        self._clock = clock
+        self._sem = asyncio.Semaphore(self.concurrency)
+        self._pending: List[asyncio.Task] = []
+        self.started_at: Optional[float] = None
+        self.ready: Dict[str, float] = {}    # phone -> launch'dan tayyor bo'lguncha (s)
+        self.failed: Dict[str, float] = {}
+
+    @staticmethod
+    def prioritize(phones: Iterable[str], weight: Callable[[str], int]) -> List[str]:
+        """Og'irligi (faol guruhlar soni) katta birinchi; tenglikda asl tartib."""
+        phones = list(phones)
+        return sorted(phones, key=lambda p: -weight(p))
+
+    def launch(self, phones: Iterable[str], spawn: Callable[[str, ReadyCallback], asyncio.Task]):
+        if self.started_at is None:
+            self.started_at = self._clock()
+        for phone in phones:
+            self._pending.append(asyncio.create_task(self._start_one(phone, spawn)))
+
+    async def _start_one(self, phone: str, spawn):
+        async with self._sem:
+            if self.jitter:
+                await asyncio.sleep(self._rnd.uniform(0, self.jitter))
+
+            done = asyncio.Event()
+            result = {"ok": False}
+
+            def mark(ok: bool = True):
+                if not done.is_set():
+                    result["ok"] = ok
+                    done.set()
+
+            task = spawn(phone, mark)
+            waiter = asyncio.ensure_future(done.wait())
+            try:
+                # tayyor bo'ldi yoki client task tugadi (xato) -> slot bo'shaydi
+                await asyncio.wait({task, waiter}, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                waiter.cancel()
+
+            elapsed = self._clock() - self.started_at
+            if done.is_set() and result["ok"]:
+                self.ready[phone] = elapsed
+            else:
+                self.failed[phone] = elapsed
+
+    async def wait_ready(self, timeout: Optional[float] = None) -> dict:
+        """Readiness barrier: launch qilinganlarning hammasi tayyor/xato bo'lguncha."""
+        pending, self._pending = self._pending, []
+        if pending:
+            await asyncio.wait(pending, timeout=timeout)
+        return self.summary()
+
+    def summary(self) -> dict:
+        times = sorted(self.ready.values())
+        total = (self._clock() - self.started_at) if self.started_at is not None else 0.0
+        return {
+            "ready": len(self.ready),
+            "failed": len(self.failed),
+            "time_to_ready": max(times) if times else total,
+            "p50": times[len(times) // 2] if times else 0.0,
+            "elapsed": total,
+        }
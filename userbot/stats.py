@@ -0,0 +1,111 @@
+"""Soatlik statistika (xotirada yig'iladi, bazaga bulk increment).
+
+- Har xabar uchun bitta dict increment (await yo'q):
+    akkaunt x soat: ko'rilgan / navbatga tushgan
+    guruh x soat:   ko'rilgan / navbatga tushgan (egasi bo'lgan akkaunt sanaydi)
+    kalit so'z x guruh x soat: hitlar
+- drain() -> increment_hourly_stats RPC parametrlari; yozilmasa merge() bilan
+  keyingi flush'ga qaytariladi (sanoq yo'qolmaydi).
+- Bir nechta jarayon/shard bo'lsa ham RPC qiymatlarni qo'shadi.
+"""
+
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+MATCHED_STAGES = frozenset(("queued", "submitted"))
+# bu bosqichlarda guruh boshqa akkauntga tegishli / kuzatilmaydi -> guruh statistikasiga kirmaydi
+GROUP_SKIP_STAGES = frozenset(("not_owner", "drivers_group"))
+
+Batch = Tuple[dict, dict, dict]
+
+
+def _hour_iso(hour: int) -> str:
+    return datetime.fromtimestamp(hour, timezone.utc).isoformat()
+
+
+class HourlyStats:
+    def __init__(self, clock=time.time):
+        self._clock = clock
+        self.keywords: Dict[tuple, list] = {}   # (hour, keyword_id, group_id) -> [hits, group_name]
+        self.groups: Dict[tuple, list] = {}     # (hour, group_id) -> [seen, matched]
+        self.accounts: Dict[tuple, list] = {}   # (hour, phone) -> [seen, matched]
+        self.flushed_rows = 0
+
+    def _hour(self) -> int:
+        return int(self._clock()) // 3600 * 3600
+
+    def message(self, phone: str, group_id: int, stage: str):
+        hour = self._hour()
+        matched = 1 if stage in MATCHED_STAGES else 0
+        c = self.accounts.get((hour, phone))
+        if c is None:
+            self.accounts[(hour, phone)] = [1, matched]
+        else:
+            c[0] += 1
+            c[1] += matched
+        if stage in GROUP_SKIP_STAGES:
+            return
+        c = self.groups.get((hour, group_id))
+        if c is None:
+            self.groups[(hour, group_id)] = [1, matched]
+        else:
+            c[0] += 1
+            c[1] += matched
+
+    def hit(self, keyword_id, group_id: int, group_name: Optional[str]):
+        if not keyword_id:
+            return
+        key = (self._hour(), keyword_id, group_id)
+        c = self.keywords.get(key)
+        if c is None:
+            self.keywords[key] = [1, group_name]
+        else:
+            c[0] += 1
+
+    def pending(self) -> int:
+        return len(self.keywords) + len(self.groups) + len(self.accounts)
+
+    def drain(self) -> Optional[Batch]:
+        if not self.pending():
+            return None
+        batch = (self.keywords, self.groups, self.accounts)
+        self.keywords, self.groups, self.accounts = {}, {}, {}
+        return batch
+
+    def merge(self, batch: Batch):
+        """Flush xato bo'lsa sanoqlarni qaytarish."""
+        keywords, groups, accounts = batch
+        for key, (hits, name) in keywords.items():
+            c = self.keywords.setdefault(key, [0, name])
+            c[0] += hits
+        for src, dst in ((groups, self.groups), (accounts, self.accounts)):
+            for key, (seen, matched) in src.items():
+                c = dst.setdefault(key, [0, 0])
+                c[0] += seen
+                c[1] += matched
+
+    @staticmethod
+    def params(batch: Batch) -> dict:
+        keywords, groups, accounts = batch
+        hours: Dict[int, str] = {}
+
+        def iso(h: int) -> str:
+            s = hours.get(h)
+            if s is None:
+                s = hours[h] = _hour_iso(h)
+            return s
+
+        keyword_rows: List[dict] = [
+            {"hour": iso(h), "keyword_id": kid, "group_id": gid, "group_name": name, "hits": hits}
+            for (h, kid, gid), (hits, name) in keywords.items()
+        ]
+        group_rows = [
+            {"hour": iso(h), "group_id": gid, "seen": seen, "matched": matched}
+            for (h, gid), (seen, matched) in groups.items()
+        ]
+        account_rows = [
+            {"hour": iso(h), "phone_number": phone, "seen": seen, "matched": matched}
+            for (h, phone), (seen, matched) in accounts.items()
+        ]
+        return {"keyword_rows": keyword_rows, "group_rows": group_rows, "account_rows": account_rows}
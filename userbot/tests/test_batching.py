@@ -0,0 +1,66 @@
+import asyncio
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from batching import send_orders, utf16_len  # noqa: E402
+
+
+class FakeBotApi:
+    """Batch xabarni rad etadi (masalan "message is too long"), bittalarini qabul qiladi."""
+
+    def __init__(self, joined=False, single=None):
+        self.joined_result = joined
+        self.single = single or {}
+        self.calls = []
+
+    async def send_single(self, entry, text):
+        self.calls.append(("single", entry))
+        return self.single.get(entry, True)
+
+    async def send_joined(self, texts):
+        self.calls.append(("joined", len(texts)))
+        return self.joined_result
+
+
+class BatchingTest(unittest.TestCase):
+    def run_batch(self, api, batch):
+        results = {}
+
+        def finish(entry, ok):
+            self.assertNotIn(entry, results)
+            results[entry] = ok
+
+        asyncio.run(send_orders(batch, [f"zakaz {e}" for e in batch], api.send_single, api.send_joined, finish))
+        return results
+
+    def test_utf16_len_counts_astral_emoji_twice(self):
+        self.assertEqual(utf16_len("📍a"), 3)
+        self.assertEqual(utf16_len("Xiva"), 4)
+
+    def test_rejected_batch_falls_back_to_single_sends(self):
+        api = FakeBotApi(joined=False, single={2: False, 3: None})
+        results = self.run_batch(api, [1, 2, 3])
+        # hech biri batch natijasi (False) bilan tashlanmaydi: har biri o'zi yuboriladi / qayta urinadi
+        self.assertEqual(results, {1: True, 2: False, 3: None})
+        self.assertEqual(api.calls, [("joined", 3), ("single", 1), ("single", 2), ("single", 3)])
+
+    def test_sent_batch_finishes_all(self):
+        api = FakeBotApi(joined=True)
+        self.assertEqual(self.run_batch(api, [1, 2]), {1: True, 2: True})
+        self.assertEqual(api.calls, [("joined", 2)])
+
+    def test_transient_batch_failure_retries_all(self):
+        api = FakeBotApi(joined=None)
+        self.assertEqual(self.run_batch(api, [1, 2]), {1: None, 2: None})
+
+    def test_single_order_sent_directly(self):
+        api = FakeBotApi()
+        self.assertEqual(self.run_batch(api, [7]), {7: True})
+        self.assertEqual(api.calls, [("single", 7)])
+
+
+if __name__ == "__main__":
+    unittest.main()
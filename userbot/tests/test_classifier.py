@@ -0,0 +1,51 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from classifier import OrderClassifier, SenderHistory, repeat_bonus  # noqa: E402
+
+
+class FakeClock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class ClassifierTest(unittest.TestCase):
+    def test_phrase_score(self):
+        c = OrderClassifier({"mashina bor": 1.0, "olaman": 1.0, "kerak": -0.5})
+        score, found = c.score("Mashina bor, Xivaga olaman")
+        self.assertEqual(score, 2.0)
+        self.assertEqual(c.decide(score), "driver_ad")
+        self.assertEqual(c.decide(c.score("Xivaga mashina kerak")[0]), "order")
+
+
+class SenderHistoryTest(unittest.TestCase):
+    TEXT = "Toshkentdan Xivaga 2 kishi bor ertalab"
+
+    def test_cross_posts_counted_once(self):
+        history = SenderHistory(window=3600, clock=FakeClock())
+        for _ in range(20):
+            posts = history.observe(42, self.TEXT)
+        self.assertEqual(posts, 1)
+        self.assertEqual(history.observe(42, self.TEXT.upper() + "!"), 1)
+        self.assertEqual(history.observe(42, "Urganchdan Toshkentga pochta bor"), 2)
+
+    def test_window_expiry(self):
+        clock = FakeClock()
+        history = SenderHistory(window=60, clock=clock)
+        history.observe(42, "birinchi post matni")
+        clock.now += 61
+        self.assertEqual(history.observe(42, "ikkinchi post matni"), 1)
+
+    def test_repeat_bonus_capped(self):
+        self.assertEqual(repeat_bonus(2, 2, 0.5, 1.0), 0)
+        self.assertEqual(repeat_bonus(10, 2, 0.5, 1.0), 1.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
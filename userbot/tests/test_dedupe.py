@@ -0,0 +1,105 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dedupe import ContentDedupe, ForwardDedupe  # noqa: E402
+
+
+class FakeClock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class ForwardDedupeTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.store = ForwardDedupe(ttl=60, stale_ttl=10, max_size=3, clock=self.clock)
+
+    def test_claim_once(self):
+        self.assertTrue(self.store.claim((1, 1), "a"))
+        self.assertFalse(self.store.claim((1, 1), "b"))
+        self.assertEqual(self.store.status((1, 1)), "queued")
+        self.assertEqual(self.store.owner((1, 1)), "a")
+
+    def test_stale_queued_takeover(self):
+        self.store.claim((1, 1), "a")
+        self.clock.now += 11
+        self.assertTrue(self.store.claim((1, 1), "b"))
+        self.assertEqual(self.store.owner((1, 1)), "b")
+
+    def test_mark_sent_blocks_takeover(self):
+        self.store.claim((1, 1), "a")
+        self.store.mark_sent((1, 1))
+        self.assertEqual(self.store.status((1, 1)), "sent")
+        self.assertEqual(self.store.owner((1, 1)), "a")
+        self.clock.now += 30
+        self.assertFalse(self.store.claim((1, 1), "b"))
+
+    def test_release_allows_reclaim(self):
+        self.store.claim((1, 1), "a")
+        self.store.release((1, 1))
+        self.assertNotIn((1, 1), self.store)
+        self.assertTrue(self.store.claim((1, 1), "b"))
+
+    def test_ttl_expiry(self):
+        self.store.claim((1, 1))
+        self.store.mark_sent((1, 1))
+        self.clock.now += 61
+        self.assertTrue(self.store.claim((1, 2)))
+        self.assertNotIn((1, 1), self.store)
+        self.assertEqual(self.store.expired, 1)
+        self.assertTrue(self.store.claim((1, 1)))
+
+    def test_cap_evicts_oldest(self):
+        for i in range(4):
+            self.clock.now += 1
+            self.store.claim((1, i))
+        self.assertEqual(len(self.store), 3)
+        self.assertNotIn((1, 0), self.store)
+        self.assertEqual(self.store.evicted, 1)
+
+
+class ContentDedupeTest(unittest.TestCase):
+    TEXT = "Toshkentdan Xivaga 2 kishi bor ertalab soat 6 da"
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.store = ContentDedupe(window=300, threshold=0.8, clock=self.clock)
+
+    def test_cross_post_collapses(self):
+        first, dup = self.store.observe(42, self.TEXT, -100)
+        self.assertFalse(dup)
+        entry, dup = self.store.observe(42, self.TEXT.upper(), -200)
+        self.assertTrue(dup)
+        self.assertIs(entry, first)
+        self.assertEqual(entry.also_posted, 1)
+
+    def test_near_duplicate_collapses(self):
+        self.store.observe(42, self.TEXT, -100)
+        _, dup = self.store.observe(42, self.TEXT + " tezda", -200)
+        self.assertTrue(dup)
+
+    def test_different_sender_or_text_not_duplicate(self):
+        self.store.observe(42, self.TEXT, -100)
+        self.assertFalse(self.store.observe(43, self.TEXT, -200)[1])
+        self.assertFalse(self.store.observe(42, "Urganchdan Toshkentga pochta olib ketaman", -200)[1])
+
+    def test_window_expiry_and_forget(self):
+        entry, _ = self.store.observe(42, self.TEXT, -100)
+        self.store.forget(entry)
+        self.assertFalse(self.store.observe(42, self.TEXT, -200)[1])
+        self.clock.now += 301
+        self.assertFalse(self.store.observe(42, self.TEXT, -300)[1])
+
+    def test_short_or_anonymous_skipped(self):
+        self.assertEqual(self.store.observe(None, self.TEXT, -100), (None, False))
+        self.assertEqual(self.store.observe(42, "taksi", -100), (None, False))
+
+
+if __name__ == "__main__":
+    unittest.main()
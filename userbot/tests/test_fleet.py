@@ -0,0 +1,41 @@
+import asyncio
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fleet import FleetSupervisor  # noqa: E402
+
+RUNNABLE = ("pending", "active", "connecting")
+
+
+class FleetPlanTest(unittest.TestCase):
+    def test_plan(self):
+        async def run():
+            async def forever(phone, ready):
+                ready(True)
+                await asyncio.Event().wait()
+
+            fleet = FleetSupervisor(forever)
+            for phone in ("a", "b", "c", "d"):
+                fleet.add(phone)
+            await asyncio.sleep(0)
+
+            to_start, to_stop = fleet.plan(
+                {"a": "active", "b": "stopped", "c": "error", "e": "pending"}, RUNNABLE, keep=("error",)
+            )
+            self.assertEqual(to_start, ["e"])
+            self.assertEqual(sorted(to_stop), ["b", "d"])
+
+            await fleet.remove("b")
+            to_start, to_stop = fleet.plan({"a": "active", "b": "pending", "c": "error", "d": "active"}, RUNNABLE)
+            self.assertEqual(to_start, ["b"])
+            self.assertEqual(to_stop, ["c"])
+            await fleet.stop_all()
+
+        asyncio.run(run())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,39 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from matcher import AhoCorasickMatcher, RegexMatcher  # noqa: E402
+
+
+class MatcherTest(unittest.TestCase):
+    def test_cyrillic_and_case(self):
+        for cls in (AhoCorasickMatcher, RegexMatcher):
+            m = cls(["Xiva"])
+            self.assertEqual(m.search("ХИВА га кетаман"), "xiva")
+
+    def test_surrounding_whitespace_is_word_boundary(self):
+        for cls in (AhoCorasickMatcher, RegexMatcher):
+            m = cls([" xiva "])
+            self.assertIsNone(m.search("xivaga ketaman"))
+            self.assertEqual(m.search("toshkent xiva ketaman"), " xiva ")
+
+    def test_whitespace_only_keyword_ignored(self):
+        self.assertEqual(len(AhoCorasickMatcher(["  ", "xiva"])), 1)
+
+    def test_colliding_keywords_pick_deterministically(self):
+        for order in (["хива", "Xiva"], ["Xiva", "хива"]):
+            for cls in (AhoCorasickMatcher, RegexMatcher):
+                m = cls(order)
+                self.assertEqual(m.search("ХИВА га"), "xiva")
+                self.assertEqual(m.collisions, {"xiva": ("xiva", "хива")})
+        self.assertEqual(AhoCorasickMatcher(["xiva", "urganch"]).collisions, {})
+
+    def test_leftmost_longest(self):
+        m = AhoCorasickMatcher(["xiva", "xivaga", "toshkent"])
+        self.assertEqual(m.search("xivaga toshkentdan"), "xivaga")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+import asyncio
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from outbox import Outbox  # noqa: E402
+
+
+class OutboxTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "outbox.db")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_unacked_rows_replayed_after_restart(self):
+        async def run():
+            box = Outbox(self.path)
+            box.put({"n": 1})
+            box.put({"n": 2})
+            oid, payload, _ = await box.get()
+            box.ack(oid)
+            await box.get()   # olindi, lekin ack yo'q (masalan shutdown)
+            box.close()
+
+            box = Outbox(self.path)
+            self.assertEqual(box.replayed, 1)
+            _, payload, _ = await box.get()
+            self.assertEqual(payload, {"n": 2})
+            box.close()
+
+        asyncio.run(run())
+
+    def test_requeue_keeps_row_and_extra(self):
+        async def run():
+            box = Outbox(self.path)
+            box.put({"n": 1}, extra="entry")
+            oid, payload, extra = await box.get()
+            box.requeue(oid, payload, extra, delay=0.01)
+            self.assertEqual(box.qsize(), 1)
+            self.assertEqual(box.mem_size(), 0)
+            got = await asyncio.wait_for(box.get(), 1)
+            self.assertEqual(got, (oid, {"n": 1}, "entry"))
+            self.assertEqual(box.attempts(oid), 1)
+            box.ack(oid)
+            self.assertEqual(box.qsize(), 0)
+            self.assertEqual(box.attempts(oid), 0)
+            box.close()
+
+        asyncio.run(run())
+
+    def test_requeue_after_spill_not_loaded_twice(self):
+        async def run():
+            box = Outbox(self.path, mem_max=2, refill_batch=2)
+            for n in range(4):
+                box.put({"n": n})
+            oid, payload, _ = await box.get()
+            box.requeue(oid, payload)
+            seen = []
+            for _ in range(4):
+                seen.append((await box.get())[1]["n"])
+            self.assertEqual(sorted(seen), [0, 1, 2, 3])
+            self.assertIsNone(box.get_nowait())
+            box.close()
+
+        asyncio.run(run())
+
+
+if __name__ == "__main__":
+    unittest.main()
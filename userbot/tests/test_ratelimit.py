@@ -0,0 +1,64 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ratelimit import SendScheduler, TokenBucket  # noqa: E402
+
+
+class FakeClock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TokenBucketTest(unittest.TestCase):
+    def test_burst_then_rate(self):
+        bucket = TokenBucket(rate=2.0, capacity=2, now=0.0)
+        self.assertEqual(bucket.reserve(0.0), 0.0)
+        self.assertEqual(bucket.reserve(0.0), 0.0)
+        self.assertAlmostEqual(bucket.reserve(0.0), 0.5)
+        self.assertAlmostEqual(bucket.reserve(0.0), 1.0)
+
+
+class SendSchedulerTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        # global 10/s, chat 60/min (1/s), burst 2
+        self.sched = SendScheduler(10, 60, 2, clock=self.clock)
+
+    def test_chat_rate(self):
+        self.assertEqual(self.sched.reserve(1), 0.0)
+        self.assertEqual(self.sched.reserve(1), 0.0)
+        self.assertAlmostEqual(self.sched.reserve(1), 1.0)
+        self.assertEqual(self.sched.reserve(2), 0.0)   # boshqa chat o'z bucket'idan
+
+    def test_penalize_one_chat_other_lanes_continue(self):
+        self.sched.penalize(5, 1)
+        self.assertGreaterEqual(self.sched.reserve(1), 5.0)
+        self.assertEqual(self.sched.reserve(2), 0.0)
+        self.assertEqual(self.sched.stats()["backoff_left"], 0.0)
+        self.assertAlmostEqual(self.sched.chat_backoff_left(1), 5.0)
+
+    def test_penalize_two_chats_sets_global_backoff(self):
+        self.sched.penalize(5, 1)
+        self.clock.now += 1
+        self.sched.penalize(3, 2)
+        self.assertEqual(self.sched.throttled, 2)
+        self.assertEqual(self.sched.throttled_global, 1)
+        self.assertAlmostEqual(self.sched.stats()["backoff_left"], 3.0)
+        self.assertGreaterEqual(self.sched.reserve(3), 3.0)   # 429 olmagan chat ham kutadi
+
+    def test_backoff_expires(self):
+        self.sched.penalize(5, 1)
+        self.clock.now += 6
+        self.sched.penalize(1, 2)   # 1-chat backoff tugagan -> umumiy emas
+        self.assertEqual(self.sched.throttled_global, 0)
+        self.assertEqual(self.sched.reserve(3), 0.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
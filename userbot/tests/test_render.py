@@ -0,0 +1,91 @@
+import html
+import json
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import render  # noqa: E402
+from orders import OrderRecord  # noqa: E402
+
+DRIVERS = -1003784903860
+
+
+def legacy_payload(chat_id, username, title, msg_id, sender_id, sender_username, text, urls):
+    """Render qatlamidan oldingi main.py (handler f-string'lari + send_to_drivers_group)."""
+    if username:
+        message_link = f"https://t.me/{username}/{msg_id}"
+        group_link = f"https://t.me/{username}"
+    else:
+        message_link = f"https://t.me/c/{str(chat_id).replace('-100', '')}/{msg_id}"
+        group_link = message_link
+    if sender_username:
+        anchor, sender_url = f"@{sender_username}", f"https://t.me/{sender_username}"
+    else:
+        anchor, sender_url = "Клент личкаси", f"tg://user?id={sender_id}"
+    sender_html = f'<a href="{html.escape(sender_url)}">{html.escape(anchor)}</a>'
+    extra = ""
+    if urls:
+        extra = "\n\n" + "\n".join([f"🔗 {html.escape(u)}" for u in urls[:3]])
+    forward_text = (
+        f"🔔 <b>Yangi buyurtma</b>\n"
+        f"📍 Guruh: <b>{html.escape(title)}</b>\n"
+        f"👤 Kimdan: {sender_html}\n\n"
+        f"{html.escape(text)}"
+        f"{extra}\n\n"
+        f"🔗 {message_link}"
+    )
+    keyboard = [[{"text": "👤 Клент личкаси", "url": sender_url}]]
+    keyboard.append([
+        {"text": "👥 Guruhga o'tish", "url": group_link},
+        {"text": "🔗 Xabarga o'tish", "url": message_link},
+    ])
+    for i, u in enumerate(urls[:3], 1):
+        keyboard.append([{"text": f"🔗 Link {i}", "url": u}])
+    return {
+        "chat_id": DRIVERS,
+        "text": forward_text,
+        "parse_mode": "HTML",
+        "disable_web_page_preview": True,
+        "reply_markup": {"inline_keyboard": keyboard},
+    }
+
+
+CASES = [
+    # chat_id, username, title, msg_id, sender_id, sender_username, text, urls
+    (-1001234567890, "xiva_taxi", "Xiva <-> Toshkent", 42, 777, "ali_99", "Xivaga 2 kishi & yuk <bor>", []),
+    (-1001234567891, None, "Urganch \"taksi\"", 7, 888, None, "Toshkentga ketaman",
+     ["https://t.me/+abc?x=1&y=2", "https://example.com/\"q\"", "https://a.uz", "https://b.uz"]),
+]
+
+
+class RenderTest(unittest.TestCase):
+    def test_order_record_payload_json_equal_to_legacy(self):
+        for chat_id, username, title, msg_id, sender_id, sender_username, text, urls in CASES:
+            rec = OrderRecord(chat_id, msg_id, username, title, sender_id, sender_username, None, text, urls)
+            body = render.send_payload(DRIVERS, rec.html(), rec.keyboard())
+            expected = legacy_payload(chat_id, username, title, msg_id, sender_id, sender_username, text, urls)
+            self.assertEqual(json.loads(body), expected)
+
+    def test_thread_id_and_no_keyboard(self):
+        body = json.loads(render.send_payload(DRIVERS, "a\"b", None, thread_id=5))
+        self.assertEqual(body, {"chat_id": DRIVERS, "text": "a\"b", "parse_mode": "HTML",
+                                "disable_web_page_preview": True, "message_thread_id": 5})
+
+    def test_sender_chat_links_to_message(self):
+        rec = OrderRecord(-1001, 3, None, "G", -1002, None, "Kanal <x>", "matn")
+        sender_html, sender_url = rec.sender()
+        self.assertIsNone(sender_url)
+        self.assertEqual(sender_html, '<a href="https://t.me/c/1/3">Kanal &lt;x&gt;</a>')
+
+    def test_outbox_codec_roundtrip(self):
+        rec = OrderRecord(-1001, 3, "g", "G", 5, "u", None, "matn", ["https://a.uz"], 9, 1.5)
+        back = OrderRecord.loads(rec.dumps())
+        self.assertEqual(back.html(), rec.html())
+        self.assertEqual(back.keyboard(), rec.keyboard())
+        self.assertEqual((back.thread_id, back.queued_at), (9, 1.5))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+import asyncio
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shards import IpcClient, IpcServer, shard_for_phone  # noqa: E402
+
+
+class ShardForPhoneTest(unittest.TestCase):
+    def test_stable_and_in_range(self):
+        phones = [f"+99890{i:07d}" for i in range(200)]
+        first = [shard_for_phone(p, 4) for p in phones]
+        self.assertEqual(first, [shard_for_phone(p, 4) for p in phones])
+        self.assertEqual(set(first), {0, 1, 2, 3})
+        self.assertEqual(shard_for_phone(phones[0], 1), 0)
+
+    def test_adding_shard_moves_few_phones(self):
+        phones = [f"+99891{i:07d}" for i in range(1000)]
+        moved = sum(shard_for_phone(p, 4) != shard_for_phone(p, 5) for p in phones)
+        self.assertLess(moved, 300)   # ~1/5
+
+
+class IpcAckTest(unittest.TestCase):
+    def run_with_server(self, on_message, body):
+        async def run():
+            server = IpcServer(on_message)
+            await server.start()
+            client = IpcClient(server.address, server.token)
+            await client.connect()
+            try:
+                await body(server, client)
+            finally:
+                await server.close()
+
+        asyncio.run(run())
+
+    def test_ack_returns_stage_after_handler(self):
+        accepted = []
+
+        async def on_message(msg):
+            accepted.append(msg["order"]["key"])
+            return {"type": "ack", "key": msg["order"]["key"], "stage": "queued"}
+
+        async def body(server, client):
+            stage = await client.request({"type": "order", "order": {"key": [-100, 7]}}, (-100, 7), timeout=2)
+            self.assertEqual(stage, "queued")
+            self.assertEqual(accepted, [[-100, 7]])
+            self.assertEqual(client.acked, 1)
+
+        self.run_with_server(on_message, body)
+
+    def test_no_ack_times_out(self):
+        async def on_message(msg):
+            return None
+
+        async def body(server, client):
+            with self.assertRaises(asyncio.TimeoutError):
+                await client.request({"type": "order", "order": {"key": [1, 1]}}, (1, 1), timeout=0.2)
+
+        self.run_with_server(on_message, body)
+
+    def test_supervisor_gone_fails_pending_request(self):
+        async def body():
+            reader_ready = asyncio.Event()
+            conns = []
+
+            async def handle(reader, writer):
+                await reader.readline()          # token
+                await reader.readline()          # zakaz: qabul qilindi, lekin ack yo'q
+                conns.append(writer)
+                reader_ready.set()
+
+            server = await asyncio.start_server(handle, "127.0.0.1", 0)
+            port = server.sockets[0].getsockname()[1]
+            client = IpcClient(f"127.0.0.1:{port}", "t")
+            await client.connect()
+            task = asyncio.create_task(client.request({"type": "order"}, (2, 2), timeout=5))
+            await reader_ready.wait()
+            conns[0].close()                      # supervisor yiqildi
+            with self.assertRaises(ConnectionError):
+                await task
+            await asyncio.wait_for(client.wait_closed(), 1)
+            server.close()
+            await server.wait_closed()
+
+        asyncio.run(body())
+
+
+if __name__ == "__main__":
+    unittest.main()
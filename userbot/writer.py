@@ -0,0 +1,104 @@
+"""Supabase write-behind qatlami.
+
+supabase-py sinxron (HTTP) — event loop ichida chaqirilsa barcha Pyrogram
+clientlar to'xtab qoladi. Shu sabab:
+- run(): har qanday bloklaydigan chaqiruv alohida thread pool'da.
+- add(): qatorlar buferga yig'iladi va jadval bo'yicha bulk insert qilinadi
+  (batch_size ta yoki flush_ms dan keyin, qaysi biri oldin bo'lsa).
+- set_status(): bir akkaunt uchun faqat oxirgi status yoziladi (coalesce).
+- close(): qolgan hammasini flush qiladi.
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+
+class SupabaseWriter:
+    def __init__(self, supabase, max_workers: int = 4, batch_size: int = 200, flush_ms: int = 500):
+        self.supabase = supabase
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = max(10, int(flush_ms)) / 1000.0
+        self._executor = ThreadPoolExecutor(max_workers=max(1, int(max_workers)),
+                                            thread_name_prefix="supabase")
+        self._rows: Dict[str, List[dict]] = {}
+        self._buffered = 0
+        self._statuses: Dict[str, dict] = {}
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._closed = False
+        self.written = 0
+        self.failed = 0
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    async def run(self, fn: Callable[[], Any]) -> Any:
+        """Bloklaydigan chaqiruvni executor'da bajaradi."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, fn)
+
+    def add(self, table: str, row: dict):
+        self._rows.setdefault(table, []).append(row)
+        self._buffered += 1
+        if self._buffered >= self.batch_size:
+            self._wakeup.set()
+
+    def set_status(self, phone: str, status: str):
+        self._statuses[phone] = {"status": status, "updated_at": "now()"}
+        self._wakeup.set()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def _loop(self):
+        while not self._closed:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    def _insert_chunk(self, table: str, chunk: List[dict]):
+        self.supabase.table(table).insert(chunk).execute()
+
+    def _update_status(self, phone: str, values: dict):
+        self.supabase.table("userbot_accounts").update(values).eq("phone_number", phone).execute()
+
+    async def flush(self):
+        rows, self._rows, self._buffered = self._rows, {}, 0
+        statuses, self._statuses = self._statuses, {}
+
+        for table, items in rows.items():
+            for i in range(0, len(items), self.batch_size):
+                chunk = items[i:i + self.batch_size]
+                try:
+                    await self.run(lambda t=table, c=chunk: self._insert_chunk(t, c))
+                    self.written += len(chunk)
+                except Exception as e:
+                    self.failed += len(chunk)
+                    print(f"⚠️ Bulk insert xato ({table}, {len(chunk)} ta): {e}")
+
+        for phone, values in statuses.items():
+            try:
+                await self.run(lambda p=phone, v=values: self._update_status(p, v))
+                print(f"📊 Status yangilandi: {phone} -> {values['status']}")
+            except Exception as e:
+                print(f"⚠️ Status yangilashda xato: {e}")
+
+    async def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._wakeup.set()
+        if self._task:
+            # joriy flush tugasin (bufer yo'qolmasin), keyin loop o'zi chiqadi
+            try:
+                await self._task
+            except Exception:
+                pass
+        await self.flush()
+        self._executor.shutdown(wait=True)